@@ -2,8 +2,9 @@ from django.contrib import admin
 from django.urls import path
 from django.utils.html import format_html
 from django.shortcuts import redirect
-from .models import Patient, Doctor, Appointment
-from . import views
+from .models import Patient, Doctor, Appointment, AppointmentTransition, OutboxMessage, ScheduleRule, WaitlistEntry
+from . import stats
+from .utils import lazy_view
 
 
 @admin.register(Patient)
@@ -19,6 +20,66 @@ class DoctorAdmin(admin.ModelAdmin):
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
     list_display = ("doctor", "patient", "date", "time", "status")
+    list_filter = ("status",)
+
+    def save_model(self, request, obj, form, change):
+        # Keep the DoctorDailyStats rollup and the transition log in step
+        # with admin edits. Staff may set any status here.
+        changes = [(obj.doctor_id, obj.date, obj.status, +1)]
+        old = Appointment.objects.get(pk=obj.pk) if change else None
+        if old:
+            changes.append((old.doctor_id, old.date, old.status, -1))
+        super().save_model(request, obj, form, change)
+        stats.record(changes)
+        if old and old.status != obj.status:
+            AppointmentTransition.objects.create(
+                appointment=obj, from_status=old.status, to_status=obj.status, changed_by=request.user
+            )
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        stats.record([(obj.doctor_id, obj.date, obj.status, -1)])
+
+    def delete_queryset(self, request, queryset):
+        changes = [(d, day, s, -1) for d, day, s in queryset.values_list("doctor_id", "date", "status")]
+        super().delete_queryset(request, queryset)
+        stats.record(changes)
+
+
+@admin.register(AppointmentTransition)
+class AppointmentTransitionAdmin(admin.ModelAdmin):
+    """Read-only: the log is append-only."""
+    list_display = ("appointment", "from_status", "to_status", "changed_by", "created_at")
+    list_filter = ("to_status",)
+    list_select_related = ("appointment__doctor__user", "appointment__patient__user", "changed_by")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ScheduleRule)
+class ScheduleRuleAdmin(admin.ModelAdmin):
+    list_display = ("doctor", "weekday", "start_time", "end_time", "slot_minutes", "valid_from", "valid_until")
+    list_filter = ("weekday",)
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ("patient", "doctor", "date", "priority", "status", "offered_time", "offer_expires_at", "joined_at")
+    list_filter = ("status",)
+    list_select_related = ("patient__user", "doctor__user")
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ("channel", "recipient", "status", "attempts", "next_attempt_at", "created_at")
+    list_filter = ("channel", "status")
 
 
 # ========== EXTRA ADMIN SETTINGS ==========
@@ -33,7 +94,10 @@ admin.site.site_title = "Doctor Appointment System"
 def get_admin_urls(urls):
     def get_urls():
         custom_urls = [
-            path("daily-appointments/", admin.site.admin_view(views.daily_appointments), name="daily_appointments"),
+            path("daily-appointments/", admin.site.admin_view(lazy_view("booking.staff_views.daily_appointments")), name="daily_appointments"),
+            path("clinic-report/", admin.site.admin_view(lazy_view("booking.staff_views.clinic_report")), name="clinic_report"),
+            path("import/", admin.site.admin_view(lazy_view("booking.staff_views.import_data")), name="import_data"),
+            path("metrics/", admin.site.admin_view(lazy_view("booking.staff_views.metrics_dashboard")), name="metrics_dashboard"),
         ]
         return custom_urls + urls
     return get_urls
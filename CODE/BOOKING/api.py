@@ -0,0 +1,431 @@
+# booking/api.py
+"""
+JSON API for the mobile app, version 1 (mounted at /api/v1/, see api_urls.py).
+
+    GET    session/                        who is logged in, and a CSRF token
+    POST   session/                        log in (username, password)
+    DELETE session/                        log out
+    GET    doctors/                        the directory (?specialization=, ?q=)
+    GET    availability/                   free slots of many doctors in one call
+                                           (?doctors=1,2,3&start=YYYY-MM-DD&days=7)
+    GET    appointments/                   the user's appointments
+                                           (?window=upcoming|past|all, ?status=booked,confirmed)
+    POST   appointments/                   book (doctor, date, time)
+    POST   appointments/<id>/cancel/
+    POST   appointments/<id>/reschedule/   (date, time)
+    POST   appointments/status/            doctors: one action for many (ids, action)
+    GET    notifications/                  newest first, with the unread count
+    POST   notifications/read/             mark many read (ids; none = all)
+    GET    history/                        medical history, notes cut to a preview
+                                           (?patient= for doctors)
+    GET    history/<id>/                   one record in full
+    GET    timeline/                       appointments, history and notifications
+                                           in one list (?kinds=, ?patient=)
+
+Authentication is the session cookie, as for the pages: GET session/ for a
+CSRF token, POST session/ to log in, then send the token it returns in
+X-CSRFToken with every POST or DELETE. Bodies may be JSON or form-encoded;
+lists of ids may be JSON lists, repeated fields or "1,2,3". Errors come
+back as ``{"error": "..."}`` with a 4xx status.
+
+Lists are keyset-paginated (pagination.py, timeline.py): a response
+carries ``next``, to be sent back as ``?after=`` for the following page,
+null on the last one. Rows are built from ``select_related``/``values``
+querysets, so a page costs the same few queries however many rows it has
+(``manage.py check_query_budget`` holds it to that).
+
+Every call takes a token from the client's rate-limit bucket first
+(ratelimit.py), and bodies are compressed for clients that accept it
+(compression.py). A breaking change gets a new version next to this one.
+"""
+import json
+import math
+from datetime import timedelta
+from functools import wraps
+
+from django.contrib.auth import authenticate, login, logout
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
+
+from . import compression, directory, notifications, ratelimit, search, stamps, timeline
+from .availability import free_slots, has_started
+from .models import Appointment, Doctor
+from .pagination import paginate
+from .services import InvalidTransition, SlotTaken, book_slot, bulk_set_status, cancel, reschedule_slot
+
+Status = Appointment.Status
+
+# Most ids (doctors, appointments, notifications) one batch call may name.
+BATCH_LIMIT = 100
+MAX_DAYS = 31
+# A failed login costs this many tokens, to slow down password guessing.
+FAILED_LOGIN_COST = 5
+
+ACTIONS = {"confirm": Status.CONFIRMED, "reject": Status.CANCELLED, "complete": Status.COMPLETED}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def endpoint(*methods, login_required=True, compress=True):
+    """Rate limit, method and login checks, JSON errors and compression for an API view."""
+    allowed = methods + ("HEAD",) if "GET" in methods else methods
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            wait = ratelimit.get_limiter().take(ratelimit.client_key(request))
+            if wait:
+                response = _error("Too many requests.", 429)
+                response["Retry-After"] = str(math.ceil(wait))
+                return response
+            if request.method not in allowed:
+                response = _error(f"{request.method} is not allowed here.", 405)
+                response["Allow"] = ", ".join(allowed)
+                return response
+            if login_required and not request.user.is_authenticated:
+                return _error("Log in first (POST session/).", 401)
+            try:
+                response = view(request, *args, **kwargs)
+            except ApiError as exc:
+                response = _error(str(exc), exc.status)
+            return compression.compress(request, response) if compress else response
+        return wrapper
+    return decorator
+
+
+# ----------------------------
+# Request parsing
+# ----------------------------
+def _payload(request):
+    """The body as a dict, from JSON or a form."""
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError as exc:
+            raise ApiError("The body is not valid JSON.") from exc
+        if not isinstance(data, dict):
+            raise ApiError("The body must be a JSON object.")
+        return data
+    return {key: values if len(values) > 1 else values[0] for key, values in request.POST.lists()}
+
+
+def _ids(value, name="ids"):
+    """Ids from a JSON list, repeated fields or "1,2,3"; None when absent."""
+    if value is None or value == []:
+        return None
+    items = value if isinstance(value, list) else [value]
+    try:
+        ids = [int(part) for item in items for part in str(item).split(",") if part.strip()]
+    except ValueError as exc:
+        raise ApiError(f"{name} must be whole numbers.") from exc
+    if len(ids) > BATCH_LIMIT:
+        raise ApiError(f"At most {BATCH_LIMIT} {name} per call.")
+    return ids
+
+
+def _id(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError) as exc:
+        raise ApiError(f"{name} must be a whole number.") from exc
+
+
+def _date(value, name="date"):
+    try:
+        day = parse_date(str(value or ""))
+    except ValueError:
+        day = None
+    if day is None:
+        raise ApiError(f"{name} must be a date (YYYY-MM-DD).")
+    return day
+
+
+def _time(value, name="time"):
+    try:
+        start = parse_time(str(value or ""))
+    except ValueError:
+        start = None
+    if start is None:
+        raise ApiError(f"{name} must be a time (HH:MM).")
+    return start
+
+
+def _future_slot(data):
+    day, start = _date(data.get("date")), _time(data.get("time"))
+    if has_started(day, start):
+        raise ApiError("Please choose a date and time in the future.")
+    return day, start
+
+
+# ----------------------------
+# Who is asking
+# ----------------------------
+def _role(request, kind):
+    """The id of the user's ``kind`` profile (no query - see stamps.profile)."""
+    who = stamps.profile(request)
+    if not who or who[0] != kind:
+        raise ApiError(f"Only {kind}s can do this.", 403)
+    return who[1]
+
+
+def _patient_id(request):
+    """The patient whose records the request reads: the user, or ``?patient=`` for doctors and staff."""
+    who = stamps.profile(request)
+    if who and who[0] == "patient":
+        return who[1]
+    if (who and who[0] == "doctor") or request.user.is_staff:
+        if "patient" not in request.GET:
+            raise ApiError("Say whose records: ?patient=<id>.")
+        return _id(request.GET["patient"], "patient")
+    raise ApiError("Only patients, doctors and staff can read medical records.", 403)
+
+
+# ----------------------------
+# Serializers
+# ----------------------------
+APPOINTMENT_FIELDS = ("date", "time", "status", "doctor__user__username", "patient__user__username")
+
+
+def _clock(value):
+    return value.strftime("%H:%M")
+
+
+def _appointment(appt):
+    return {
+        "id": appt.id,
+        "date": appt.date,
+        "time": _clock(appt.time),
+        "status": Status(appt.status).label.lower(),
+        "doctor_id": appt.doctor_id,
+        "doctor": appt.doctor.user.username,
+        "patient_id": appt.patient_id,
+        "patient": appt.patient.user.username,
+    }
+
+
+def _doctor(doctor):
+    return {"id": doctor.id, "name": doctor.user.username, "specialization": doctor.specialization}
+
+
+def _event(event):
+    return {key: value for key, value in event.items() if key != "kind"}
+
+
+# ----------------------------
+# Session
+# ----------------------------
+def _session(request, status=200):
+    user = request.user
+    who = stamps.profile(request) if user.is_authenticated else None
+    return JsonResponse({
+        "user": user.username if user.is_authenticated else None,
+        "role": who[0] if who else ("staff" if user.is_staff else None),
+        "id": who[1] if who else None,
+        "csrf_token": get_token(request),
+    }, status=status)
+
+
+@endpoint("GET", "POST", "DELETE", login_required=False, compress=False)
+def session(request):
+    if request.method == "POST":
+        data = _payload(request)
+        user = authenticate(request, username=data.get("username"), password=data.get("password"))
+        if user is None:
+            ratelimit.get_limiter().take(ratelimit.client_key(request), FAILED_LOGIN_COST)
+            raise ApiError("Wrong username or password.", 401)
+        login(request, user)
+    elif request.method == "DELETE":
+        logout(request)
+        return HttpResponse(status=204)
+    return _session(request)
+
+
+# ----------------------------
+# Doctors and availability
+# ----------------------------
+@endpoint("GET")
+def doctors(request):
+    specialization = request.GET.get("specialization")
+    query = request.GET.get("q", "").strip()
+    rows = directory.doctors(specialization or None)
+    if query:
+        by_id = {doctor.id: doctor for doctor in rows}
+        rows = [by_id[i] for i in search.search(query) if i in by_id]
+    return JsonResponse({"doctors": [_doctor(doctor) for doctor in rows], "specializations": directory.specializations()})
+
+
+@endpoint("GET")
+def availability(request):
+    """Bookable slots for every doctor asked for, in the five queries of one."""
+    doctor_ids = _ids(request.GET.getlist("doctors") or request.GET.getlist("doctor"), "doctors")
+    if not doctor_ids:
+        raise ApiError("Name the doctors: ?doctors=1,2,3.")
+    today = timezone.localdate()
+    start = max(_date(request.GET["start"], "start"), today) if request.GET.get("start") else today
+    days = request.GET.get("days", "7")
+    if not days.isdigit() or not 1 <= int(days) <= MAX_DAYS:
+        raise ApiError(f"days must be 1 to {MAX_DAYS}.")
+    end = start + timedelta(days=int(days) - 1)
+
+    slots = free_slots(doctor_ids, start, end)
+    return JsonResponse({
+        "start": start,
+        "end": end,
+        "slots": {
+            str(doctor_id): {day.isoformat(): [_clock(t) for t in starts] for day, starts in by_day.items()}
+            for doctor_id, by_day in slots.items()
+        },
+    })
+
+
+# ----------------------------
+# Appointments
+# ----------------------------
+def _own_appointment(request, pk):
+    """Appointment ``pk`` if it is the user's (as patient or doctor); 404 otherwise."""
+    appt = (
+        Appointment.objects.select_related("doctor__user", "patient__user", "patient")
+        .filter(pk=pk).first()
+    )
+    who = stamps.profile(request)
+    if appt is None or who not in (("patient", appt.patient_id), ("doctor", appt.doctor_id)):
+        raise ApiError("No such appointment.", 404)
+    return appt
+
+
+def _appointment_list(request):
+    who = stamps.profile(request)
+    if not who:
+        raise ApiError("Only patients and doctors have appointments.", 403)
+    kind, pk = who
+    rows = (
+        Appointment.objects.filter(**{f"{kind}_id": pk})
+        .select_related("doctor__user", "patient__user")
+        .only(*APPOINTMENT_FIELDS)
+    )
+    statuses = [name for name in request.GET.get("status", "").split(",") if name]
+    if statuses:
+        try:
+            rows = rows.filter(status__in=[Status[name.upper()] for name in statuses])
+        except KeyError as exc:
+            raise ApiError("status must be booked, confirmed, completed or cancelled.") from exc
+
+    today = timezone.localdate()
+    window = request.GET.get("window", "upcoming")
+    if window == "upcoming":
+        page = paginate(request, rows.filter(date__gte=today))
+    elif window == "past":
+        page = paginate(request, rows.filter(date__lt=today), descending=True)
+    elif window == "all":
+        page = paginate(request, rows)
+    else:
+        raise ApiError("window must be upcoming, past or all.")
+    return JsonResponse({"appointments": [_appointment(appt) for appt in page], "next": page.next_cursor})
+
+
+@endpoint("GET", "POST")
+def appointments(request):
+    if request.method == "GET":
+        return _appointment_list(request)
+
+    _role(request, "patient")
+    data = _payload(request)
+    doctor = Doctor.objects.select_related("user").filter(pk=_id(data.get("doctor"), "doctor")).first()
+    if doctor is None:
+        raise ApiError("No such doctor.", 404)
+    day, start = _future_slot(data)
+    try:
+        appt = book_slot(doctor, request.user.patient, day, start)
+    except SlotTaken as exc:
+        raise ApiError("That slot is not free.", 409) from exc
+    return JsonResponse(_appointment(appt), status=201)
+
+
+@endpoint("POST")
+def appointment_cancel(request, pk):
+    appt = _own_appointment(request, pk)
+    try:
+        cancel(appt, by=request.user)
+    except InvalidTransition as exc:
+        raise ApiError(str(exc), 409) from exc
+    return JsonResponse(_appointment(appt))
+
+
+@endpoint("POST")
+def appointment_reschedule(request, pk):
+    _role(request, "patient")
+    appt = _own_appointment(request, pk)
+    day, start = _future_slot(_payload(request))
+    try:
+        reschedule_slot(appt, day, start, by=request.user)
+    except SlotTaken as exc:
+        raise ApiError("That slot is not free.", 409) from exc
+    except InvalidTransition as exc:
+        raise ApiError(str(exc), 409) from exc
+    return JsonResponse(_appointment(appt))
+
+
+@endpoint("POST")
+def appointment_status(request):
+    """One action for many of the doctor's appointments (services.bulk_set_status)."""
+    _role(request, "doctor")
+    data = _payload(request)
+    ids = _ids(data.get("ids"))
+    if data.get("action") not in ACTIONS or not ids:
+        raise ApiError(f"Send ids and an action ({', '.join(ACTIONS)}).")
+    try:
+        changed, skipped = bulk_set_status(request.user.doctor, ids, ACTIONS[data["action"]], by=request.user)
+    except InvalidTransition as exc:
+        raise ApiError(str(exc), 409) from exc
+    return JsonResponse({"changed": changed, "skipped": skipped})
+
+
+# ----------------------------
+# Notifications and medical records
+# ----------------------------
+@endpoint("GET")
+def notification_list(request):
+    patient_id = _role(request, "patient")
+    page = timeline.page(request, patient_id, kinds=("notification",))
+    return JsonResponse({
+        "notifications": [_event(event) for event in page],
+        "unread": notifications.unread_count(patient_id),
+        "next": page.next_cursor,
+    })
+
+
+@endpoint("POST")
+def notification_read(request):
+    patient_id = _role(request, "patient")
+    changed = notifications.mark_read(patient_id, _ids(_payload(request).get("ids")))
+    return JsonResponse({"updated": changed, "unread": notifications.unread_count(patient_id)})
+
+
+@endpoint("GET")
+def history(request):
+    page = timeline.page(request, _patient_id(request), kinds=("history",))
+    return JsonResponse({"history": [_event(event) for event in page], "next": page.next_cursor})
+
+
+@endpoint("GET")
+def history_record(request, pk):
+    record = timeline.history_text(_patient_id(request), pk)
+    if record is None:
+        raise ApiError("No such record.", 404)
+    return JsonResponse(record)
+
+
+@endpoint("GET")
+def patient_timeline(request):
+    page = timeline.page(request, _patient_id(request))
+    return JsonResponse({"events": page.rows, "next": page.next_cursor})
@@ -0,0 +1,24 @@
+"""
+JSON API, version 1 (booking/api.py). Mounted at /api/v1/ by
+doctorapp/urls_public.py; a v2 would get its own module next to this one.
+"""
+from django.urls import path
+
+from . import api
+
+app_name = "api_v1"
+
+urlpatterns = [
+    path("session/", api.session, name="session"),
+    path("doctors/", api.doctors, name="doctors"),
+    path("availability/", api.availability, name="availability"),
+    path("appointments/", api.appointments, name="appointments"),
+    path("appointments/status/", api.appointment_status, name="appointment_status"),
+    path("appointments/<int:pk>/cancel/", api.appointment_cancel, name="appointment_cancel"),
+    path("appointments/<int:pk>/reschedule/", api.appointment_reschedule, name="appointment_reschedule"),
+    path("notifications/", api.notification_list, name="notifications"),
+    path("notifications/read/", api.notification_read, name="notifications_read"),
+    path("history/", api.history, name="history"),
+    path("history/<int:pk>/", api.history_record, name="history_record"),
+    path("timeline/", api.patient_timeline, name="timeline"),
+]
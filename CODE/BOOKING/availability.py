@@ -0,0 +1,248 @@
+# booking/availability.py
+"""
+Slot availability engine.
+
+Free time for a doctor is worked out as:
+
+    schedule windows  -  leave days  -  active appointments  -  held slots
+
+Schedule windows come from booking/schedules.py (weekly rules expanded on
+demand plus one-off dates). Held slots are waitlist offers that haven't
+been taken up yet (booking/waitlist.py). Everything needed for a date
+range is loaded in five queries (rules, one-off schedules, leaves,
+appointments, holds) no matter how many doctors or days are asked for, and the merge itself is a plain
+sorted-interval sweep done in Python.
+
+Each window carries its own slot length (a rule may set one); otherwise
+BOOKING_SLOT_MINUTES applies.
+
+Times are handled as "minutes since midnight" internally so the interval
+maths stays simple integer arithmetic.
+
+Slots that have already started are never offered or accepted: on today's
+date only starts from the current local time on count (``_earliest``).
+"""
+from collections import defaultdict
+from datetime import time, timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import schedules
+from .models import Appointment, DoctorLeave, WaitlistEntry
+
+# Default appointment length. Can be overridden with BOOKING_SLOT_MINUTES.
+DEFAULT_SLOT_MINUTES = 30
+
+# Appointments in these statuses no longer hold on to their slot.
+FREE_STATUSES = [Appointment.Status.CANCELLED]
+
+
+def slot_minutes():
+    return getattr(settings, "BOOKING_SLOT_MINUTES", DEFAULT_SLOT_MINUTES)
+
+
+def _to_minutes(t):
+    return t.hour * 60 + t.minute
+
+
+def _to_time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+def _earliest(day, now=None):
+    """First minute of ``day`` a slot may still start at (local time)."""
+    now = timezone.localtime(now)
+    if day > now.date():
+        return 0
+    if day < now.date():
+        return 24 * 60
+    # 10:00 is still bookable at 10:00:00 but not at 10:00:30.
+    return now.hour * 60 + now.minute + (1 if now.second or now.microsecond else 0)
+
+
+def has_started(day, start, now=None):
+    """True if a slot at ``start`` on ``day`` is already under way or over."""
+    return _to_minutes(start) < _earliest(day, now)
+
+
+def _merge(intervals):
+    """Merge overlapping/touching (start, end) intervals into a sorted list."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _subtract(windows, busy):
+    """Return the parts of ``windows`` not covered by ``busy``.
+
+    Both lists must be merged (sorted, non-overlapping). Single pass over
+    both lists.
+    """
+    free = []
+    i = 0
+    for start, end in windows:
+        cursor = start
+        while i < len(busy) and busy[i][1] <= cursor:
+            i += 1
+        j = i
+        while j < len(busy) and busy[j][0] < end:
+            if busy[j][0] > cursor:
+                free.append((cursor, busy[j][0]))
+            cursor = max(cursor, busy[j][1])
+            j += 1
+        if cursor < end:
+            free.append((cursor, end))
+    return free
+
+
+def _step_at(windows, minute):
+    """Slot length of the window containing ``minute`` (default if none)."""
+    for start, end, step in windows:
+        if start <= minute < end:
+            return step
+    return slot_minutes()
+
+
+def _load(doctor_ids, start_date, end_date, length, exclude_appointment=None):
+    """Fetch windows, leaves, appointments and holds for the range (5 queries).
+
+    ``length`` overrides the slot length of every window when given.
+    """
+    windows = schedules.windows(doctor_ids, start_date, end_date, slot_minutes())
+    if length:
+        windows = {key: [(start, end, length) for start, end, _ in spans] for key, spans in windows.items()}
+    busy = defaultdict(list)
+    on_leave = set()
+
+    leaves = DoctorLeave.objects.filter(doctor_id__in=doctor_ids, date__lte=end_date).filter(
+        Q(end_date__gte=start_date) | Q(end_date__isnull=True, date__gte=start_date)
+    ).values_list("doctor_id", "date", "end_date")
+    for doctor_id, first, last in leaves:
+        day, last = max(first, start_date), min(last or first, end_date)
+        while day <= last:
+            on_leave.add((doctor_id, day))
+            day += timedelta(days=1)
+
+    appointments = (
+        Appointment.objects.filter(doctor_id__in=doctor_ids, date__range=(start_date, end_date))
+        .exclude(status__in=FREE_STATUSES)
+    )
+    if exclude_appointment is not None:
+        appointments = appointments.exclude(pk=exclude_appointment)
+    holds = WaitlistEntry.objects.filter(
+        doctor_id__in=doctor_ids,
+        date__range=(start_date, end_date),
+        status=WaitlistEntry.Status.OFFERED,
+        offer_expires_at__gt=timezone.now(),
+    )
+    for doctor_id, day, start in chain(
+        appointments.values_list("doctor_id", "date", "time"),
+        holds.values_list("doctor_id", "date", "offered_time"),
+    ):
+        begin = _to_minutes(start)
+        busy[(doctor_id, day)].append((begin, begin + _step_at(windows.get((doctor_id, day), ()), begin)))
+
+    return windows, busy, on_leave
+
+
+def _free(doctor_ids, start_date, end_date, length, exclude_appointment):
+    """Yield ``(doctor_id, day, free_intervals, windows)`` for working days."""
+    windows, busy, on_leave = _load(doctor_ids, start_date, end_date, length, exclude_appointment)
+    for key in sorted(windows):
+        if key in on_leave:
+            continue
+        doctor_id, day = key
+        spans = [(start, end) for start, end, _ in windows[key]]
+        free = _subtract(_merge(spans), _merge(busy.get(key, [])))
+        if free:
+            yield doctor_id, day, free, windows[key]
+
+
+def free_intervals(doctor_ids, start_date, end_date, length=None, exclude_appointment=None):
+    """Free time per doctor per day between two dates (inclusive).
+
+    Returns ``{doctor_id: {date: [(start_minute, end_minute), ...]}}``.
+    Days on leave and days without a schedule are left out.
+    """
+    doctor_ids = list(doctor_ids)
+    result = {doctor_id: {} for doctor_id in doctor_ids}
+    for doctor_id, day, free, _ in _free(doctor_ids, start_date, end_date, length, exclude_appointment):
+        result[doctor_id][day] = free
+    return result
+
+
+def free_slots(doctor_ids, start_date, end_date, length=None):
+    """Bookable slot start times per doctor per day.
+
+    Returns ``{doctor_id: {date: [time, ...]}}``. Each free interval is cut
+    into back-to-back slots of ``length`` minutes, or of its window's slot
+    length when ``length`` isn't given. Slots that have already started are
+    left out.
+    """
+    doctor_ids = list(doctor_ids)
+    slots = {doctor_id: {} for doctor_id in doctor_ids}
+    for doctor_id, day, free, windows in _free(doctor_ids, start_date, end_date, length, None):
+        earliest = _earliest(day)
+        starts = []
+        for begin, end in free:
+            step = _step_at(windows, begin)
+            starts.extend(_to_time(minute) for minute in range(begin, end - step + 1, step) if minute >= earliest)
+        if starts:
+            slots[doctor_id][day] = starts
+    return slots
+
+
+def upcoming_slots(doctor_ids, start_date, days=14, length=None):
+    """Shortcut for the "next N days" view used by the booking pages."""
+    return free_slots(doctor_ids, start_date, start_date + timedelta(days=days - 1), length)
+
+
+def is_slot_free(doctor_id, day, start, length=None, exclude_appointment=None):
+    """True if ``[start, start + length)`` fits inside the doctor's free time
+    and hasn't started yet.
+
+    Without ``length`` the slot length of the window ``start`` falls in is used.
+    """
+    begin = _to_minutes(start)
+    if begin < _earliest(day):
+        return False
+    for _, _, free, windows in _free([doctor_id], day, day, length, exclude_appointment):
+        size = length or _step_at(windows, begin)
+        return any(lo <= begin and begin + size <= hi for lo, hi in free)
+    return False
+
+
+def free_among(slots):
+    """The ``(doctor_id, date, time)`` triples in ``slots`` that are bookable.
+
+    One load covers every doctor and the whole date span, so checking
+    hundreds of slots costs the same five queries as checking one.
+    """
+    slots = list(slots)
+    if not slots:
+        return set()
+    days = [day for _, day, _ in slots]
+    free = {
+        (doctor_id, day): (spans, windows)
+        for doctor_id, day, spans, windows in _free(list({d for d, _, _ in slots}), min(days), max(days), None, None)
+    }
+    result = set()
+    for doctor_id, day, start in slots:
+        if (doctor_id, day) not in free:
+            continue
+        spans, windows = free[(doctor_id, day)]
+        begin = _to_minutes(start)
+        if begin < _earliest(day):
+            continue
+        size = _step_at(windows, begin)
+        if any(lo <= begin and begin + size <= hi for lo, hi in spans):
+            result.add((doctor_id, day, start))
+    return result
@@ -0,0 +1,81 @@
+# booking/compression.py
+"""
+Response compression for the JSON API (booking/api.py).
+
+``compress`` encodes a response body in the best coding the client
+accepts: brotli when the ``brotli`` package is installed
+(``pip install brotli``), otherwise gzip. Bodies smaller than
+BOOKING_API_COMPRESS_MIN_BYTES are sent as they are; headers and CPU
+would cost more than the bytes saved.
+
+Only the API uses it. HTML pages are left alone, and so is the
+notification stream (gzip would buffer it). Responses that echo a secret,
+such as a CSRF token, must not be compressed (BREACH), so the API's
+session endpoint opts out.
+"""
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_MIN_BYTES = 512
+BROTLI_QUALITY = 5      # 11 is the default; far slower for a few % on JSON
+
+_STRONG_ETAG = re.compile(r'^"')
+
+
+def accepted_codings(header):
+    """``{coding: q}`` from an Accept-Encoding header; ``q=0`` refuses a coding."""
+    codings = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            codings[name.strip().lower()] = q
+    return codings
+
+
+def choose(header):
+    """``"br"``, ``"gzip"`` or None for this Accept-Encoding header."""
+    codings = accepted_codings(header)
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = max(offered, key=lambda name: codings.get(name, codings.get("*", 0)))
+    return best if codings.get(best, codings.get("*", 0)) > 0 else None
+
+
+def compress(request, response):
+    """Compress ``response`` in place for ``request`` if it's worth it."""
+    patch_vary_headers(response, ("Accept-Encoding",))
+    min_bytes = getattr(settings, "BOOKING_API_COMPRESS_MIN_BYTES", DEFAULT_MIN_BYTES)
+    if response.streaming or response.has_header("Content-Encoding") or len(response.content) < min_bytes:
+        return response
+    coding = choose(request.headers.get("Accept-Encoding", ""))
+    if coding is None:
+        return response
+
+    if coding == "br":
+        body = brotli.compress(response.content, quality=BROTLI_QUALITY)
+    else:
+        body = compress_string(response.content)
+    if len(body) >= len(response.content):
+        return response
+    response.content = body
+    response["Content-Length"] = str(len(body))
+    response["Content-Encoding"] = coding
+    if response.has_header("ETag"):
+        # Same meaning, different bytes.
+        response["ETag"] = _STRONG_ETAG.sub('W/"', response["ETag"])
+    return response
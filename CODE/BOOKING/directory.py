@@ -0,0 +1,80 @@
+# booking/directory.py
+"""
+Cached doctor directory.
+
+The doctor list is read on almost every patient page (home, search, book)
+and changes rarely, so it is served from Django's cache framework:
+
+* ``doctors()`` - every doctor, user pre-loaded, in display order
+* ``doctors(specialization)`` - one sub-cache per specialization
+* ``specializations()`` - the distinct specialization list
+
+Keys carry a version number (``doctors:v<version>:...``). Saving or deleting
+a Doctor or a doctor's User bumps the version (see signals.py), which
+orphans every directory key at once; old entries simply expire. The
+backend is whatever CACHES["default"] is - local memory by default, or the
+file/database cache when several worker processes must share invalidation.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Doctor
+
+VERSION_KEY = "doctors:version"
+DEFAULT_TTL = 3600
+
+
+def _ttl():
+    return getattr(settings, "BOOKING_DIRECTORY_TTL", DEFAULT_TTL)
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock so a lost version key never reuses old entries.
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def _cached(name, build):
+    key = f"doctors:v{current_version()}:{name}"
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, _ttl())
+    return value
+
+
+def doctors(specialization=None):
+    """Doctors (with ``user`` loaded), optionally for one specialization."""
+    def build():
+        queryset = Doctor.objects.select_related("user").order_by("user__username", "id")
+        if specialization:
+            queryset = queryset.filter(specialization=specialization)
+        return list(queryset)
+
+    return _cached(f"spec:{_digest(specialization)}" if specialization else "all", build)
+
+
+def _digest(text):
+    # User input: spaces and control characters aren't valid in memcached
+    # keys, and the length is unbounded.
+    return hashlib.blake2b(text.encode(), digest_size=12).hexdigest()
+
+
+def specializations():
+    return _cached(
+        "specializations",
+        lambda: list(Doctor.objects.order_by("specialization").values_list("specialization", flat=True).distinct()),
+    )
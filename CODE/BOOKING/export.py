@@ -0,0 +1,207 @@
+# booking/export.py
+"""
+Streaming exports (CSV or JSON lines, optionally gzipped).
+
+Rows are read in fixed-size chunks by primary key (``id > last_id ORDER BY
+id LIMIT n``) as plain tuples, and each chunk is encoded and handed on
+before the next one is fetched. Nothing but the current chunk is ever held
+in memory, and no long-running cursor or transaction is kept open, so an
+export of millions of rows costs the same memory as one of a hundred.
+
+Used by the staff ``export_data`` view and ``manage.py export_data``.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import Appointment, MedicalHistory, Notification
+
+CHUNK_SIZE = 2000
+FORMATS = ("csv", "jsonl")
+
+
+class ExportError(ValueError):
+    """Unknown dataset/format or a filter the dataset doesn't support."""
+
+
+# dataset -> model, exported columns (values_list lookups -> header names),
+# the field date filters apply to, which of doctor/status it supports and
+# columns stored as numbers but exported as labels.
+DATASETS = {
+    "appointments": {
+        "model": Appointment,
+        "columns": [
+            ("id", "id"),
+            ("date", "date"),
+            ("time", "time"),
+            ("status", "status"),
+            ("doctor_id", "doctor_id"),
+            ("doctor__user__username", "doctor"),
+            ("patient_id", "patient_id"),
+            ("patient__user__username", "patient"),
+        ],
+        "date_field": "date",
+        "filters": {"doctor", "status"},
+        "labels": {"status": dict(Appointment.Status.choices)},
+    },
+    "medical_history": {
+        "model": MedicalHistory,
+        "columns": [
+            ("id", "id"),
+            ("created_at", "created_at"),
+            ("doctor_id", "doctor_id"),
+            ("doctor__user__username", "doctor"),
+            ("patient_id", "patient_id"),
+            ("patient__user__username", "patient"),
+            ("notes", "notes"),
+            ("prescription", "prescription"),
+        ],
+        "date_field": "created_at",
+        "filters": {"doctor"},
+    },
+    "notifications": {
+        "model": Notification,
+        "columns": [
+            ("id", "id"),
+            ("created_at", "created_at"),
+            ("patient_id", "patient_id"),
+            ("patient__user__username", "patient"),
+            ("is_read", "is_read"),
+            ("message", "message"),
+        ],
+        "date_field": "created_at",
+        "filters": set(),
+    },
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def build_queryset(dataset, start=None, end=None, doctor=None, status=None):
+    """Filtered queryset for ``dataset``; raises ExportError on bad input."""
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown dataset {dataset!r}; choose from {', '.join(DATASETS)}")
+    spec = DATASETS[dataset]
+    queryset = spec["model"].objects.all()
+
+    for name, value in (("doctor", doctor), ("status", status)):
+        if value and name not in spec["filters"]:
+            raise ExportError(f"{dataset} can't be filtered by {name}")
+    if doctor:
+        queryset = queryset.filter(doctor_id=doctor)
+    if status:
+        by_label = {label.lower(): value for value, label in Appointment.Status.choices}
+        if str(status).lower() not in by_label:
+            raise ExportError(f"Unknown status {status!r}; choose from {', '.join(Appointment.Status.labels)}")
+        queryset = queryset.filter(status=by_label[str(status).lower()])
+
+    field = spec["date_field"]
+    if field == "date":
+        if start:
+            queryset = queryset.filter(date__gte=start)
+        if end:
+            queryset = queryset.filter(date__lte=end)
+    else:
+        # Compare against the day boundaries so the created_at index is usable.
+        if start:
+            queryset = queryset.filter(**{f"{field}__gte": _day_start(start)})
+        if end:
+            queryset = queryset.filter(**{f"{field}__lt": _day_start(end) + timedelta(days=1)})
+    return queryset
+
+
+def iter_rows(dataset, queryset, chunk_size=CHUNK_SIZE):
+    """Yield lists of row tuples, one chunk at a time, in id order."""
+    lookups = [lookup for lookup, _ in DATASETS[dataset]["columns"]]
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by("id").values_list(*lookups)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1][0]
+
+
+def _value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _labelled(dataset, chunks):
+    """Swap stored numbers for their labels (e.g. status 1 -> "Booked")."""
+    spec = DATASETS[dataset]
+    labels = spec.get("labels")
+    if not labels:
+        yield from chunks
+        return
+    positions = [(i, labels[lookup]) for i, (lookup, _) in enumerate(spec["columns"]) if lookup in labels]
+    for chunk in chunks:
+        rows = []
+        for row in chunk:
+            row = list(row)
+            for i, names in positions:
+                row[i] = names.get(row[i], row[i])
+            rows.append(row)
+        yield rows
+
+
+def encode(dataset, chunks, fmt="csv"):
+    """Turn row chunks into text chunks (header first for CSV)."""
+    headers = [header for _, header in DATASETS[dataset]["columns"]]
+    buffer = io.StringIO()
+    chunks = _labelled(dataset, chunks)
+
+    if fmt == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(headers)
+        for chunk in chunks:
+            writer.writerows([[_value(v) for v in row] for row in chunk])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        for chunk in chunks:
+            for row in chunk:
+                buffer.write(json.dumps(dict(zip(headers, map(_value, row)))))
+                buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+
+def gzipped(text_chunks):
+    """Gzip a stream of text chunks on the fly (bytes out)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for text in text_chunks:
+        data = compressor.compress(text.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(dataset, fmt="csv", gzip=False, chunk_size=CHUNK_SIZE, **filters):
+    """Everything in one go: an iterator of bytes ready to write out.
+
+    Bad arguments raise ExportError here, before anything is streamed.
+    """
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format {fmt!r}; choose from {', '.join(FORMATS)}")
+    queryset = build_queryset(dataset, **filters)
+    text = encode(dataset, iter_rows(dataset, queryset, chunk_size), fmt)
+    if gzip:
+        return gzipped(text)
+    return (chunk.encode() for chunk in text)
+
+
+def filename(dataset, fmt="csv", gzip=False):
+    stamp = timezone.localdate().isoformat()
+    return f"{dataset}-{stamp}.{fmt}" + (".gz" if gzip else "")
@@ -3,7 +3,8 @@ from .models import Appointment, DoctorLeave, MedicalHistory
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import Patient
-from .models import DoctorSchedule
+from .models import DoctorSchedule, ScheduleRule
+from django.utils.dateparse import parse_date
 
 # ----------------------------
 # Patient Sign Up Form
@@ -22,7 +23,19 @@ class PatientSignUpForm(UserCreationForm):
 class DoctorLeaveForm(forms.ModelForm):
     class Meta:
         model = DoctorLeave
-        fields = ["date", "reason"]
+        fields = ["date", "end_date", "reason"]
+        labels = {"date": "From", "end_date": "To (optional)"}
+        widgets = {
+            "date": forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+            "end_date": forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+        }
+
+    def clean(self):
+        cleaned = super().clean()
+        start, end = cleaned.get("date"), cleaned.get("end_date")
+        if start and end and end < start:
+            self.add_error("end_date", "End date cannot be before the start date.")
+        return cleaned
 
 
 # ----------------------------
@@ -67,3 +80,70 @@ class DoctorScheduleForm(forms.ModelForm):
         model = DoctorSchedule
         fields = ["date", "start_time", "end_time"]
 
+
+# ----------------------------
+# Weekly Schedule Rule Form
+# ----------------------------
+class ScheduleRuleForm(forms.ModelForm):
+    exceptions = forms.CharField(
+        required=False,
+        help_text="Dates to skip, comma separated (YYYY-MM-DD)",
+        widget=forms.TextInput(attrs={"class": "form-control"}),
+    )
+
+    class Meta:
+        model = ScheduleRule
+        fields = ["weekday", "start_time", "end_time", "slot_minutes", "valid_from", "valid_until", "exceptions"]
+        labels = {"slot_minutes": "Slot length (minutes, optional)", "valid_until": "Valid until (optional)"}
+        widgets = {
+            "start_time": forms.TimeInput(attrs={"type": "time", "class": "form-control"}),
+            "end_time": forms.TimeInput(attrs={"type": "time", "class": "form-control"}),
+            "valid_from": forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+            "valid_until": forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk and not self.is_bound:
+            self.initial["exceptions"] = ", ".join(self.instance.exceptions)
+
+    def clean_exceptions(self):
+        dates = []
+        for part in self.cleaned_data["exceptions"].replace(";", ",").split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                day = parse_date(part)
+            except ValueError:
+                day = None
+            if day is None:
+                raise forms.ValidationError(f"{part} is not a date (YYYY-MM-DD).")
+            dates.append(day.isoformat())
+        return sorted(set(dates))
+
+    def clean(self):
+        cleaned = super().clean()
+        start, end = cleaned.get("start_time"), cleaned.get("end_time")
+        if start and end and end <= start:
+            self.add_error("end_time", "End time must be after the start time.")
+        first, last = cleaned.get("valid_from"), cleaned.get("valid_until")
+        if first and last and last < first:
+            self.add_error("valid_until", "Valid until cannot be before valid from.")
+        if cleaned.get("slot_minutes") == 0:
+            self.add_error("slot_minutes", "Slot length must be at least one minute.")
+        return cleaned
+
+
+# ----------------------------
+# Bulk Import Form (admin)
+# ----------------------------
+class ImportForm(forms.Form):
+    kind = forms.ChoiceField(choices=[
+        ("doctors", "Doctors"),
+        ("patients", "Patients"),
+        ("schedules", "Schedules"),
+        ("appointments", "Appointments"),
+    ])
+    file = forms.FileField(help_text="CSV with a header row, or JSON lines (.jsonl)")
+    dry_run = forms.BooleanField(required=False, label="Only validate, don't import")
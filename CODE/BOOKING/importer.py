@@ -0,0 +1,437 @@
+# booking/importer.py
+"""
+Bulk import of doctors, patients, schedules and appointments.
+
+Input is CSV (with a header row) or JSON lines, read as a stream. Rows are
+processed in batches:
+
+1. each row is parsed and validated on its own (bad rows are reported with
+   their line number and skipped - the rest of the file still goes in),
+2. cross-row checks run once per batch with one query each (usernames
+   already taken, doctors/patients referenced by username, slots already
+   booked),
+3. plain-text passwords are hashed in a process pool - hashing is
+   deliberately slow and is where nearly all the time goes,
+4. the batch is written with ``bulk_create`` inside its own transaction.
+
+Columns (``*`` = required):
+
+* doctors:      username*, email, first_name, last_name, password |
+                password_hash, specialization*, location
+* patients:     username*, email, first_name, last_name, password |
+                password_hash, phone, age, gender
+* schedules:    doctor* (username), date*, start_time*, end_time*
+* appointments: doctor* (username), patient* (username), date*, time*,
+                status (default Booked)
+
+``password_hash`` takes an already-encoded Django hash (e.g. exported from
+another Django site) and skips hashing. Users without either get an
+unusable password and can set one with the password reset flow.
+"""
+import csv
+import io
+import json
+import os
+import time as clock
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_date, parse_time
+
+from . import directory, search, stamps, stats
+from .models import Appointment, Doctor, DoctorSchedule, Patient
+from .passwords import hash_password, init_worker
+
+KINDS = ("doctors", "patients", "schedules", "appointments")
+BATCH_SIZE = 1000
+STATUS_BY_LABEL = {label.lower(): value for value, label in Appointment.Status.choices}
+
+
+class RowError(ValueError):
+    """A row that can't be imported; the message is shown to the user."""
+
+
+# ----------------------------
+# Reading
+# ----------------------------
+def read_records(stream, fmt="csv"):
+    """Yield ``(line_number, record_dict_or_None, error_or_None)``."""
+    if isinstance(stream, (bytes, bytearray)):
+        stream = io.StringIO(stream.decode("utf-8-sig"))
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, {k.strip(): (v or "").strip() for k, v in record.items() if k}, None
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_number, None, f"invalid JSON: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "expected a JSON object"
+            continue
+        yield line_number, {k: "" if v is None else str(v).strip() for k, v in record.items()}, None
+
+
+def guess_format(name):
+    return "jsonl" if name.lower().removesuffix(".gz").endswith((".jsonl", ".json", ".ndjson")) else "csv"
+
+
+# ----------------------------
+# Row parsing
+# ----------------------------
+_username_validator = UnicodeUsernameValidator()
+
+
+def _required(record, field):
+    value = record.get(field, "")
+    if not value:
+        raise RowError(f"{field} is required")
+    return value
+
+
+def _date(record, field):
+    try:
+        value = parse_date(_required(record, field))
+    except ValueError:  # well formed but not a real date, e.g. 2025-02-30
+        value = None
+    if value is None:
+        raise RowError(f"{field}: expected YYYY-MM-DD")
+    return value
+
+
+def _time(record, field):
+    try:
+        value = parse_time(_required(record, field))
+    except ValueError:
+        value = None
+    if value is None:
+        raise RowError(f"{field}: expected HH:MM")
+    return value
+
+
+def _user(record):
+    username = _required(record, "username")
+    try:
+        _username_validator(username)
+    except ValidationError as exc:
+        raise RowError(f"username {username!r} is not valid") from exc
+    if len(username) > 150:
+        raise RowError("username is longer than 150 characters")
+    email = record.get("email", "")
+    if email:
+        try:
+            validate_email(email)
+        except ValidationError as exc:
+            raise RowError(f"email {email!r} is not valid") from exc
+    password_hash = record.get("password_hash", "")
+    if password_hash:
+        try:
+            identify_hasher(password_hash)
+        except ValueError as exc:
+            raise RowError("password_hash is not a recognised Django password hash") from exc
+    return {
+        "username": username,
+        "email": email,
+        "first_name": record.get("first_name", "")[:150],
+        "last_name": record.get("last_name", "")[:150],
+        "password": record.get("password", ""),
+        "password_hash": password_hash,
+    }
+
+
+def _parse_doctor(record):
+    row = _user(record)
+    row["specialization"] = _required(record, "specialization")[:100]
+    row["location"] = (record.get("location") or "Unknown")[:100]
+    return row
+
+
+def _parse_patient(record):
+    row = _user(record)
+    age = record.get("age", "")
+    if age and not age.isdigit():
+        raise RowError("age must be a whole number")
+    row["age"] = int(age) if age else None
+    row["gender"] = record.get("gender", "")[:10] or None
+    row["phone"] = record.get("phone", "")[:15] or None
+    return row
+
+
+def _parse_schedule(record):
+    row = {
+        "doctor": _required(record, "doctor"),
+        "date": _date(record, "date"),
+        "start_time": _time(record, "start_time"),
+        "end_time": _time(record, "end_time"),
+    }
+    if row["end_time"] <= row["start_time"]:
+        raise RowError("end_time must be after start_time")
+    return row
+
+
+def _parse_appointment(record):
+    label = record.get("status") or "Booked"
+    status = STATUS_BY_LABEL.get(label.strip().lower())
+    if status is None:
+        raise RowError(f"status must be one of {', '.join(stats.STATUSES)}")
+    return {
+        "doctor": _required(record, "doctor"),
+        "patient": _required(record, "patient"),
+        "date": _date(record, "date"),
+        "time": _time(record, "time"),
+        "status": status,
+    }
+
+
+PARSERS = {
+    "doctors": _parse_doctor,
+    "patients": _parse_patient,
+    "schedules": _parse_schedule,
+    "appointments": _parse_appointment,
+}
+
+
+# ----------------------------
+# Password hashing
+# ----------------------------
+def _hash_passwords(rows, pool):
+    """Fill ``row["encoded"]`` for every row, hashing plain passwords in ``pool``."""
+    plain = [row for row in rows if row["password"] and not row["password_hash"]]
+    passwords = [row["password"] for row in plain]
+    hashed = pool.map(hash_password, passwords, chunksize=16) if pool else map(hash_password, passwords)
+    for row, encoded in zip(plain, hashed):
+        row["encoded"] = encoded
+    for row in rows:
+        if "encoded" not in row:
+            row["encoded"] = row["password_hash"] or make_password(None)
+
+
+# ----------------------------
+# Batch checks and inserts
+# ----------------------------
+def _check_users(rows, seen, fail):
+    taken = set(
+        User.objects.filter(username__in=[row["username"] for _, row in rows]).values_list("username", flat=True)
+    )
+    good = []
+    for line, row in rows:
+        if row["username"] in taken:
+            fail(line, f"username {row['username']!r} already exists")
+        elif row["username"] in seen:
+            fail(line, f"username {row['username']!r} appears earlier in the file")
+        else:
+            seen.add(row["username"])
+            good.append((line, row))
+    return good
+
+
+def _insert_users(rows, profile):
+    users = User.objects.bulk_create([
+        User(username=row["username"], email=row["email"], first_name=row["first_name"],
+             last_name=row["last_name"], password=row["encoded"])
+        for row in rows
+    ])
+    if any(user.pk is None for user in users):  # backend can't return ids from bulk inserts
+        ids = dict(User.objects.filter(username__in=[u.username for u in users]).values_list("username", "id"))
+        for user in users:
+            user.pk = ids[user.username]
+    return [profile(user, row) for user, row in zip(users, rows)]
+
+
+def _insert_doctors(rows):
+    doctors = Doctor.objects.bulk_create(_insert_users(rows, lambda user, row: Doctor(
+        user=user, specialization=row["specialization"], location=row["location"]
+    )))
+    # bulk_create skips the signals that keep the directory and search current.
+    directory.invalidate()
+    search.index_doctors(Doctor.objects.filter(user_id__in=[d.user_id for d in doctors]).values_list("id", flat=True))
+    return len(doctors)
+
+
+def _insert_patients(rows):
+    return len(Patient.objects.bulk_create(_insert_users(rows, lambda user, row: Patient(
+        user=user, phone=row["phone"], age=row["age"], gender=row["gender"]
+    ))))
+
+
+def _resolve(model, usernames):
+    return dict(model.objects.filter(user__username__in=usernames).values_list("user__username", "id"))
+
+
+def _check_schedules(rows, seen, fail):
+    doctors = _resolve(Doctor, {row["doctor"] for _, row in rows})
+    good = []
+    for line, row in rows:
+        if row["doctor"] not in doctors:
+            fail(line, f"unknown doctor {row['doctor']!r}")
+            continue
+        row["doctor_id"] = doctors[row["doctor"]]
+        good.append((line, row))
+    return good
+
+
+def _insert_schedules(rows):
+    return len(DoctorSchedule.objects.bulk_create([
+        DoctorSchedule(doctor_id=row["doctor_id"], date=row["date"],
+                       start_time=row["start_time"], end_time=row["end_time"])
+        for row in rows
+    ]))
+
+
+def _check_appointments(rows, seen, fail):
+    doctors = _resolve(Doctor, {row["doctor"] for _, row in rows})
+    patients = _resolve(Patient, {row["patient"] for _, row in rows})
+    resolved = []
+    for line, row in rows:
+        if row["doctor"] not in doctors:
+            fail(line, f"unknown doctor {row['doctor']!r}")
+        elif row["patient"] not in patients:
+            fail(line, f"unknown patient {row['patient']!r}")
+        else:
+            row["doctor_id"] = doctors[row["doctor"]]
+            row["patient_id"] = patients[row["patient"]]
+            resolved.append((line, row))
+
+    # Active slots already in the database for the doctors/days in this batch.
+    active = [(line, row) for line, row in resolved if row["status"] != Appointment.Status.CANCELLED]
+    booked = set(
+        Appointment.objects.filter(
+            doctor_id__in={row["doctor_id"] for _, row in active},
+            date__in={row["date"] for _, row in active},
+        ).exclude(status=Appointment.Status.CANCELLED).values_list("doctor_id", "date", "time")
+    ) if active else set()
+
+    good = []
+    for line, row in resolved:
+        slot = (row["doctor_id"], row["date"], row["time"])
+        if row["status"] != Appointment.Status.CANCELLED:
+            if slot in booked:
+                fail(line, f"{row['doctor']} already has an appointment on {row['date']} at {row['time']}")
+                continue
+            if slot in seen:
+                fail(line, f"slot {row['date']} {row['time']} for {row['doctor']} appears earlier in the file")
+                continue
+            seen.add(slot)
+        good.append((line, row))
+    return good
+
+
+def _insert_appointments(rows):
+    created = Appointment.objects.bulk_create([
+        Appointment(doctor_id=row["doctor_id"], patient_id=row["patient_id"],
+                    date=row["date"], time=row["time"], status=row["status"])
+        for row in rows
+    ])
+    stats.record([(row["doctor_id"], row["date"], row["status"], +1) for row in rows])
+    stamps.touch(doctors=[row["doctor_id"] for row in rows], patients=[row["patient_id"] for row in rows])
+    return len(created)
+
+
+CHECKS = {
+    "doctors": _check_users,
+    "patients": _check_users,
+    "schedules": _check_schedules,
+    "appointments": _check_appointments,
+}
+INSERTS = {
+    "doctors": _insert_doctors,
+    "patients": _insert_patients,
+    "schedules": _insert_schedules,
+    "appointments": _insert_appointments,
+}
+
+
+# ----------------------------
+# Driver
+# ----------------------------
+def _insert(kind, rows, fail):
+    """Insert a checked batch; if it still fails, retry row by row."""
+    try:
+        with transaction.atomic():
+            return INSERTS[kind]([row for _, row in rows])
+    except IntegrityError:
+        # Something changed under us (e.g. a concurrent booking). Find the
+        # offending rows instead of losing the whole batch.
+        created = 0
+        for line, row in rows:
+            try:
+                with transaction.atomic():
+                    created += INSERTS[kind]([row])
+            except IntegrityError as exc:
+                fail(line, f"rejected by the database: {exc}")
+        return created
+
+
+def run(kind, records, batch_size=BATCH_SIZE, workers=None, dry_run=False, on_error=None, on_batch=None):
+    """Import ``records`` (from ``read_records``) of the given kind.
+
+    ``on_error(line, message)`` is called for each rejected row and
+    ``on_batch(result)`` after every batch. Returns a dict with ``rows``,
+    ``created``, ``errors`` and ``seconds``. With ``dry_run`` everything is
+    validated (including the database checks) but nothing is written.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown import kind {kind!r}; choose from {', '.join(KINDS)}")
+    result = {"rows": 0, "created": 0, "errors": 0, "seconds": 0.0}
+    started = clock.perf_counter()
+
+    batch_errors = []
+
+    def fail(line, message):
+        result["errors"] += 1
+        batch_errors.append((line, message))
+
+    needs_hashing = kind in ("doctors", "patients") and not dry_run
+    workers = workers if workers is not None else getattr(settings, "BOOKING_IMPORT_WORKERS", os.cpu_count() or 1)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker) if needs_hashing and workers > 1 else None
+
+    seen = set()
+    records = iter(records)
+    try:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            result["rows"] += len(batch)
+
+            parsed = []
+            for line, record, error in batch:
+                if error:
+                    fail(line, error)
+                    continue
+                try:
+                    parsed.append((line, PARSERS[kind](record)))
+                except RowError as exc:
+                    fail(line, str(exc))
+
+            good = CHECKS[kind](parsed, seen, fail) if parsed else []
+            if good and not dry_run:
+                if needs_hashing:
+                    _hash_passwords([row for _, row in good], pool)
+                result["created"] += _insert(kind, good, fail)
+
+            # Report in file order, whichever step rejected the row.
+            if on_error:
+                for line, message in sorted(batch_errors):
+                    on_error(line, message)
+            batch_errors.clear()
+            result["seconds"] = clock.perf_counter() - started
+            if on_batch:
+                on_batch(result)
+    finally:
+        if pool:
+            pool.shutdown()
+    result["seconds"] = clock.perf_counter() - started
+    return result
@@ -0,0 +1,362 @@
+# booking/loadtest.py
+"""
+Load tests for the booking flows (driven by ``manage.py loadtest``).
+
+``seed`` creates a reproducible clinic with:
+
+* N doctors with weekday schedules
+* N patients
+* a history of appointments behind and ahead of today
+
+All of it is tagged with the ``lt_`` username prefix, so ``cleanup`` can
+remove it again.
+
+``run`` forks worker processes. Each worker logs a few patients and
+doctors in with Django's test client and fires a weighted random mix of
+SCENARIOS at the real URL configuration: middleware, templates, database
+and all. Preparation such as finding a free slot or an appointment to
+cancel happens outside the timed part, so every sample is exactly one
+request.
+
+The result is plain JSON. Latency percentiles are exact (nearest rank).
+``compare`` flags scenarios that got slower or handled fewer requests
+than a saved baseline.
+"""
+import multiprocessing
+import random
+import time as clock
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import OperationalError, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from . import directory, search, stats
+from .availability import free_slots
+from .models import Appointment, Doctor, OutboxMessage, Patient, ScheduleRule
+from .services import SlotTaken, book_slot
+
+PREFIX = "lt_"
+PHONE_PREFIX = "+1555"
+SPECIALIZATIONS = [
+    "Cardiology", "Dermatology", "General Medicine", "Neurology", "Orthopedics",
+    "Pediatrics", "Psychiatry", "Radiology", "ENT", "Ophthalmology",
+]
+LOCATIONS = ["North Wing", "South Wing", "City Centre", "Riverside", "Old Town"]
+DEFAULT_MIX = "home=30,search=20,dashboard=20,book=10,report=10,cancel=8,leave=2"
+STATUS = Appointment.Status
+
+
+# ----------------------------
+# Data
+# ----------------------------
+def seeded():
+    return User.objects.filter(username__startswith=PREFIX).exists()
+
+
+def seed(doctors=50, patients=500, history_days=60, ahead_days=14, per_day=8, rng_seed=1):
+    """Create the load-test clinic; returns a dict of row counts."""
+    rng = random.Random(rng_seed)
+    today = timezone.localdate()
+
+    users = User.objects.bulk_create(
+        [User(username=f"{PREFIX}doc{i}", password="!") for i in range(doctors)]
+        + [User(username=f"{PREFIX}pat{i}", password="!") for i in range(patients)],
+        batch_size=1000,
+    )
+    doctor_rows = Doctor.objects.bulk_create([
+        Doctor(user=user, specialization=SPECIALIZATIONS[i % len(SPECIALIZATIONS)], location=rng.choice(LOCATIONS))
+        for i, user in enumerate(users[:doctors])
+    ])
+    patient_rows = Patient.objects.bulk_create([
+        Patient(user=user, age=rng.randint(1, 90), phone=f"{PHONE_PREFIX}{i:07d}")
+        for i, user in enumerate(users[doctors:])
+    ], batch_size=1000)
+
+    ScheduleRule.objects.bulk_create([
+        ScheduleRule(doctor=doctor, weekday=weekday, start_time=time(9), end_time=time(17),
+                     valid_from=today - timedelta(days=history_days))
+        for doctor in doctor_rows for weekday in range(5)
+    ])
+
+    # Half-hour slots 09:00-16:30; a few of them taken on each working day.
+    slots = [time(9 + n // 2, 30 * (n % 2)) for n in range(16)]
+    appointments = []
+    for doctor in doctor_rows:
+        for offset in range(-history_days, ahead_days):
+            day = today + timedelta(days=offset)
+            if day.weekday() >= 5:
+                continue
+            for at in rng.sample(slots, min(per_day, len(slots))):
+                if offset < 0:
+                    status = STATUS.COMPLETED if rng.random() < 0.85 else STATUS.CANCELLED
+                else:
+                    status = rng.choices([STATUS.BOOKED, STATUS.CONFIRMED, STATUS.CANCELLED], [7, 2, 1])[0]
+                appointments.append(Appointment(
+                    doctor=doctor, patient=rng.choice(patient_rows), date=day, time=at, status=status
+                ))
+    Appointment.objects.bulk_create(appointments, batch_size=5000)
+
+    doctor_ids = [doctor.id for doctor in doctor_rows]
+    stats.rebuild(doctor_ids)
+    search.index_doctors(doctor_ids)
+    directory.invalidate()
+    return {"doctors": doctors, "patients": patients, "appointments": len(appointments)}
+
+
+def cleanup():
+    """Remove everything ``seed`` (and a run) created."""
+    patient_ids = [str(pk) for pk in Patient.objects.filter(user__username__startswith=PREFIX).values_list("id", flat=True)]
+    OutboxMessage.objects.filter(recipient__startswith=PHONE_PREFIX).delete()
+    OutboxMessage.objects.filter(channel="inapp", recipient__in=patient_ids).delete()
+    deleted, _ = User.objects.filter(username__startswith=PREFIX).delete()
+    directory.invalidate()
+    return deleted
+
+
+# ----------------------------
+# Scenarios
+# ----------------------------
+# Each takes the worker context and returns a zero-argument callable that
+# makes the one timed request (or None when there is nothing to do).
+
+def _home(ctx):
+    client = ctx.patient()
+    return lambda: client.get("/home/")
+
+
+def _search(ctx):
+    client = ctx.patient()
+    term = ctx.rng.choice(SPECIALIZATIONS + LOCATIONS)[: ctx.rng.randint(3, 8)]
+    return lambda: client.get("/search-doctors/", {"q": term})
+
+
+def _dashboard(ctx):
+    client = ctx.doctor()
+    window = ctx.rng.choice(["upcoming", "past", "all"])
+    return lambda: client.get("/doctor-dashboard/", {"window": window})
+
+
+def _report(ctx):
+    client = ctx.doctor()
+    return lambda: client.get("/doctor-report/", {"period": ctx.rng.choice(["week", "month"])})
+
+
+def _book(ctx):
+    client = ctx.patient()
+    doctor_id = ctx.rng.choice(ctx.doctor_ids)
+    start = timezone.localdate() + timedelta(days=1)
+    free = [(day, at) for day, times in free_slots([doctor_id], start, start + timedelta(days=13)).get(doctor_id, {}).items()
+            for at in times]
+    if not free:
+        return None
+    day, at = ctx.rng.choice(free)
+    return lambda: client.post("/book/", {"doctor": doctor_id, "date": day.isoformat(), "time": at.strftime("%H:%M")})
+
+
+def _cancel(ctx):
+    client = ctx.patient()
+    patient = client.patient
+    appointment_id = (
+        Appointment.objects.filter(patient=patient, status__in=[STATUS.BOOKED, STATUS.CONFIRMED],
+                                   date__gt=timezone.localdate())
+        .values_list("id", flat=True).first()
+    )
+    if appointment_id is None:
+        # Nothing to cancel yet: book something first (not timed).
+        doctor = Doctor.objects.get(pk=ctx.rng.choice(ctx.doctor_ids))
+        start = timezone.localdate() + timedelta(days=1)
+        for day, times in free_slots([doctor.id], start, start + timedelta(days=13)).get(doctor.id, {}).items():
+            if times:
+                try:
+                    appointment_id = book_slot(doctor, patient, day, times[0]).id
+                except SlotTaken:
+                    return None
+                break
+        if appointment_id is None:
+            return None
+    return lambda: client.post(f"/cancel/{appointment_id}/")
+
+
+def _leave(ctx):
+    client = ctx.doctor()
+    day = timezone.localdate() + timedelta(days=ctx.rng.randint(1, 13))
+    return lambda: client.post("/doctor/apply-leave/", {"date": day.isoformat(), "reason": "load test"})
+
+
+SCENARIOS = {
+    "home": _home,
+    "search": _search,
+    "dashboard": _dashboard,
+    "book": _book,
+    "report": _report,
+    "cancel": _cancel,
+    "leave": _leave,
+}
+
+
+def parse_mix(text):
+    """``"home=30,search=20"`` -> ``{"home": 30, "search": 20}``."""
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    if not mix or not any(mix.values()):
+        raise ValueError("The scenario mix is empty")
+    return mix
+
+
+# ----------------------------
+# Driver
+# ----------------------------
+class _Context:
+    def __init__(self, rng, patients, doctors, doctor_ids):
+        self.rng = rng
+        self.patients = patients
+        self.doctors = doctors
+        self.doctor_ids = doctor_ids
+
+    def patient(self):
+        return self.rng.choice(self.patients)
+
+    def doctor(self):
+        return self.rng.choice(self.doctors)
+
+
+def _client(user):
+    client = Client(raise_request_exception=False)
+    for attempt in range(5):
+        try:
+            client.force_login(user)
+            return client
+        except OperationalError:
+            # e.g. SQLite "database is locked" while other workers write
+            clock.sleep(0.1 * (attempt + 1))
+    client.force_login(user)
+    return client
+
+
+def _worker(job):
+    index, requests, warmup, mix, rng_seed = job
+    connections.close_all()     # never share the parent's connection after fork
+    rng = random.Random(rng_seed * 1000 + index)
+
+    patients = list(Patient.objects.filter(user__username__startswith=PREFIX).select_related("user").order_by("id"))
+    doctors = list(Doctor.objects.filter(user__username__startswith=PREFIX).select_related("user").order_by("id"))
+    patient_clients = []
+    for patient in rng.sample(patients, min(5, len(patients))):
+        client = _client(patient.user)
+        client.patient = patient
+        patient_clients.append(client)
+    doctor_clients = [_client(doctor.user) for doctor in rng.sample(doctors, min(3, len(doctors)))]
+    ctx = _Context(rng, patient_clients, doctor_clients, [doctor.id for doctor in doctors])
+
+    names, weights = list(mix), list(mix.values())
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    skipped = {name: 0 for name in names}
+    for n in range(warmup + requests):
+        name = rng.choices(names, weights)[0]
+        try:
+            request = SCENARIOS[name](ctx)
+        except OperationalError:
+            request = None      # the untimed preparation lost a lock race
+        if request is None:
+            skipped[name] += 1
+            continue
+        started = clock.perf_counter()
+        try:
+            response = request()
+            failed = response.status_code >= 400
+        except Exception:
+            failed = True
+        elapsed = clock.perf_counter() - started
+        if n < warmup:
+            continue
+        latencies[name].append(elapsed)
+        errors[name] += failed
+    connections.close_all()
+    return {"latencies": latencies, "errors": errors, "skipped": skipped}
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * fraction // 1))   # nearest rank, ceil
+    return ordered[int(rank) - 1]
+
+
+def run(requests=2000, workers=4, warmup=20, mix=None, rng_seed=1):
+    """Fire ``requests`` (split over ``workers`` processes); returns the results dict."""
+    mix = mix or parse_mix(DEFAULT_MIX)
+    per_worker = [requests // workers + (1 if i < requests % workers else 0) for i in range(workers)]
+    jobs = [(i, n, warmup, mix, rng_seed) for i, n in enumerate(per_worker)]
+
+    overrides = {
+        "ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"],
+        "BOOKING_OUTBOX_EAGER": False,     # leave delivery to the worker, as in production
+    }
+    with override_settings(**overrides):
+        connections.close_all()
+        started = clock.perf_counter()
+        if workers == 1:
+            parts = [_worker(jobs[0])]
+        else:
+            with multiprocessing.get_context("fork").Pool(workers) as pool:
+                parts = pool.map(_worker, jobs)
+        elapsed = clock.perf_counter() - started
+
+    scenarios = {}
+    for name in mix:
+        samples = sorted(t for part in parts for t in part["latencies"][name])
+        errors = sum(part["errors"][name] for part in parts)
+        scenarios[name] = {
+            "requests": len(samples),
+            "errors": errors,
+            "skipped": sum(part["skipped"][name] for part in parts),
+            "rps": len(samples) / elapsed if elapsed else 0.0,
+            "mean_ms": sum(samples) / len(samples) * 1000 if samples else 0.0,
+            "p50_ms": _percentile(samples, 0.50) * 1000,
+            "p95_ms": _percentile(samples, 0.95) * 1000,
+            "p99_ms": _percentile(samples, 0.99) * 1000,
+            "max_ms": samples[-1] * 1000 if samples else 0.0,
+        }
+    total = sum(s["requests"] for s in scenarios.values())
+    return {
+        "elapsed_s": elapsed,
+        "requests": total,
+        "errors": sum(s["errors"] for s in scenarios.values()),
+        "rps": total / elapsed if elapsed else 0.0,
+        "workers": workers,
+        "mix": mix,
+        "seed": rng_seed,
+        "scenarios": scenarios,
+    }
+
+
+def compare(current, baseline, tolerance=10.0, floor_ms=1.0):
+    """Regressions of ``current`` against ``baseline`` as readable strings.
+
+    A scenario regresses when its p95 grew by more than ``tolerance``
+    percent (and by at least ``floor_ms``, so sub-millisecond noise
+    doesn't count), or when its throughput fell by more than
+    ``tolerance`` percent.
+    """
+    problems = []
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or not before["requests"] or not now["requests"]:
+            continue
+        slower = now["p95_ms"] - before["p95_ms"]
+        if slower > floor_ms and now["p95_ms"] > before["p95_ms"] * (1 + tolerance / 100):
+            problems.append(f"{name}: p95 {before['p95_ms']:.1f} -> {now['p95_ms']:.1f} ms")
+        if now["rps"] < before["rps"] * (1 - tolerance / 100):
+            problems.append(f"{name}: throughput {before['rps']:.1f} -> {now['rps']:.1f} req/s")
+        if now["errors"] > before["errors"]:
+            problems.append(f"{name}: errors {before['errors']} -> {now['errors']}")
+    return problems
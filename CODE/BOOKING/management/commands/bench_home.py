@@ -0,0 +1,88 @@
+"""
+Measure home page throughput with a cold and a warm doctor directory cache.
+
+    python manage.py bench_home --doctors 200 --requests 500
+
+Seed doctors are created inside a transaction that is rolled back at the
+end, and the directory cache is invalidated afterwards.
+
+When MetricsMiddleware is installed the warm run is repeated with and
+without it to show what the instrumentation costs (best of three each).
+"""
+import time as clock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from booking import directory
+from booking.models import Doctor, Patient
+
+METRICS_MIDDLEWARE = "booking.middleware.MetricsMiddleware"
+
+
+class Command(BaseCommand):
+    help = "Report home page requests/sec with a cold and a warm doctor directory cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--doctors", type=int, default=200)
+        parser.add_argument("--requests", type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                self._run(options["doctors"], options["requests"])
+                transaction.set_rollback(True)
+        finally:
+            directory.invalidate()
+
+    def _run(self, doctor_count, requests):
+        users = User.objects.bulk_create(
+            [User(username=f"bench_home_doc{i}", email=f"doc{i}@example.com") for i in range(doctor_count)]
+        )
+        Doctor.objects.bulk_create([Doctor(user=u, specialization=f"Spec{i % 10}") for i, u in enumerate(users)])
+        patient = Patient.objects.create(user=User.objects.create(username="bench_home_patient"))
+
+        client = Client()
+        client.force_login(patient.user)
+        url = reverse("home")
+
+        results = {}
+        for label, cold in (("cold", True), ("warm", False)):
+            client.get(url)  # warm-up (fills the cache for the warm run)
+            started = clock.perf_counter()
+            for _ in range(requests):
+                if cold:
+                    directory.invalidate()
+                client.get(url)
+            elapsed = clock.perf_counter() - started
+            results[label] = requests / elapsed
+            self.stdout.write(f"{label:<5} cache: {results[label]:8.1f} req/s  ({elapsed / requests * 1000:.2f} ms/req)")
+
+        self.stdout.write(f"speed-up: {results['warm'] / results['cold']:.2f}x with {doctor_count} doctors")
+
+        if METRICS_MIDDLEWARE in settings.MIDDLEWARE:
+            without = [name for name in settings.MIDDLEWARE if name != METRICS_MIDDLEWARE]
+            best = {"with": float("inf"), "without": float("inf")}
+            for _ in range(3):
+                best["with"] = min(best["with"], self._time(client, url, requests))
+                with override_settings(MIDDLEWARE=without):
+                    bare = Client()
+                    bare.force_login(patient.user)
+                    best["without"] = min(best["without"], self._time(bare, url, requests))
+            overhead = (best["with"] / best["without"] - 1) * 100
+            self.stdout.write(
+                f"metrics: {best['with'] / requests * 1000:.3f} ms/req with, "
+                f"{best['without'] / requests * 1000:.3f} ms/req without ({overhead:+.1f}%)"
+            )
+
+    def _time(self, client, url, requests):
+        client.get(url)
+        started = clock.perf_counter()
+        for _ in range(requests):
+            client.get(url)
+        return clock.perf_counter() - started
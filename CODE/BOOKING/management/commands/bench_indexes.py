@@ -0,0 +1,167 @@
+"""
+Benchmark the hot appointment/notification queries with and without the
+composite indexes from migration 0002.
+
+    python manage.py bench_indexes --rows 1000000
+
+Seeds ``--rows`` appointments (plus a tenth as many notifications and
+medical history rows) for throwaway doctors and patients, then runs each
+query shape ``--repeat`` times with the indexes dropped and again with them
+in place, printing the EXPLAIN plan and p50/p99 latency for both. Seed data
+is deleted afterwards unless ``--keep`` is given. Point it at a scratch
+database: dropping indexes on a live one will hurt.
+"""
+import random
+import time as clock
+from datetime import time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from booking.models import Appointment, Doctor, MedicalHistory, Notification, Patient
+
+PREFIX = "bench_idx_"
+Status = Appointment.Status
+STATUSES = [Status.BOOKED] * 5 + [Status.CONFIRMED] * 2 + [Status.COMPLETED] * 2 + [Status.CANCELLED]
+SLOTS_PER_DAY = 16
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = "Seed appointments and compare EXPLAIN plans and latencies with and without the query indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--doctors", type=int, default=200)
+        parser.add_argument("--patients", type=int, default=20_000)
+        parser.add_argument("--repeat", type=int, default=200)
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded rows")
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        try:
+            doctors, patients = self._seed(options)
+            queries = self._queries(doctors, patients)
+            models = [Appointment, Notification, MedicalHistory]
+
+            self._drop_indexes(models)
+            before = self._measure(queries, options["repeat"], "without indexes")
+            self._create_indexes(models)
+            after = self._measure(queries, options["repeat"], "with indexes")
+
+            self.stdout.write("\nSummary (ms)")
+            for name in queries:
+                self.stdout.write(
+                    f"  {name:<24} p50 {before[name][0]:8.3f} -> {after[name][0]:8.3f}   "
+                    f"p99 {before[name][1]:8.3f} -> {after[name][1]:8.3f}"
+                )
+        finally:
+            if not options["keep"]:
+                self._cleanup()
+
+    # ----------------------------
+    # Seeding
+    # ----------------------------
+    def _seed(self, options):
+        started = clock.perf_counter()
+        users = User.objects.bulk_create(
+            [User(username=f"{PREFIX}doc{i}") for i in range(options["doctors"])]
+            + [User(username=f"{PREFIX}pat{i}") for i in range(options["patients"])],
+            batch_size=5000,
+        )
+        doctors = Doctor.objects.bulk_create(
+            [Doctor(user=u, specialization="Bench") for u in users[: options["doctors"]]]
+        )
+        patients = Patient.objects.bulk_create(
+            [Patient(user=u) for u in users[options["doctors"]:]], batch_size=5000
+        )
+
+        first_day = now().date() - timedelta(days=365)
+        chunk = []
+        for i in range(options["rows"]):
+            # Walk the slots of each doctor in turn so (doctor, date, time) stays unique.
+            slot = i // len(doctors)
+            chunk.append(Appointment(
+                doctor=doctors[i % len(doctors)],
+                patient=random.choice(patients),
+                date=first_day + timedelta(days=slot // SLOTS_PER_DAY),
+                time=time(9 + (slot % SLOTS_PER_DAY) // 2, 30 * (slot % 2)),
+                status=random.choice(STATUSES),
+            ))
+            if len(chunk) == 10_000:
+                self._flush(Appointment, chunk)
+
+        self._flush(Appointment, chunk)
+        for i in range(options["rows"] // 10):
+            chunk.append(Notification(patient=random.choice(patients), message="Reminder"))
+            if len(chunk) == 10_000:
+                self._flush(Notification, chunk)
+        self._flush(Notification, chunk)
+        for i in range(options["rows"] // 10):
+            chunk.append(MedicalHistory(patient=random.choice(patients), doctor=random.choice(doctors), notes="Checkup"))
+            if len(chunk) == 10_000:
+                self._flush(MedicalHistory, chunk)
+        self._flush(MedicalHistory, chunk)
+
+        self.stdout.write(f"Seeded {options['rows']} appointments in {clock.perf_counter() - started:.1f}s")
+        return doctors, patients
+
+    def _flush(self, model, chunk):
+        with transaction.atomic():
+            model.objects.bulk_create(chunk)
+        chunk.clear()
+
+    def _cleanup(self):
+        Appointment.objects.filter(doctor__user__username__startswith=PREFIX).delete()
+        MedicalHistory.objects.filter(doctor__user__username__startswith=PREFIX).delete()
+        Notification.objects.filter(patient__user__username__startswith=PREFIX).delete()
+        User.objects.filter(username__startswith=PREFIX).delete()
+
+    # ----------------------------
+    # Measuring
+    # ----------------------------
+    def _queries(self, doctors, patients):
+        today = now().date()
+        doctor, patient = doctors[len(doctors) // 2], patients[len(patients) // 2]
+        return {
+            "patient_upcoming": Appointment.objects.filter(patient=patient, date__gte=today).order_by("date", "time", "id")[:25],
+            "doctor_dashboard": Appointment.objects.filter(doctor=doctor, date__gte=today).order_by("date", "time", "id")[:25],
+            "leave_cancellation": Appointment.objects.filter(doctor=doctor, date=today, status=Status.BOOKED),
+            "daily_appointments": Appointment.objects.filter(date=today).order_by("date", "time", "id")[:25],
+            "notifications": Notification.objects.filter(patient=patient).order_by("-created_at")[:25],
+            "medical_history": MedicalHistory.objects.filter(patient=patient).order_by("-created_at")[:25],
+        }
+
+    def _measure(self, queries, repeat, label):
+        self.stdout.write(f"\n=== {label} ===")
+        results = {}
+        for name, queryset in queries.items():
+            samples = []
+            for _ in range(repeat):
+                started = clock.perf_counter()
+                list(queryset.all())
+                samples.append((clock.perf_counter() - started) * 1000)
+            results[name] = (percentile(samples, 50), percentile(samples, 99))
+            self.stdout.write(f"-- {name}: p50 {results[name][0]:.3f} ms, p99 {results[name][1]:.3f} ms")
+            self.stdout.write("   " + queryset.explain().replace("\n", "\n   "))
+        return results
+
+    def _drop_indexes(self, models):
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+
+    def _create_indexes(self, models):
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
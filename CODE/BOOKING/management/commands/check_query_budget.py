@@ -0,0 +1,181 @@
+"""
+Check that the list views run a fixed number of queries.
+
+    python manage.py check_query_budget
+
+Every view is rendered twice - once with a handful of rows and once with
+many more - and the number of SQL queries is recorded. The command fails
+(non-zero exit) if a view goes over its budget or if the count grows with
+the number of rows, which is what an N+1 regression looks like. All seed
+data is created inside a transaction that is rolled back at the end.
+
+The dashboards with an ETag (booking/stamps.py) are then asked again with
+If-None-Match: nothing changed, so they must answer 304 within
+REVALIDATE_BUDGET queries.
+
+The test suite checks the same budgets (booking/tests/test_query_budget.py);
+this command is for trying other row counts by hand.
+"""
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+
+from booking import directory, routers
+from booking.models import Appointment, Doctor, DoctorSchedule, MedicalHistory, Notification, Patient, WaitlistEntry
+
+# Maximum number of queries per view (session + auth + the view's own queries).
+BUDGETS = {
+    "home": 4,
+    "search_doctors": 4,
+    "book_appointment": 3,
+    "my_appointments": 5,
+    "patient_history": 5,
+    "my_waitlist": 4,
+    "patient_medical_history": 4,
+    "my_notifications": 4,
+    "doctor_dashboard": 5,
+    "doctor_report": 6,
+    "doctor_schedule_list": 11,   # availability also reads held waitlist slots
+    "view_medical_history": 6,
+    "my_timeline": 6,
+    "patient_timeline": 8,
+    "daily_appointments": 5,
+    "api_v1:appointments": 3,
+    "api_v1:notifications": 4,
+    "api_v1:history": 3,
+    "api_v1:availability": 7,
+}
+
+# Views with an ETag, and what an unchanged reload may cost (session + auth).
+CONDITIONAL = ("my_appointments", "my_notifications", "doctor_dashboard", "doctor_report")
+REVALIDATE_BUDGET = 2
+
+
+def budget_pages(patient, doctor, staff):
+    """``(budget name, user, url)`` for every view with a budget."""
+    today = now().date()
+    return [
+        ("home", patient.user, reverse("home")),
+        ("search_doctors", patient.user, reverse("search_doctors")),
+        ("book_appointment", patient.user, reverse("book_appointment")),
+        ("my_appointments", patient.user, reverse("my_appointments")),
+        ("patient_history", patient.user, reverse("patient_history")),
+        ("my_waitlist", patient.user, reverse("my_waitlist")),
+        ("patient_medical_history", patient.user, reverse("patient_medical_history")),
+        ("my_notifications", patient.user, reverse("my_notifications")),
+        ("doctor_dashboard", doctor.user, reverse("doctor_dashboard")),
+        ("doctor_report", doctor.user, reverse("doctor_report")),
+        ("doctor_schedule_list", doctor.user, reverse("doctor_schedule_list")),
+        ("view_medical_history", doctor.user, reverse("view_medical_history", args=[patient.id])),
+        ("my_timeline", patient.user, reverse("my_timeline")),
+        ("patient_timeline", doctor.user, reverse("patient_timeline", args=[patient.id])),
+        ("daily_appointments", staff, reverse("daily_appointments") + f"?date={today}"),
+        ("api_v1:appointments", patient.user, reverse("api_v1:appointments") + "?window=all"),
+        ("api_v1:notifications", patient.user, reverse("api_v1:notifications")),
+        ("api_v1:history", doctor.user, reverse("api_v1:history") + f"?patient={patient.id}"),
+        ("api_v1:availability", patient.user, reverse("api_v1:availability") + f"?doctors={doctor.id}&days=14"),
+    ]
+
+
+def seed(doctor, patient, start, stop):
+    """Add rows ``start`` .. ``stop`` so every list has (stop) entries."""
+    today = now().date()
+    for i in range(start, stop):
+        other = Doctor.objects.create(user=User.objects.create(username=f"budget_doc{i}"), specialization=f"Spec{i % 5}")
+        Appointment.objects.create(doctor=other, patient=patient, date=today + timedelta(days=i % 7 - 3), time=time(9))
+        Appointment.objects.create(
+            doctor=doctor,
+            patient=Patient.objects.create(user=User.objects.create(username=f"budget_pat{i}")),
+            date=today,
+            time=time(8 + i // 60, i % 60),
+        )
+        DoctorSchedule.objects.create(doctor=doctor, date=today + timedelta(days=i % 14), start_time=time(13), end_time=time(14))
+        MedicalHistory.objects.create(patient=patient, doctor=other, notes="Checkup")
+        Notification.objects.create(patient=patient, message="Reminder")
+        WaitlistEntry.objects.create(doctor=other, patient=patient, date=today + timedelta(days=i % 7))
+
+
+class Command(BaseCommand):
+    help = "Fail if any list view exceeds its query budget or issues per-row queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--small", type=int, default=3, help="Rows per table in the first pass")
+        parser.add_argument("--large", type=int, default=60, help="Rows per table in the second pass")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                failures = self._run(options["small"], options["large"])
+                transaction.set_rollback(True)
+        finally:
+            directory.invalidate()  # drop directory entries built from rolled-back rows
+
+        if failures:
+            raise CommandError("Query budget exceeded:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("All views are within their query budget."))
+
+    def _run(self, small, large):
+        patient = Patient.objects.create(user=User.objects.create(username="budget_patient"))
+        doctor = Doctor.objects.create(user=User.objects.create(username="budget_doctor"), specialization="General")
+        staff = User.objects.create(username="budget_staff", is_staff=True)
+
+        pages = budget_pages(patient, doctor, staff)
+
+        seeded = 0
+        counts, etags = {}, {}
+        for rows in (small, large):
+            seed(doctor, patient, seeded, rows)
+            seeded = rows
+            for name, user, url in pages:
+                queries, etags[name] = self._count(user, url)
+                counts.setdefault(name, []).append(queries)
+
+        failures = []
+        for name, (few, many) in counts.items():
+            self.stdout.write(f"{name:<26} {few:>3} queries ({small} rows)  {many:>3} queries ({large} rows)")
+            if many > few:
+                failures.append(f"{name}: {few} -> {many} queries as rows grow (N+1?)")
+            if many > BUDGETS[name]:
+                failures.append(f"{name}: {many} queries, budget is {BUDGETS[name]}")
+
+        for name, user, url in pages:
+            if name not in CONDITIONAL:
+                continue
+            queries, status = self._revalidate(user, url, etags[name])
+            self.stdout.write(f"{name:<26} {queries:>3} queries to revalidate ({status})")
+            if status != 304:
+                failures.append(f"{name}: unchanged page answered {status}, not 304")
+            elif queries > REVALIDATE_BUDGET:
+                failures.append(f"{name}: {queries} queries to revalidate, budget is {REVALIDATE_BUDGET}")
+        return failures
+
+    def _client(self, user):
+        client = Client()
+        client.force_login(user)
+        # The seed rows are uncommitted, so a replica can't see them; keep
+        # every read on the primary (booking/routers.py).
+        client.cookies[routers.PIN_COOKIE] = "1"
+        client.cookies[settings.CSRF_COOKIE_NAME] = "budget" * 6
+        return client
+
+    def _count(self, user, url):
+        """Queries for a full render, and the response's ETag (if any)."""
+        client = self._client(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f"{url} returned {response.status_code}")
+        return len(queries), response.get("ETag")
+
+    def _revalidate(self, user, url, etag):
+        client = self._client(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag or "")
+        return len(queries), response.status_code
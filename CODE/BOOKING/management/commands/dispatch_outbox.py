@@ -0,0 +1,60 @@
+"""
+Outbox worker: deliver queued SMS / in-app notifications.
+
+    python manage.py dispatch_outbox --threads 8
+    python manage.py dispatch_outbox --once      # drain what is due and exit
+    python manage.py dispatch_outbox --stats     # print queue depth / lag only
+
+Several workers can run side by side; each claims its own batches.
+"""
+import time as clock
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from booking import outbox
+
+
+class Command(BaseCommand):
+    help = "Drain the booking outbox with a thread pool, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--batch", type=int, default=200, help="Messages claimed per round")
+        parser.add_argument("--interval", type=float, default=1.0, help="Sleep when the queue is empty (seconds)")
+        parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between metric lines")
+        parser.add_argument("--once", action="store_true", help="Exit once nothing is due")
+        parser.add_argument("--stats", action="store_true", help="Print queue metrics and exit")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self._report(0, 0, 1.0)
+            return
+
+        sent = failed = 0
+        window_start = clock.monotonic()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+            while True:
+                batch = outbox.claim_batch(options["batch"])
+                if batch:
+                    ok, bad = outbox.dispatch(batch, pool)
+                    sent += ok
+                    failed += bad
+
+                elapsed = clock.monotonic() - window_start
+                if elapsed >= options["report_every"] or (options["once"] and not batch):
+                    self._report(sent, failed, elapsed)
+                    sent = failed = 0
+                    window_start = clock.monotonic()
+
+                if not batch:
+                    if options["once"]:
+                        return
+                    clock.sleep(options["interval"])
+
+    def _report(self, sent, failed, elapsed):
+        queue = outbox.stats()
+        self.stdout.write(
+            f"sent={sent} failed={failed} rate={sent / max(elapsed, 1e-9):.1f} msg/s "
+            f"depth={queue['depth']} dead={queue['failed']} lag={queue['lag']:.1f}s"
+        )
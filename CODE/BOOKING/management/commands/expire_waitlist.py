@@ -0,0 +1,31 @@
+"""
+Expire waitlist offers nobody took up and pass their slots on.
+
+    python manage.py expire_waitlist              # one pass (e.g. from cron)
+    python manage.py expire_waitlist --loop 30    # keep running, every 30s
+
+Each expired offer cascades to the next patient in that day's queue (see
+booking/waitlist.py). Places for days that have passed are closed too.
+Messages go through the outbox, so run dispatch_outbox as well.
+"""
+import time as clock
+
+from django.core.management.base import BaseCommand
+
+from booking.waitlist import CHUNK_SIZE, expire
+
+
+class Command(BaseCommand):
+    help = "Expire waitlist offers whose hold has run out and offer the slots to the next patients."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--loop", type=float, default=0, metavar="SECONDS", help="Repeat every N seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            run = expire(chunk_size=options["chunk"])
+            self.stdout.write(f"expired={run['expired']} offered={run['offered']} closed={run['closed']}")
+            if not options["loop"]:
+                return
+            clock.sleep(options["loop"])
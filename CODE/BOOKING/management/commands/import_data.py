@@ -0,0 +1,87 @@
+"""
+Bulk-import doctors, patients, schedules or appointments from CSV / JSON lines.
+
+    python manage.py import_data patients patients.csv
+    python manage.py import_data doctors doctors.jsonl --workers 8
+    python manage.py import_data appointments history.csv.gz --errors rejected.csv
+    python manage.py import_data patients new.csv --dry-run     # validate only
+
+Bad rows are reported (line number and reason) and skipped; everything else
+is imported. See booking/importer.py for the columns of each kind.
+"""
+import csv
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from booking import importer
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV/JSONL file into the database in batches, reporting bad rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=importer.KINDS)
+        parser.add_argument("path", help="File to import (.csv, .jsonl, optionally .gz) or - for stdin")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Default: from the file extension")
+        parser.add_argument("--batch", type=int, default=importer.BATCH_SIZE, help="Rows per transaction")
+        parser.add_argument("--workers", type=int, help="Password hashing processes (default: CPU count)")
+        parser.add_argument("--errors", help="Write rejected rows (line, error) to this CSV file")
+        parser.add_argument("--dry-run", action="store_true", help="Validate everything, write nothing")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or importer.guess_format(path)
+        if path == "-":
+            stream = sys.stdin
+        elif path.endswith(".gz"):
+            stream = gzip.open(path, "rt", encoding="utf-8-sig", newline="")
+        else:
+            try:
+                stream = open(path, encoding="utf-8-sig", newline="")
+            except OSError as exc:
+                raise CommandError(str(exc)) from exc
+
+        error_file = open(options["errors"], "w", newline="") if options["errors"] else None
+        error_writer = csv.writer(error_file) if error_file else None
+        if error_writer:
+            error_writer.writerow(["line", "error"])
+        shown = [0]
+
+        def on_error(line, message):
+            if error_writer:
+                error_writer.writerow([line, message])
+            elif shown[0] < 50:
+                self.stderr.write(f"line {line}: {message}")
+            shown[0] += 1
+
+        def on_batch(result):
+            rate = result["rows"] / max(result["seconds"], 1e-9)
+            self.stdout.write(
+                f"{result['rows']} rows, {result['created']} created, {result['errors']} rejected ({rate:.0f} rows/s)"
+            )
+
+        try:
+            result = importer.run(
+                options["kind"],
+                importer.read_records(stream, fmt),
+                batch_size=options["batch"],
+                workers=options["workers"],
+                dry_run=options["dry_run"],
+                on_error=on_error,
+                on_batch=on_batch,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if error_file:
+                error_file.close()
+
+        if not error_writer and result["errors"] > 50:
+            self.stderr.write(f"... {result['errors'] - 50} more (use --errors FILE to keep them all)")
+        verb = "Checked" if options["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['rows']} rows in {result['seconds']:.1f}s: "
+            f"{result['created']} created, {result['errors']} rejected"
+        ))
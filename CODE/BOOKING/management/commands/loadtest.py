@@ -0,0 +1,112 @@
+"""
+Load-test the booking flows and report throughput and latency per scenario.
+
+    python manage.py loadtest --doctors 50 --patients 500 --requests 4000 --workers 4
+    python manage.py loadtest --json runs/today.json --baseline runs/last-week.json
+
+The clinic is seeded on the first run (``lt_`` users) and reused by later
+runs, so results stay comparable; ``--fresh`` reseeds and ``--cleanup``
+removes it. With ``--baseline`` the command fails if any scenario got
+slower or handled fewer requests than in the saved run (see
+booking/loadtest.py).
+"""
+import json
+import platform
+import subprocess
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from booking import loadtest
+
+
+class Command(BaseCommand):
+    help = "Run a scripted, multi-process load test of the booking flows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--doctors", type=int, default=50)
+        parser.add_argument("--patients", type=int, default=500)
+        parser.add_argument("--history-days", type=int, default=60)
+        parser.add_argument("--requests", type=int, default=2000, help="Timed requests over all workers")
+        parser.add_argument("--workers", type=int, default=4, help="Worker processes")
+        parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per worker")
+        parser.add_argument("--mix", default=loadtest.DEFAULT_MIX, help="scenario=weight,... (%(default)s)")
+        parser.add_argument("--seed", type=int, default=1, help="Random seed for data and request order")
+        parser.add_argument("--fresh", action="store_true", help="Drop and reseed the load-test data first")
+        parser.add_argument("--cleanup", action="store_true", help="Remove the load-test data and exit")
+        parser.add_argument("--json", help="Write the results to this file")
+        parser.add_argument("--baseline", help="Earlier --json output to compare against")
+        parser.add_argument("--tolerance", type=float, default=10.0, help="Allowed regression in percent")
+
+    def handle(self, *args, **options):
+        if options["cleanup"]:
+            self.stdout.write(f"Removed {loadtest.cleanup()} row(s).")
+            return
+        try:
+            mix = loadtest.parse_mix(options["mix"])
+        except ValueError as exc:
+            raise CommandError(exc) from exc
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1")
+
+        if options["fresh"]:
+            loadtest.cleanup()
+        if loadtest.seeded():
+            self.stdout.write("Reusing the seeded load-test data (--fresh to reseed).")
+        else:
+            counts = loadtest.seed(
+                options["doctors"], options["patients"], options["history_days"], rng_seed=options["seed"]
+            )
+            self.stdout.write("Seeded " + ", ".join(f"{n} {name}" for name, n in counts.items()) + ".")
+
+        results = loadtest.run(
+            requests=options["requests"],
+            workers=options["workers"],
+            warmup=options["warmup"],
+            mix=mix,
+            rng_seed=options["seed"],
+        )
+        results["meta"] = self._meta()
+        self._print(results)
+
+        if options["json"]:
+            with open(options["json"], "w") as out:
+                json.dump(results, out, indent=2)
+            self.stdout.write(f"Wrote {options['json']}")
+
+        if options["baseline"]:
+            with open(options["baseline"]) as source:
+                baseline = json.load(source)
+            problems = loadtest.compare(results, baseline, options["tolerance"])
+            if problems:
+                raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(problems))
+            self.stdout.write(self.style.SUCCESS(f"No regressions beyond {options['tolerance']:g}%."))
+
+    def _print(self, results):
+        self.stdout.write(
+            f"{results['requests']} requests in {results['elapsed_s']:.1f}s with {results['workers']} worker(s): "
+            f"{results['rps']:.1f} req/s, {results['errors']} error(s)"
+        )
+        self.stdout.write(f"{'scenario':<10} {'reqs':>6} {'errs':>5} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)")
+        for name, row in results["scenarios"].items():
+            self.stdout.write(
+                f"{name:<10} {row['requests']:>6} {row['errors']:>5} {row['rps']:>7.1f} "
+                f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}"
+            )
+
+    def _meta(self):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            commit = ""
+        return {
+            "when": timezone.now().isoformat(),
+            "commit": commit,
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+        }
@@ -0,0 +1,177 @@
+"""
+Measure how long a fresh worker takes to start and serve its first request.
+
+    python manage.py profile_startup
+    python manage.py profile_startup --runs 7 --path /login/ --top 30
+    BOOKING_ROLE=public python manage.py profile_startup
+
+Each run is a new Python process that goes through the same steps as an
+app server, timing each phase:
+
+    setup      django.setup(): settings, apps, models, admin autodiscovery
+    handler    WSGIHandler(): middleware chain
+    urlconf    ROOT_URLCONF and the view modules it imports
+    warmup     booking.warmup.warmup(), only with --warmup
+    first      the first request to --path, through every middleware
+
+and the medians over --runs are printed, along with the wall time of the
+whole process (interpreter start included). One more run under
+``python -X importtime`` gives the import breakdown: time spent in each
+package (self time, so nothing is counted twice) and in each booking
+module.
+
+The project's modules are byte-compiled first, as they would be on a
+deployed server, so an edited source file isn't recompiled in every run.
+"""
+import compileall
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PHASES = ("setup", "handler", "urlconf", "warmup", "first")
+
+# Runs in the child process; prints the phase timings as JSON.
+SCRIPT = """
+import io, json, sys, time
+clock = time.perf_counter
+phases = {}
+started = clock()
+import django
+django.setup(set_prefix=False)
+phases["setup"] = clock() - started
+
+mark = clock()
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+handler = WSGIHandler()
+phases["handler"] = clock() - mark
+
+mark = clock()
+from django.urls import get_resolver
+get_resolver().url_patterns
+phases["urlconf"] = clock() - mark
+
+if WARMUP:
+    mark = clock()
+    from booking.warmup import warmup
+    warmup()
+    phases["warmup"] = clock() - mark
+
+hosts = [h for h in settings.ALLOWED_HOSTS if h not in ("*",) and not h.startswith(".")]
+environ = {
+    "REQUEST_METHOD": "GET", "PATH_INFO": PATH, "QUERY_STRING": "", "SERVER_NAME": "localhost",
+    "SERVER_PORT": "80", "HTTP_HOST": hosts[0] if hosts else "localhost", "wsgi.input": io.BytesIO(),
+    "wsgi.errors": sys.stderr, "wsgi.url_scheme": "http", "SERVER_PROTOCOL": "HTTP/1.1",
+}
+status = []
+mark = clock()
+body = b"".join(handler(environ, lambda code, headers, exc_info=None: status.append(code)))
+phases["first"] = clock() - mark
+print(json.dumps({"phases": phases, "status": status[0], "bytes": len(body)}))
+"""
+
+
+def _group(module):
+    """Bucket for the import breakdown: django.<2 levels>, booking.<module>, else the top package."""
+    parts = module.split(".")
+    if parts[0] == "django":
+        return ".".join(parts[:3])
+    if parts[0] == "booking":
+        return ".".join(parts[:2])
+    return parts[0]
+
+
+class Command(BaseCommand):
+    help = "Profile worker cold start: phase timings and an import-time breakdown."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Fresh processes to time (median is shown)")
+        parser.add_argument("--path", default="/login/", help="URL for the first request")
+        parser.add_argument("--top", type=int, default=20, help="Packages to list in the import breakdown")
+        parser.add_argument("--warmup", action="store_true", help="Run booking.warmup before the first request")
+        parser.add_argument("--json", help="Write the results to this file")
+
+    def handle(self, *args, **options):
+        if options["runs"] < 1:
+            raise CommandError("--runs must be at least 1")
+        compileall.compile_dir(settings.BASE_DIR, quiet=1)
+        script = f"WARMUP = {options['warmup']!r}\nPATH = {options['path']!r}\n" + SCRIPT
+
+        runs, walls = [], []
+        for _ in range(options["runs"]):
+            started = time.perf_counter()
+            runs.append(self._child([sys.executable, "-c", script])[0])
+            walls.append(time.perf_counter() - started)
+        result, importtime = self._child([sys.executable, "-X", "importtime", "-c", script])
+
+        phases = {
+            name: statistics.median(run["phases"][name] for run in runs) * 1000
+            for name in PHASES if name in runs[0]["phases"]
+        }
+        report = {
+            "role": os.environ.get("BOOKING_ROLE", "full"),
+            "path": options["path"],
+            "status": result["status"],
+            "runs": options["runs"],
+            "phases_ms": phases,
+            "to_first_response_ms": sum(phases.values()),
+            "process_ms": statistics.median(walls) * 1000,
+            "imports": self._imports(importtime),
+        }
+        self._print(report, options["top"])
+        if options["json"]:
+            with open(options["json"], "w") as out:
+                json.dump(report, out, indent=2)
+            self.stdout.write(f"Wrote {options['json']}")
+
+    def _child(self, command):
+        done = subprocess.run(command, capture_output=True, text=True, env=os.environ.copy())
+        lines = done.stdout.strip().splitlines()
+        if done.returncode or not lines:
+            raise CommandError(f"Startup run failed:\n{done.stderr[-2000:]}")
+        return json.loads(lines[-1]), done.stderr
+
+    def _imports(self, stderr):
+        by_group, booking = Counter(), {}
+        modules = total = 0
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            own, cumulative, name = line[len("import time:"):].split("|")
+            own, cumulative, name = int(own), int(cumulative), name.strip()
+            modules += 1
+            total += own
+            by_group[_group(name)] += own
+            if name.startswith("booking"):
+                booking[name] = {"self_ms": own / 1000, "cumulative_ms": cumulative / 1000}
+        return {
+            "modules": modules,
+            "total_ms": total / 1000,
+            "packages_ms": {name: us / 1000 for name, us in by_group.most_common()},
+            "booking": booking,
+        }
+
+    def _print(self, report, top):
+        self.stdout.write(
+            f"Cold start ({report['role']} role), GET {report['path']} -> {report['status']}, "
+            f"median of {report['runs']} run(s):"
+        )
+        for name, ms in report["phases_ms"].items():
+            self.stdout.write(f"  {name:<10} {ms:8.1f} ms")
+        self.stdout.write(f"  {'total':<10} {report['to_first_response_ms']:8.1f} ms to first response")
+        self.stdout.write(f"  {'process':<10} {report['process_ms']:8.1f} ms wall, interpreter start included")
+
+        imports = report["imports"]
+        self.stdout.write(f"\n{imports['modules']} modules imported in {imports['total_ms']:.1f} ms (self time):")
+        for name, ms in list(imports["packages_ms"].items())[:top]:
+            self.stdout.write(f"  {ms:8.1f} ms  {name}")
+        self.stdout.write("\nbooking modules (self / cumulative):")
+        for name, row in sorted(imports["booking"].items(), key=lambda item: -item[1]["cumulative_ms"]):
+            self.stdout.write(f"  {row['self_ms']:6.1f} / {row['cumulative_ms']:6.1f} ms  {name}")
@@ -0,0 +1,24 @@
+"""
+Rebuild the doctor search index from scratch.
+
+    python manage.py rebuild_search_index
+
+Needed after bulk loads that bypass model signals (bulk_create, raw SQL).
+"""
+import time as clock
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from booking import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the doctor search index (FTS5 table and in-process trigram index)."
+
+    def handle(self, *args, **options):
+        started = clock.perf_counter()
+        with transaction.atomic():
+            search.rebuild()
+        backend = "FTS5" if search.FtsBackend.available() else "trigram only"
+        self.stdout.write(f"Search index rebuilt ({backend}) in {clock.perf_counter() - started:.2f}s")
@@ -0,0 +1,79 @@
+"""
+Recompute the DoctorDailyStats rollup from the appointment table.
+
+    python manage.py rebuild_stats
+    python manage.py rebuild_stats --doctor 3 --start 2025-01-01 --end 2025-03-31
+    python manage.py rebuild_stats --check    # report drift, change nothing
+
+Needed after writes that bypass booking.services (raw SQL, bulk loads,
+queryset.update() from a shell).
+"""
+import time as clock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+from django.utils.dateparse import parse_date
+
+from booking import stats
+from booking.models import Appointment, DoctorDailyStats
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or check) the per-doctor daily appointment statistics."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--doctor", type=int, action="append", help="Doctor id (repeatable)")
+        parser.add_argument("--start", help="First date, YYYY-MM-DD")
+        parser.add_argument("--end", help="Last date, YYYY-MM-DD")
+        parser.add_argument("--check", action="store_true", help="Only report rows that differ; exit 1 if any")
+
+    def handle(self, *args, **options):
+        start = self._date(options["start"])
+        end = self._date(options["end"])
+        doctors = options["doctor"]
+
+        if options["check"]:
+            drift = self._drift(doctors, start, end)
+            for key, (expected, stored) in sorted(drift.items()):
+                self.stdout.write(f"doctor={key[0]} date={key[1]} status={key[2]}: expected {expected}, stored {stored}")
+            if drift:
+                raise CommandError(f"{len(drift)} stats row(s) out of date")
+            self.stdout.write(self.style.SUCCESS("Stats are up to date."))
+            return
+
+        started = clock.perf_counter()
+        rows = stats.rebuild(doctors, start, end)
+        self.stdout.write(f"Rebuilt {rows} stats row(s) in {clock.perf_counter() - started:.2f}s")
+
+    def _date(self, value):
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:  # well formed but impossible, e.g. 2025-02-30
+            day = None
+        if day is None:
+            raise CommandError(f"Bad date: {value}")
+        return day
+
+    def _drift(self, doctors, start, end):
+        appointments = Appointment.objects.order_by()
+        rollup = DoctorDailyStats.objects.order_by()
+        if doctors:
+            appointments = appointments.filter(doctor_id__in=doctors)
+            rollup = rollup.filter(doctor_id__in=doctors)
+        if start:
+            appointments = appointments.filter(date__gte=start)
+            rollup = rollup.filter(date__gte=start)
+        if end:
+            appointments = appointments.filter(date__lte=end)
+            rollup = rollup.filter(date__lte=end)
+
+        keys = ("doctor_id", "date", "status")
+        expected = {tuple(r[k] for k in keys): r["n"] for r in appointments.values(*keys).annotate(n=Count("id"))}
+        stored = {tuple(r[k] for k in keys): r["n"] for r in rollup.values(*keys).annotate(n=Sum("count"))}
+        return {
+            key: (expected.get(key, 0), stored.get(key, 0))
+            for key in expected.keys() | stored.keys()
+            if expected.get(key, 0) != stored.get(key, 0)
+        }
@@ -0,0 +1,35 @@
+"""
+Queue reminders for upcoming appointments.
+
+    python manage.py send_reminders              # one pass (e.g. from cron)
+    python manage.py send_reminders --loop 60    # keep running, every 60s
+
+Messages go through the outbox, so run dispatch_outbox as well.
+"""
+import time as clock
+
+from django.core.management.base import BaseCommand
+
+from booking.reminders import CHUNK_SIZE, send_due_reminders
+
+
+class Command(BaseCommand):
+    help = "Queue SMS/in-app reminders for appointments starting within BOOKING_REMINDER_HOURS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=None, help="Lead time (default BOOKING_REMINDER_HOURS)")
+        parser.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--loop", type=float, default=0, metavar="SECONDS", help="Repeat every N seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            run = send_due_reminders(hours=options["hours"], chunk_size=options["chunk"])
+            rate = run["reminded"] / run["seconds"] if run["seconds"] else 0
+            self.stdout.write(
+                f"reminded={run['reminded']} chunks={run['chunks']} "
+                f"took={run['seconds'] * 1000:.0f}ms ({rate:.0f}/s) window={run['window'][0]:%Y-%m-%d %H:%M}"
+                f"..{run['window'][1]:%Y-%m-%d %H:%M}"
+            )
+            if not options["loop"]:
+                return
+            clock.sleep(options["loop"])
@@ -0,0 +1,97 @@
+"""
+Hammer the booking service from many threads and check for double-bookings.
+
+    python manage.py stress_booking --threads 32 --attempts 2000
+
+A throwaway doctor, schedule and set of patients are created for a date far
+in the future and removed again afterwards. The command fails if any slot
+ends up with more than one active appointment.
+"""
+import random
+import threading
+import time as clock
+from datetime import time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.utils.timezone import now
+
+from booking.models import Appointment, Doctor, DoctorSchedule, Patient
+from booking.services import SlotTaken, book_slot
+
+
+class Command(BaseCommand):
+    help = "Run concurrent booking attempts against one doctor and verify there are no double-bookings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--attempts", type=int, default=500, help="Total booking attempts")
+        parser.add_argument("--patients", type=int, default=50)
+
+    def handle(self, *args, **options):
+        tag = f"stress{int(clock.time())}"
+        day = now().date() + timedelta(days=3650)
+
+        doctor = Doctor.objects.create(
+            user=User.objects.create(username=f"{tag}_doc"), specialization="Stress Test"
+        )
+        DoctorSchedule.objects.create(doctor=doctor, date=day, start_time=time(9), end_time=time(17))
+        users = User.objects.bulk_create(
+            [User(username=f"{tag}_p{i}") for i in range(options["patients"])]
+        )
+        patients = Patient.objects.bulk_create([Patient(user=u) for u in users])
+        slots = [time(9 + m // 60, m % 60) for m in range(0, 8 * 60, 30)]
+
+        counts = {"booked": 0, "taken": 0, "errors": 0}
+        lock = threading.Lock()
+        per_thread = options["attempts"] // options["threads"]
+        start_gate = threading.Barrier(options["threads"])
+
+        def worker():
+            start_gate.wait()
+            try:
+                for _ in range(per_thread):
+                    try:
+                        book_slot(doctor, random.choice(patients), day, random.choice(slots))
+                        result = "booked"
+                    except SlotTaken:
+                        result = "taken"
+                    except OperationalError:
+                        # e.g. "database is locked" on SQLite under heavy write load
+                        result = "errors"
+                    with lock:
+                        counts[result] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        started = clock.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = clock.perf_counter() - started
+
+        try:
+            doubles = (
+                Appointment.objects.filter(doctor=doctor)
+                .exclude(status=Appointment.Status.CANCELLED)
+                .values("date", "time")
+                .annotate(n=Count("id"))
+                .filter(n__gt=1)
+                .count()
+            )
+        finally:
+            User.objects.filter(username__startswith=f"{tag}_").delete()
+
+        attempts = sum(counts.values())
+        self.stdout.write(
+            f"{attempts} attempts in {elapsed:.2f}s ({attempts / elapsed:.0f}/s) - "
+            f"booked={counts['booked']} taken={counts['taken']} errors={counts['errors']} "
+            f"slots={len(slots)}"
+        )
+        if doubles:
+            raise CommandError(f"{doubles} slot(s) were double-booked!")
+        self.stdout.write(self.style.SUCCESS("No double-bookings."))
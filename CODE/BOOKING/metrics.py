@@ -0,0 +1,228 @@
+# booking/metrics.py
+"""
+Per-view request metrics (see booking/middleware.py).
+
+For every request, MetricsMiddleware records these values under the URL
+name of the matched view:
+
+* wall time
+* DB query count and DB time
+* template render time
+* response size
+
+Each value goes into a ``Histogram``: log-linear buckets in the style of
+HdrHistogram, with 32 sub-buckets per power of two, so any percentile is
+within about 3% of the true value. A histogram holds a few hundred
+integers however many requests it has seen, and recording a value is one
+bit_length() plus a list increment.
+
+The numbers live in the process that served the request. Each worker
+reports its own, and Prometheus adds them up across ``/metrics`` scrapes.
+
+Template time comes from the ``TimedDjangoTemplates`` backend, which is a
+drop-in replacement for Django's backend in TEMPLATES.
+"""
+import heapq
+import threading
+import time
+from contextvars import ContextVar
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+SUB_BITS = 6                      # 32 steps per power of two -> <= ~3% relative error
+SUB_COUNT = 1 << SUB_BITS
+HALF = SUB_COUNT >> 1
+QUANTILES = (0.5, 0.9, 0.99)
+SLOWEST_SQL = 10                  # statements kept per request for the slow log
+
+
+class Histogram:
+    """Counts of non-negative integers in log-linear buckets."""
+
+    def __init__(self):
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def index(value):
+        if value < SUB_COUNT:
+            return value
+        shift = value.bit_length() - SUB_BITS
+        return shift * HALF + (value >> shift)
+
+    @staticmethod
+    def highest(index):
+        """Largest value that lands in bucket ``index``."""
+        if index < SUB_COUNT:
+            return index
+        shift = index // HALF - 1
+        mantissa = index % HALF + HALF
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(int(value), 0)
+        index = self.index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0
+        wanted = max(1, round(self.count * fraction))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= wanted:
+                return min(self.highest(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+
+# name -> (help text, unit divisor for export). Times are kept in microseconds.
+METRICS = {
+    "request_seconds": ("Wall time per request.", 1e6),
+    "db_queries": ("Database queries per request.", 1),
+    "db_seconds": ("Time spent in database queries per request.", 1e6),
+    "template_seconds": ("Template render time per request.", 1e6),
+    "response_bytes": ("Response body size (non-streaming responses).", 1),
+}
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}         # view name -> {metric: Histogram}
+        self.responses = {}     # (view name, status code) -> count
+
+    def observe(self, view, status, values):
+        """``values`` maps names from METRICS to integers (µs for times)."""
+        with self.lock:
+            histograms = self.views.get(view)
+            if histograms is None:
+                histograms = self.views[view] = {name: Histogram() for name in METRICS}
+            for name, value in values.items():
+                histograms[name].record(value)
+            key = (view, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def snapshot(self):
+        """``[(view, {metric: {count, mean, p50, p90, p99, max}})]``, times in ms."""
+        with self.lock:
+            rows = []
+            for view, histograms in sorted(self.views.items()):
+                row = {}
+                for name, histogram in histograms.items():
+                    scale = 1000 if name.endswith("_seconds") else 1
+                    row[name] = {
+                        "count": histogram.count,
+                        "mean": histogram.mean() / scale,
+                        "max": histogram.max / scale,
+                        **{f"p{int(q * 100)}": histogram.percentile(q) / scale for q in QUANTILES},
+                    }
+                rows.append((view, row))
+            return rows
+
+    def prometheus(self):
+        """Everything in the Prometheus text format (summaries + a counter)."""
+        lines = []
+        with self.lock:
+            for name, (text, scale) in METRICS.items():
+                metric = f"booking_{name}"
+                lines += [f"# HELP {metric} {text}", f"# TYPE {metric} summary"]
+                for view, histograms in sorted(self.views.items()):
+                    histogram = histograms[name]
+                    if not histogram.count:
+                        continue
+                    label = _label(view)
+                    for q in QUANTILES:
+                        lines.append(f'{metric}{{view="{label}",quantile="{q}"}} {histogram.percentile(q) / scale:g}')
+                    lines.append(f'{metric}_sum{{view="{label}"}} {histogram.total / scale:g}')
+                    lines.append(f'{metric}_count{{view="{label}"}} {histogram.count}')
+            lines += ["# HELP booking_responses_total Responses by view and status code.",
+                      "# TYPE booking_responses_total counter"]
+            for (view, status), n in sorted(self.responses.items()):
+                lines.append(f'booking_responses_total{{view="{_label(view)}",code="{status}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+            self.responses.clear()
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+registry = Registry()
+
+
+# ----------------------------
+# Per-request collection
+# ----------------------------
+class RequestStats:
+    """What one request has spent so far; filled in by the hooks below."""
+
+    __slots__ = ("queries", "db_time", "template_time", "template_depth", "sql")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.sql = []           # heap of the slowest (seconds, sql); never parameters
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            if len(self.sql) < SLOWEST_SQL:
+                heapq.heappush(self.sql, (elapsed, sql))
+            elif elapsed > self.sql[0][0]:
+                heapq.heapreplace(self.sql, (elapsed, sql))
+
+
+current = ContextVar("booking_request_stats", default=None)
+
+
+class TimedTemplate(django_backend.Template):
+    def render(self, context=None, request=None):
+        stats = current.get()
+        if stats is None:
+            return super().render(context, request)
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:   # count nested render_to_string calls once
+                stats.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(django_backend.DjangoTemplates):
+    """Django's template backend, timing renders for the current request."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
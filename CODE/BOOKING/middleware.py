@@ -0,0 +1,145 @@
+# booking/middleware.py
+"""
+Request instrumentation.
+
+MetricsMiddleware times every request and files the numbers under the
+matched URL name (booking/metrics.py). A request slower than
+BOOKING_SLOW_REQUEST_MS is logged to the ``booking.slow`` logger with its
+slowest SQL statements. Only the statements are logged, never their
+parameters.
+
+Put it first in MIDDLEWARE so the session and auth queries count as well.
+For async views (the notification stream) only wall time and response
+size are recorded, because their queries run on other threads' connections.
+For streaming responses the wall time stops when the response starts.
+
+ReplicaMiddleware lets read-only views read from the replica
+(booking/routers.py). Without a replica it removes itself at startup.
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics, routers
+
+logger = logging.getLogger("booking.slow")
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    if "admin" in match.namespaces:
+        return "admin"      # one bucket for the whole admin keeps the label set small
+    return match.view_name or match._func_path
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, "BOOKING_SLOW_REQUEST_MS", 500)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = metrics.RequestStats()
+        token = metrics.current.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as hooks:
+                for connection in connections.all():
+                    hooks.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        self._observe(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = metrics.RequestStats()
+        token = metrics.current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        self._observe(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def _observe(self, request, response, elapsed, stats):
+        view = _view_name(request)
+        values = {
+            "request_seconds": elapsed * 1e6,
+            "db_queries": stats.queries,
+            "db_seconds": stats.db_time * 1e6,
+            "template_seconds": stats.template_time * 1e6,
+        }
+        if not response.streaming:
+            values["response_bytes"] = len(response.content)
+        metrics.registry.observe(view, response.status_code, values)
+
+        if self.slow_ms is not None and elapsed * 1000 >= self.slow_ms:
+            slowest = sorted(stats.sql, reverse=True)
+            logger.warning(
+                "Slow request: %s %s (%s) took %.0f ms - %d queries in %.0f ms, templates %.0f ms%s",
+                request.method, request.path, view, elapsed * 1000, stats.queries, stats.db_time * 1000,
+                stats.template_time * 1000,
+                "".join(f"\n  {seconds * 1000:7.1f} ms  {sql}" for seconds, sql in slowest),
+            )
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not routers.replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, "BOOKING_REPLICA_PIN_SECONDS", 10)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routers.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.finish(token)
+        return self._pin(request, response)
+
+    async def __acall__(self, request):
+        token = routers.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.finish(token)
+        return self._pin(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ("GET", "HEAD") or routers.PIN_COOKIE in request.COOKIES:
+            return None
+        if request.resolver_match.view_name in routers.REPLICA_VIEWS:
+            routers.prefer_replica()
+        return None
+
+    def _pin(self, request, response):
+        # Read your own writes: after a successful change, read from the
+        # primary until the replica has had time to catch up.
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            response.set_cookie(
+                routers.PIN_COOKIE, "1", max_age=self.pin_seconds, httponly=True, samesite="Lax",
+            )
+        return response
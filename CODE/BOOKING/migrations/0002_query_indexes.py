@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'date', 'time', 'id'], name='appt_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'date', 'time', 'id'], name='appt_doctor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'Booked')), fields=['doctor', 'date'], name='appt_doctor_booked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['date', 'time', 'id'], name='appt_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorleave',
+            index=models.Index(fields=['doctor', 'date'], name='leave_doctor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorschedule',
+            index=models.Index(fields=['doctor', 'date'], name='schedule_doctor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalhistory',
+            index=models.Index(fields=['patient', '-created_at'], name='history_patient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['patient', '-created_at'], name='notif_patient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['patient'], name='notif_patient_unread_idx'),
+        ),
+    ]
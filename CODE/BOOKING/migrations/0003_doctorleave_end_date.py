@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0002_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorleave',
+            name='end_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
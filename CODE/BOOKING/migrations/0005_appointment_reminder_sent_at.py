@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0004_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('reminder_sent_at__isnull', True), ('status__in', ['Booked', 'Confirmed'])), fields=['date', 'time'], name='appt_reminder_due_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import OperationalError, migrations
+
+# SQLite FTS5 table behind booking/search.py. Created only on SQLite builds
+# that have FTS5; everywhere else search uses the in-process trigram index.
+
+CREATE = """
+CREATE VIRTUAL TABLE booking_doctor_search USING fts5(
+    doctor_id UNINDEXED, name, specialization, location,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE)
+        except OperationalError:  # "no such module: fts5"
+            return
+        cursor.execute(
+            "INSERT INTO booking_doctor_search (doctor_id, name, specialization, location) "
+            "SELECT d.id, lower(u.username || ' ' || u.first_name || ' ' || u.last_name), "
+            "lower(d.specialization), lower(d.location) "
+            "FROM booking_doctor d JOIN auth_user u ON u.id = d.user_id"
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS booking_doctor_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("booking", "0005_appointment_reminder_sent_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
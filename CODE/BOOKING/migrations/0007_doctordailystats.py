@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate(apps, schema_editor):
+    Appointment = apps.get_model("booking", "Appointment")
+    DoctorDailyStats = apps.get_model("booking", "DoctorDailyStats")
+    rows = Appointment.objects.order_by().values("doctor_id", "date", "status").annotate(n=Count("id"))
+    DoctorDailyStats.objects.bulk_create(
+        [DoctorDailyStats(doctor_id=r["doctor_id"], date=r["date"], status=r["status"], count=r["n"]) for r in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0006_doctor_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='booking.doctor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='stats_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('doctor', 'date', 'status'), name='unique_doctor_day_status')],
+            },
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0007_doctordailystats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('slot_minutes', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('valid_from', models.DateField(default=django.utils.timezone.localdate)),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('exceptions', models.JSONField(blank=True, default=list)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='booking.doctor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['doctor', 'weekday'], name='rule_doctor_weekday_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,115 @@
+# Status strings -> small integers, plus the AppointmentTransition log.
+#
+# Written by hand: the CharField can't be cast in place on every backend,
+# so each table gets a new integer column, filled with one UPDATE per
+# status, and the old column is dropped. Unknown strings become Booked.
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+STATUSES = [(1, "Booked"), (2, "Confirmed"), (3, "Completed"), (4, "Cancelled")]
+
+
+def to_numbers(apps, schema_editor):
+    for model in ("Appointment", "DoctorDailyStats"):
+        rows = apps.get_model("booking", model).objects.all()
+        for value, label in STATUSES:
+            rows.filter(status__iexact=label).update(status_code=value)
+
+
+def to_labels(apps, schema_editor):
+    for model in ("Appointment", "DoctorDailyStats"):
+        rows = apps.get_model("booking", model).objects.all()
+        for value, label in STATUSES:
+            rows.filter(status_code=value).update(status=label)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0008_schedulerule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Constraints and indexes that mention status go first...
+        migrations.RemoveConstraint(model_name='appointment', name='unique_active_slot'),
+        migrations.RemoveIndex(model_name='appointment', name='appt_doctor_booked_idx'),
+        migrations.RemoveIndex(model_name='appointment', name='appt_reminder_due_idx'),
+        migrations.RemoveConstraint(model_name='doctordailystats', name='unique_doctor_day_status'),
+
+        # ...then the column is swapped...
+        migrations.AddField(
+            model_name='appointment',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='doctordailystats',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        # (a default only so the old column can be re-added on the way back)
+        migrations.AlterField(
+            model_name='doctordailystats',
+            name='status',
+            field=models.CharField(max_length=20, default='Booked'),
+        ),
+        migrations.RunPython(to_numbers, to_labels),
+        migrations.RemoveField(model_name='appointment', name='status'),
+        migrations.RemoveField(model_name='doctordailystats', name='status'),
+        migrations.RenameField(model_name='appointment', old_name='status_code', new_name='status'),
+        migrations.RenameField(model_name='doctordailystats', old_name='status_code', new_name='status'),
+        migrations.AlterField(
+            model_name='appointment',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=STATUSES, default=1),
+        ),
+        migrations.AlterField(
+            model_name='doctordailystats',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=STATUSES),
+        ),
+
+        # ...and they come back with the numeric conditions.
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('status', 4), _negated=True),
+                fields=('doctor', 'date', 'time'),
+                name='unique_active_slot',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 1)), fields=['doctor', 'date'], name='appt_doctor_booked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(
+                condition=models.Q(('reminder_sent_at__isnull', True), ('status__in', [1, 2])),
+                fields=['date', 'time'],
+                name='appt_reminder_due_idx',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='doctordailystats',
+            constraint=models.UniqueConstraint(fields=('doctor', 'date', 'status'), name='unique_doctor_day_status'),
+        ),
+
+        migrations.CreateModel(
+            name='AppointmentTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.PositiveSmallIntegerField(choices=STATUSES)),
+                ('to_status', models.PositiveSmallIntegerField(choices=STATUSES)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='booking.appointment')),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['appointment', 'id'], name='transition_appt_idx')],
+            },
+        ),
+    ]
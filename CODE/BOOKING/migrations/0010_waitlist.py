@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0009_status_state_machine'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('priority', models.PositiveSmallIntegerField(default=0)),
+                ('joined_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'Waiting'), (2, 'Offered'), (3, 'Accepted'), (4, 'Declined'), (5, 'Expired'), (6, 'Cancelled')], default=1)),
+                ('offered_time', models.TimeField(blank=True, null=True)),
+                ('offer_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('appointment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='booking.appointment')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='booking.doctor')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='booking.patient')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 1)), fields=['doctor', 'date', '-priority', 'joined_at', 'id'], name='waitlist_queue_idx'), models.Index(condition=models.Q(('status', 2)), fields=['doctor', 'date'], name='waitlist_held_idx'), models.Index(condition=models.Q(('status', 2)), fields=['offer_expires_at'], name='waitlist_offer_due_idx'), models.Index(fields=['patient', 'date'], name='waitlist_patient_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', [1, 2])), fields=('doctor', 'date', 'patient'), name='unique_active_waitlist')],
+            },
+        ),
+    ]
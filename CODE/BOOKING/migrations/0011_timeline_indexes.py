@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0010_waitlist'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='medicalhistory',
+            name='history_patient_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notif_patient_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='medicalhistory',
+            index=models.Index(fields=['patient', '-created_at', '-id'], name='history_patient_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['patient', '-created_at', '-id'], name='notif_patient_timeline_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import OperationalError, migrations
+
+# Recreate the FTS5 table from 0006 with the doctor id as its rowid instead
+# of an UNINDEXED column, so booking/search.py updates and deletes a doctor
+# by key rather than scanning the table. SQLite with FTS5 only, as before.
+
+CREATE = """
+CREATE VIRTUAL TABLE booking_doctor_search USING fts5(
+    name, specialization, location,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+CREATE_0006 = """
+CREATE VIRTUAL TABLE booking_doctor_search USING fts5(
+    doctor_id UNINDEXED, name, specialization, location,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+DOCUMENTS = (
+    "SELECT d.id, lower(u.username || ' ' || u.first_name || ' ' || u.last_name), "
+    "lower(d.specialization), lower(d.location) "
+    "FROM booking_doctor d JOIN auth_user u ON u.id = d.user_id"
+)
+
+
+def _recreate(schema_editor, create, id_column):
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS booking_doctor_search")
+        try:
+            cursor.execute(create)
+        except OperationalError:  # "no such module: fts5"
+            return
+        cursor.execute(
+            f"INSERT INTO booking_doctor_search ({id_column}, name, specialization, location) {DOCUMENTS}"
+        )
+
+
+def use_rowid(apps, schema_editor):
+    _recreate(schema_editor, CREATE, "rowid")
+
+
+def use_column(apps, schema_editor):
+    _recreate(schema_editor, CREATE_0006, "doctor_id")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0011_timeline_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(use_rowid, use_column),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Doctor(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -20,21 +21,100 @@ class Patient(models.Model):
     def __str__(self):
         return self.user.username
 
+class AppointmentStatus(models.IntegerChoices):
+    """Stored as a small integer; templates show the label (get_status_display)."""
+    BOOKED = 1, "Booked"
+    CONFIRMED = 2, "Confirmed"
+    COMPLETED = 3, "Completed"
+    CANCELLED = 4, "Cancelled"
+
+
 class Appointment(models.Model):
+    Status = AppointmentStatus
+
+    # Allowed status changes (see services.set_status). Rescheduling puts a
+    # Confirmed or Cancelled appointment back to Booked; Completed is final.
+    TRANSITIONS = {
+        Status.BOOKED: {Status.CONFIRMED, Status.COMPLETED, Status.CANCELLED},
+        Status.CONFIRMED: {Status.BOOKED, Status.COMPLETED, Status.CANCELLED},
+        Status.CANCELLED: {Status.BOOKED},
+        Status.COMPLETED: set(),
+    }
+
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
     date = models.DateField()
     time = models.TimeField()
-    status = models.CharField(max_length=20, default="Booked")
+    status = models.PositiveSmallIntegerField(choices=Status.choices, default=Status.BOOKED)
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Only one live appointment per doctor/date/time. Cancelled rows
+            # are left out so the slot can be booked again.
+            models.UniqueConstraint(
+                fields=["doctor", "date", "time"],
+                condition=~models.Q(status=AppointmentStatus.CANCELLED),
+                name="unique_active_slot",
+            ),
+        ]
+        indexes = [
+            # Patient lists: filter(patient=...) ordered/paged by (date, time, id)
+            models.Index(fields=["patient", "date", "time", "id"], name="appt_patient_date_idx"),
+            # Doctor dashboard and availability: filter(doctor=..., date range)
+            models.Index(fields=["doctor", "date", "time", "id"], name="appt_doctor_date_idx"),
+            # Leave cancellation: filter(doctor=..., date=..., status=BOOKED)
+            models.Index(fields=["doctor", "date"], condition=models.Q(status=AppointmentStatus.BOOKED), name="appt_doctor_booked_idx"),
+            # Admin daily appointments: filter(date=...) ordered by time
+            models.Index(fields=["date", "time", "id"], name="appt_date_time_idx"),
+            # Reminder scheduler: active appointments still waiting for a reminder
+            models.Index(
+                fields=["date", "time"],
+                condition=models.Q(
+                    reminder_sent_at__isnull=True,
+                    status__in=[AppointmentStatus.BOOKED, AppointmentStatus.CONFIRMED],
+                ),
+                name="appt_reminder_due_idx",
+            ),
+        ]
+
+    @classmethod
+    def can_move(cls, old_status, new_status):
+        return new_status in cls.TRANSITIONS.get(old_status, ())
 
     def __str__(self):
         return f"{self.patient.user.username} → {self.doctor.user.username} ({self.date} {self.time})"
+
+
+class AppointmentTransition(models.Model):
+    """Append-only log of appointment status changes (written by services)."""
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name="transitions")
+    from_status = models.PositiveSmallIntegerField(choices=AppointmentStatus.choices)
+    to_status = models.PositiveSmallIntegerField(choices=AppointmentStatus.choices)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["appointment", "id"], name="transition_appt_idx")]
+
+    def __str__(self):
+        return f"{self.appointment_id}: {self.get_from_status_display()} → {self.get_to_status_display()}"
 class DoctorLeave(models.Model):
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
     date = models.DateField()
+    end_date = models.DateField(blank=True, null=True)  # last day of leave, empty = single day
     reason = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["doctor", "date"], name="leave_doctor_date_idx")]
+
+    @property
+    def last_day(self):
+        return self.end_date or self.date
+
     def __str__(self):
+        if self.end_date and self.end_date != self.date:
+            return f"{self.doctor.user.username} - {self.date} to {self.end_date}"
         return f"{self.doctor.user.username} - {self.date}"
 class Notification(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)  # patient user
@@ -42,6 +122,13 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # newest first, id breaks ties: notifications.recent() and the timeline
+            models.Index(fields=["patient", "-created_at", "-id"], name="notif_patient_timeline_idx"),
+            models.Index(fields=["patient"], condition=models.Q(is_read=False), name="notif_patient_unread_idx"),
+        ]
+
     def __str__(self):
         return f"Notification for {self.patient.user.username}"
 class MedicalHistory(models.Model):
@@ -50,18 +137,134 @@ class MedicalHistory(models.Model):
     notes = models.TextField(blank=True, null=True)   # ✅ must exist
     prescription = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["patient", "-created_at", "-id"], name="history_patient_timeline_idx")]
 class DoctorSchedule(models.Model):
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
     date = models.DateField()
     start_time = models.TimeField()
     end_time = models.TimeField()
 
+    class Meta:
+        indexes = [models.Index(fields=["doctor", "date"], name="schedule_doctor_date_idx")]
+
     def __str__(self):
         return f"{self.doctor.username} - {self.date} ({self.start_time} - {self.end_time})"
 
 
+class ScheduleRule(models.Model):
+    """Weekly working hours, expanded into days by booking/schedules.py."""
+    WEEKDAYS = [
+        (0, "Monday"), (1, "Tuesday"), (2, "Wednesday"), (3, "Thursday"),
+        (4, "Friday"), (5, "Saturday"), (6, "Sunday"),
+    ]
+
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAYS)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_minutes = models.PositiveSmallIntegerField(null=True, blank=True)  # empty = BOOKING_SLOT_MINUTES
+    valid_from = models.DateField(default=timezone.localdate)
+    valid_until = models.DateField(null=True, blank=True)                   # empty = open ended
+    exceptions = models.JSONField(default=list, blank=True)                 # ISO dates the rule is skipped
+
+    class Meta:
+        indexes = [models.Index(fields=["doctor", "weekday"], name="rule_doctor_weekday_idx")]
+
+    def __str__(self):
+        return f"{self.doctor.user.username} - {self.get_weekday_display()} ({self.start_time} - {self.end_time})"
+
+
+class OutboxMessage(models.Model):
+    """A message waiting to be delivered by the dispatch_outbox worker."""
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+    channel = models.CharField(max_length=20)        # "sms" or "inapp"
+    recipient = models.CharField(max_length=50)      # phone number / patient id
+    body = models.TextField()
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=10, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx")]
+
+    def __str__(self):
+        return f"{self.channel} to {self.recipient} ({self.status})"
+
+
+class WaitlistStatus(models.IntegerChoices):
+    WAITING = 1, "Waiting"
+    OFFERED = 2, "Offered"        # a freed slot is held for the patient
+    ACCEPTED = 3, "Accepted"
+    DECLINED = 4, "Declined"      # declined the offer or left the list
+    EXPIRED = 5, "Expired"        # the hold ran out, or the day passed
+    CANCELLED = 6, "Cancelled"    # the doctor is on leave that day
 
 
+class WaitlistEntry(models.Model):
+    """A patient queued for a doctor on a date (see booking/waitlist.py)."""
+    Status = WaitlistStatus
+    ACTIVE = [WaitlistStatus.WAITING, WaitlistStatus.OFFERED]
 
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    date = models.DateField()
+    priority = models.PositiveSmallIntegerField(default=0)     # higher goes first
+    joined_at = models.DateTimeField(default=timezone.now)
+    status = models.PositiveSmallIntegerField(choices=Status.choices, default=Status.WAITING)
+    offered_time = models.TimeField(null=True, blank=True)
+    offer_expires_at = models.DateTimeField(null=True, blank=True)
+    appointment = models.ForeignKey(Appointment, on_delete=models.SET_NULL, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["doctor", "date", "patient"],
+                condition=models.Q(status__in=[WaitlistStatus.WAITING, WaitlistStatus.OFFERED]),
+                name="unique_active_waitlist",
+            ),
+        ]
+        indexes = [
+            # Queue order for backfill: filter(doctor, date, WAITING) by priority, join time
+            models.Index(
+                fields=["doctor", "date", "-priority", "joined_at", "id"],
+                condition=models.Q(status=WaitlistStatus.WAITING),
+                name="waitlist_queue_idx",
+            ),
+            # Held slots, read by the availability engine
+            models.Index(fields=["doctor", "date"], condition=models.Q(status=WaitlistStatus.OFFERED), name="waitlist_held_idx"),
+            # Expiry sweep: offers whose hold has run out
+            models.Index(fields=["offer_expires_at"], condition=models.Q(status=WaitlistStatus.OFFERED), name="waitlist_offer_due_idx"),
+            # The patient's waitlist page
+            models.Index(fields=["patient", "date"], name="waitlist_patient_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.patient} waiting for {self.doctor.user.username} on {self.date} ({self.get_status_display()})"
 
 
+class DoctorDailyStats(models.Model):
+    """Appointments per doctor, per day, per status (see booking/stats.py)."""
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    date = models.DateField()
+    status = models.PositiveSmallIntegerField(choices=AppointmentStatus.choices)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["doctor", "date", "status"], name="unique_doctor_day_status"),
+        ]
+        indexes = [models.Index(fields=["date"], name="stats_date_idx")]
+
+    def __str__(self):
+        return f"{self.doctor_id} {self.date} {self.get_status_display()}: {self.count}"
@@ -0,0 +1,101 @@
+# booking/notifications.py
+"""
+In-app notifications: unread counters and read state.
+
+The unread count shown in the navigation is kept in the cache and moved
+by the code that changes it (+n when notifications are created, -n when
+they are marked read) rather than recounted on every page. A missing
+counter is rebuilt with one COUNT over the partial ``is_read=False`` index,
+and counters expire after BOOKING_UNREAD_TTL seconds so any drift (e.g. a
+local-memory cache in a process that didn't see the write) heals itself.
+Use a shared cache backend when the outbox worker runs as its own process.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import realtime, stamps
+from .models import Notification
+
+DEFAULT_TTL = 300
+RECENT = 50
+
+
+def _key(patient_id):
+    return f"notifications:unread:{patient_id}"
+
+
+def _ttl():
+    return getattr(settings, "BOOKING_UNREAD_TTL", DEFAULT_TTL)
+
+
+def unread_count(patient_id, shown=None):
+    """Unread notifications for a patient.
+
+    ``shown`` may be the patient's notifications a page already loaded; if
+    that is all of them the count is taken from it instead of the database.
+    """
+    count = cache.get(_key(patient_id))
+    if count is None:
+        if shown is not None and len(shown) < RECENT:
+            count = sum(1 for note in shown if not note.is_read)
+        else:
+            count = Notification.objects.filter(patient_id=patient_id, is_read=False).count()
+        cache.add(_key(patient_id), count, _ttl())
+    return count
+
+
+def _bump(patient_id, delta):
+    try:
+        if cache.incr(_key(patient_id), delta) < 0:
+            cache.delete(_key(patient_id))
+    except ValueError:
+        pass  # no counter yet; the next unread_count() builds it
+
+
+def created(notifications):
+    """Call after saving Notification rows: bump counters and push them live."""
+    notifications = list(notifications)
+    stamps.touch(patients=[note.patient_id for note in notifications])
+
+    def after_commit():
+        for patient_id, n in Counter(note.patient_id for note in notifications).items():
+            _bump(patient_id, n)
+        broker = realtime.get_broker()
+        for note in notifications:
+            if note.pk:
+                broker.publish(note.patient_id, realtime.notification_event(note.pk, note.message, note.created_at))
+
+    transaction.on_commit(after_commit)
+
+
+def mark_read(patient_id, ids=None):
+    """Mark some (``ids``) or all of a patient's notifications read.
+
+    One UPDATE; returns how many rows actually changed.
+    """
+    unread = Notification.objects.filter(patient_id=patient_id, is_read=False)
+    if ids is not None:
+        unread = unread.filter(id__in=ids)
+    changed = unread.update(is_read=True)
+    if changed:
+        _bump(patient_id, -changed)
+        stamps.touch(patients=[patient_id])
+        realtime.get_broker().publish(patient_id, {"type": "read", "ids": list(ids) if ids is not None else None})
+    return changed
+
+
+def recent(patient_id, limit=RECENT):
+    return Notification.objects.filter(patient_id=patient_id).order_by("-created_at", "-id")[:limit]
+
+
+def since(patient_id, last_id, limit=RECENT):
+    """Notifications newer than ``last_id`` as events, oldest first."""
+    rows = (
+        Notification.objects.filter(patient_id=patient_id, id__gt=last_id)
+        .order_by("id")
+        .values_list("id", "message", "created_at")[:limit]
+    )
+    return [realtime.notification_event(*row) for row in rows]
@@ -0,0 +1,233 @@
+# booking/outbox.py
+"""
+Outbox-backed message dispatch.
+
+Views never talk to an SMS gateway directly. They call ``enqueue`` (or
+``utils.send_sms`` / ``notify`` which wrap it), which only inserts OutboxMessage
+rows - in the same transaction as the change that caused them. The
+``dispatch_outbox`` management command drains the table:
+
+* claims a batch of due rows (safe with several workers running),
+* groups them by channel and hands each group to that channel's provider
+  in a thread pool,
+* marks successes sent and reschedules failures with exponential backoff
+  until BOOKING_OUTBOX_MAX_ATTEMPTS is reached.
+
+Every message has an idempotency key, so enqueueing the same logical
+message twice (e.g. a retried request) only stores it once.
+
+Providers are configured per channel with BOOKING_OUTBOX_PROVIDERS. With
+BOOKING_OUTBOX_EAGER on (off by default) the messages a request enqueued -
+and only those - are delivered right after its commit, so local
+development can work without a worker.
+"""
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import notifications
+from .models import Notification, OutboxMessage
+
+SMS = "sms"
+INAPP = "inapp"
+
+DEFAULT_PROVIDERS = {
+    SMS: "booking.outbox.ConsoleSmsProvider",
+    INAPP: "booking.outbox.InAppProvider",
+}
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 10     # 10s, 20s, 40s, ... capped at one hour
+LEASE_SECONDS = 60       # a claimed batch is retried if a worker dies holding it
+
+
+# ----------------------------
+# Providers
+# ----------------------------
+class ConsoleSmsProvider:
+    """Prints messages instead of calling a gateway (development default)."""
+    batch_size = 50
+
+    def send_batch(self, messages):
+        for msg in messages:
+            print(f"[SMS to {msg.recipient}] {msg.body}")
+        return {}
+
+
+class InAppProvider:
+    """Delivers "inapp" messages as Notification rows for the patient."""
+    batch_size = 500
+
+    def send_batch(self, messages):
+        notifications.created(Notification.objects.bulk_create(
+            [Notification(patient_id=int(msg.recipient), message=msg.body) for msg in messages]
+        ))
+        return {}
+
+
+class FakeProvider:
+    """Records messages in memory; set ``fail`` to make deliveries error.
+
+    Handy for tests and benchmarks::
+
+        BOOKING_OUTBOX_PROVIDERS = {"sms": "booking.outbox.FakeProvider"}
+    """
+    batch_size = 100
+    sent = []
+    fail = False
+
+    def send_batch(self, messages):
+        if FakeProvider.fail:
+            return {msg.id: "fake provider failure" for msg in messages}
+        FakeProvider.sent.extend(messages)
+        return {}
+
+
+_providers = {}
+
+
+def get_provider(channel):
+    if channel not in _providers:
+        paths = {**DEFAULT_PROVIDERS, **getattr(settings, "BOOKING_OUTBOX_PROVIDERS", {})}
+        _providers[channel] = import_string(paths[channel])()
+    return _providers[channel]
+
+
+# ----------------------------
+# Enqueueing
+# ----------------------------
+def enqueue_many(items):
+    """Queue ``(channel, recipient, body, key)`` tuples in one INSERT.
+
+    ``key`` may be None for a random one. Keys that are already queued are
+    skipped.
+    """
+    rows = [
+        OutboxMessage(channel=channel, recipient=str(recipient), body=body, idempotency_key=key or uuid.uuid4().hex)
+        for channel, recipient, body, key in items
+    ]
+    if rows:
+        OutboxMessage.objects.bulk_create(rows, ignore_conflicts=True)
+        if getattr(settings, "BOOKING_OUTBOX_EAGER", False):
+            keys = [row.idempotency_key for row in rows]
+            transaction.on_commit(partial(drain, keys=keys))
+    return len(rows)
+
+
+def enqueue(channel, recipient, body, key=None):
+    return enqueue_many([(channel, recipient, body, key)])
+
+
+def notify(patient_id, message, key=None):
+    return enqueue(INAPP, patient_id, message, key)
+
+
+# ----------------------------
+# Dispatching
+# ----------------------------
+def _due():
+    now = timezone.now()
+    return OutboxMessage.objects.filter(
+        Q(status=OutboxMessage.PENDING) | Q(status=OutboxMessage.SENDING),
+        next_attempt_at__lte=now,
+    )
+
+
+def claim_batch(limit=200, keys=None):
+    """Claim up to ``limit`` due messages for this worker and return them.
+
+    ``keys`` restricts the claim to messages with those idempotency keys.
+    """
+    token = uuid.uuid4().hex
+    due = _due() if keys is None else _due().filter(idempotency_key__in=keys)
+    ids = list(due.order_by("next_attempt_at", "id").values_list("id", flat=True)[:limit])
+    if not ids:
+        return []
+    # Conditional update: if another worker got there first, its rows no
+    # longer match and we simply claim fewer.
+    _due().filter(id__in=ids).update(
+        status=OutboxMessage.SENDING,
+        claimed_by=token,
+        next_attempt_at=timezone.now() + timedelta(seconds=LEASE_SECONDS),
+    )
+    return list(OutboxMessage.objects.filter(claimed_by=token, status=OutboxMessage.SENDING))
+
+
+def _deliver(channel, messages):
+    try:
+        errors = get_provider(channel).send_batch(messages)
+    except Exception as exc:  # provider blew up: the whole batch failed
+        errors = {msg.id: repr(exc) for msg in messages}
+    finally:
+        connection.close()
+    return messages, errors
+
+
+def dispatch(messages, pool):
+    """Deliver claimed messages. Returns (sent, failed) counts."""
+    by_channel = defaultdict(list)
+    for msg in messages:
+        by_channel[msg.channel].append(msg)
+
+    futures = []
+    for channel, group in by_channel.items():
+        size = getattr(get_provider(channel), "batch_size", 100)
+        for start in range(0, len(group), size):
+            futures.append(pool.submit(_deliver, channel, group[start:start + size]))
+
+    sent, failed = [], []
+    for future in futures:
+        batch, errors = future.result()
+        for msg in batch:
+            (failed if msg.id in errors else sent).append((msg, errors.get(msg.id)))
+
+    if sent:
+        OutboxMessage.objects.filter(id__in=[msg.id for msg, _ in sent]).update(
+            status=OutboxMessage.SENT, sent_at=timezone.now(), last_error=""
+        )
+    max_attempts = getattr(settings, "BOOKING_OUTBOX_MAX_ATTEMPTS", MAX_ATTEMPTS)
+    for msg, error in failed:
+        msg.attempts += 1
+        msg.last_error = error or ""
+        if msg.attempts >= max_attempts:
+            msg.status = OutboxMessage.FAILED
+        else:
+            msg.status = OutboxMessage.PENDING
+            delay = min(BACKOFF_SECONDS * 2 ** (msg.attempts - 1), 3600)
+            msg.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        msg.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+    return len(sent), len(failed)
+
+
+def drain(threads=1, limit=200, keys=None):
+    """Deliver everything that is due right now. Returns (sent, failed).
+
+    ``keys`` limits it to the messages with those idempotency keys.
+    """
+    totals = [0, 0]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        while True:
+            batch = claim_batch(limit, keys)
+            if not batch:
+                return tuple(totals)
+            sent, failed = dispatch(batch, pool)
+            totals[0] += sent
+            totals[1] += failed
+
+
+def stats():
+    """Queue depth and lag (age of the oldest undelivered message, seconds)."""
+    waiting = OutboxMessage.objects.filter(status__in=[OutboxMessage.PENDING, OutboxMessage.SENDING])
+    oldest = waiting.aggregate(oldest=Min("created_at"))["oldest"]
+    return {
+        "depth": waiting.count(),
+        "failed": OutboxMessage.objects.filter(status=OutboxMessage.FAILED).count(),
+        "lag": (timezone.now() - oldest).total_seconds() if oldest else 0.0,
+    }
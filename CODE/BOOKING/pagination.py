@@ -0,0 +1,122 @@
+# booking/pagination.py
+"""
+Keyset (seek) pagination for appointment lists.
+
+Instead of OFFSET, each page remembers the (date, time, id) of its last row
+and the next page asks for rows strictly after it. The database can walk an
+index straight to that point, so page 500 costs the same as page 1, and rows
+added or removed meanwhile never shift what the next page shows.
+
+Cursors are opaque url-safe strings, e.g. ``?after=MjAyNi0xMC0xOHwwOTozMDowMHw0Mg``.
+"""
+import base64
+from datetime import date, time
+
+from django.conf import settings
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+def page_size(request):
+    """``?size=`` from the request, falling back to BOOKING_PAGE_SIZE."""
+    default = getattr(settings, "BOOKING_PAGE_SIZE", DEFAULT_PAGE_SIZE)
+    size = request.GET.get("size", "")
+    if size.isdigit() and int(size) > 0:
+        return min(int(size), MAX_PAGE_SIZE)
+    return default
+
+
+def pack(*parts):
+    """Opaque url-safe token for a cursor made of ``parts``."""
+    raw = "|".join(str(part) for part in parts)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def unpack(token):
+    """The parts of a ``pack`` token, or None if it is missing/garbled."""
+    if not token:
+        return None
+    try:
+        return base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode().split("|")
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def encode_cursor(row):
+    return pack(row.date.isoformat(), row.time.isoformat(), row.pk)
+
+
+def decode_cursor(token):
+    """Return (date, time, id) or None if the cursor is missing/garbled."""
+    try:
+        day, start, pk = unpack(token)
+        return date.fromisoformat(day), time.fromisoformat(start), int(pk)
+    except (TypeError, ValueError):
+        return None
+
+
+def _after(cursor, descending):
+    day, start, pk = cursor
+    op = "lt" if descending else "gt"
+    return (
+        Q(**{f"date__{op}": day})
+        | Q(date=day, **{f"time__{op}": start})
+        | Q(date=day, time=start, **{f"id__{op}": pk})
+    )
+
+
+class KeysetPage:
+    """One page of rows plus the query string for the next page.
+
+    Behaves like a list in templates, so ``{% if page %}`` and
+    ``{% for row in page %}`` keep working.
+    """
+
+    def __init__(self, rows, next_query, first_query, is_first, next_cursor=None):
+        self.rows = rows
+        self.next_query = next_query
+        self.next_cursor = next_cursor
+        self.first_query = first_query
+        self.is_first = is_first
+
+    @property
+    def has_next(self):
+        return self.next_query is not None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+
+def paginate(request, queryset, param="after", descending=False):
+    """Return a KeysetPage of ``queryset`` ordered by (date, time, id).
+
+    ``param`` is the GET parameter holding this list's cursor, so a page can
+    show more than one independently paginated list.
+    """
+    size = page_size(request)
+    cursor = decode_cursor(request.GET.get(param))
+    order = ("-date", "-time", "-id") if descending else ("date", "time", "id")
+
+    queryset = queryset.order_by(*order)
+    if cursor:
+        queryset = queryset.filter(_after(cursor, descending))
+    rows = list(queryset[: size + 1])
+
+    params = request.GET.copy()
+    params.pop(param, None)
+    first_query = params.urlencode()
+
+    next_query = next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        params[param] = next_cursor = encode_cursor(rows[-1])
+        next_query = params.urlencode()
+    return KeysetPage(rows, next_query, first_query, is_first=cursor is None, next_cursor=next_cursor)
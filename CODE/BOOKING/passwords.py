@@ -0,0 +1,19 @@
+# booking/passwords.py
+"""
+Password hashing for process pools (used by booking/importer.py).
+
+Kept free of model imports so a worker process started with "spawn" or
+"forkserver" can load it before Django is set up.
+"""
+
+
+def init_worker():
+    import django
+
+    django.setup()
+
+
+def hash_password(password):
+    from django.contrib.auth.hashers import make_password
+
+    return make_password(password)
@@ -0,0 +1,78 @@
+# booking/ratelimit.py
+"""
+Token-bucket rate limiting for the JSON API (booking/api.py).
+
+Each client has a bucket of BOOKING_API_BURST tokens that refills at
+BOOKING_API_RATE tokens a second. A call takes a token; a call that finds
+the bucket empty is answered 429 with Retry-After. The client is the
+logged-in user, or the address the request came from.
+
+Buckets live in process memory, so a call costs no cache round-trip, but
+the limit is per worker process: with N workers a client can get up to N
+times the rate. A bucket that has refilled is the same as no bucket, so
+those are dropped once there are more than MAX_BUCKETS.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+DEFAULT_RATE = 5.0      # tokens per second
+DEFAULT_BURST = 30
+MAX_BUCKETS = 10000
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._buckets = {}              # key -> (tokens, when they were counted)
+        self._prune_at = MAX_BUCKETS
+        self._lock = threading.Lock()
+
+    def take(self, key, cost=1):
+        """Take ``cost`` tokens from ``key``'s bucket.
+
+        Returns 0 if they were there, otherwise the seconds until they will be
+        (nothing is taken then).
+        """
+        with self._lock:
+            now = self.clock()
+            tokens, counted = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - counted) * self.rate)
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                return (cost - tokens) / self.rate
+            self._buckets[key] = (tokens - cost, now)
+            if len(self._buckets) > self._prune_at:
+                self._prune(now)
+            return 0
+
+    def _prune(self, now):
+        for key, (tokens, counted) in list(self._buckets.items()):
+            if tokens + (now - counted) * self.rate >= self.burst:
+                del self._buckets[key]
+        # Under a flood of new clients nothing may be full yet; don't sweep
+        # again until the table has doubled.
+        self._prune_at = max(MAX_BUCKETS, 2 * len(self._buckets))
+
+
+def client_key(request):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"addr:{request.META.get('REMOTE_ADDR', '')}"
+
+
+_limiter = None
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        _limiter = TokenBucket(
+            getattr(settings, "BOOKING_API_RATE", DEFAULT_RATE),
+            getattr(settings, "BOOKING_API_BURST", DEFAULT_BURST),
+        )
+    return _limiter
@@ -0,0 +1,186 @@
+# booking/realtime.py
+"""
+Live notification delivery (pub/sub behind the SSE and long-poll views).
+
+A subscriber is one open browser connection for one patient. Events are
+plain dicts ``{"type": "notification" | "read", ...}`` published per
+patient.
+
+``InProcessBroker`` (the default) fans events out to the subscribers of
+the current process. Notifications created in *another* process (the
+``dispatch_outbox`` worker) reach it through a single watcher thread per
+process that looks for new Notification rows once every
+BOOKING_REALTIME_POLL_SECONDS - one cheap primary-key query per process, no
+matter how many connections are open. Subscribers drop events they have
+already seen, so a notification published locally and then found by the
+watcher is only delivered once.
+
+Waiting costs nothing per connection under ASGI (an ``asyncio.Event``);
+under WSGI each open stream holds a worker thread, so run the site with an
+ASGI server (``uvicorn doctorapp.asgi:application``) to keep thousands of
+connections on one worker.
+
+Another broker (e.g. one backed by Redis pub/sub) can be plugged in with
+BOOKING_REALTIME_BROKER; it needs ``publish``, ``subscribe`` and
+``unsubscribe``.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BROKER = "booking.realtime.InProcessBroker"
+POLL_SECONDS = 1.0
+BACKLOG = 100            # events buffered per subscriber between reads
+
+
+def notification_event(note_id, message, created_at):
+    return {"type": "notification", "id": note_id, "message": message, "created_at": created_at.isoformat()}
+
+
+class Subscription:
+    """Events for one patient, waited on from async code or a plain thread."""
+
+    def __init__(self, patient_id, last_id=0, loop=None):
+        self.patient_id = patient_id
+        self.last_id = last_id
+        self.loop = loop
+        self.events = deque(maxlen=BACKLOG)
+        self._async_ready = asyncio.Event() if loop else None
+        self._ready = threading.Event()
+
+    def put(self, event):
+        self.events.append(event)
+        if self.loop:
+            try:
+                self.loop.call_soon_threadsafe(self._async_ready.set)
+            except RuntimeError:
+                pass  # the connection's event loop has already closed
+        else:
+            self._ready.set()
+
+    def _take(self):
+        taken = []
+        while self.events:
+            event = self.events.popleft()
+            if event["type"] == "notification":
+                if event["id"] <= self.last_id:
+                    continue  # already delivered
+                self.last_id = event["id"]
+            taken.append(event)
+        return taken
+
+    async def aget(self, timeout):
+        """Wait up to ``timeout`` seconds; returns a (possibly empty) list of events."""
+        deadline = time.monotonic() + timeout
+        while True:
+            taken = self._take()
+            remaining = deadline - time.monotonic()
+            if taken or remaining <= 0:
+                return taken
+            try:
+                await asyncio.wait_for(self._async_ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+            self._async_ready.clear()
+
+    def get(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            taken = self._take()
+            remaining = deadline - time.monotonic()
+            if taken or remaining <= 0:
+                return taken
+            self._ready.wait(remaining)
+            self._ready.clear()
+
+
+class InProcessBroker:
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.lock = threading.Lock()
+        self._watcher = None
+        self._started = threading.Event()
+
+    def subscribe(self, patient_id, last_id=0, loop=None):
+        """Start receiving a patient's events.
+
+        Anything committed after this returns is delivered, so callers
+        subscribe first and then load whatever they missed before.
+        """
+        subscription = Subscription(patient_id, last_id, loop)
+        with self.lock:
+            self.subscribers[patient_id].add(subscription)
+            if self._watcher is None or not self._watcher.is_alive():
+                self._started.clear()
+                self._watcher = threading.Thread(target=self._watch, name="notification-watcher", daemon=True)
+                self._watcher.start()
+        # Only blocks the first time: the watcher must have its starting
+        # point before the caller looks for missed rows.
+        self._started.wait(5)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subs = self.subscribers.get(subscription.patient_id)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self.subscribers[subscription.patient_id]
+
+    def publish(self, patient_id, event):
+        with self.lock:
+            subs = list(self.subscribers.get(patient_id, ()))
+        for subscription in subs:
+            subscription.put(event)
+
+    def connections(self):
+        with self.lock:
+            return sum(len(subs) for subs in self.subscribers.values())
+
+    def _watch(self):
+        interval = getattr(settings, "BOOKING_REALTIME_POLL_SECONDS", POLL_SECONDS)
+        last_id = None
+        stop = threading.Event()
+        while True:
+            try:
+                with self.lock:
+                    listening = bool(self.subscribers)
+                if last_id is None or not listening:
+                    # Nobody to deliver to: just keep the starting point current.
+                    last_id = Notification.objects.order_by("-id").values_list("id", flat=True).first() or 0
+                    self._started.set()
+                else:
+                    rows = list(
+                        Notification.objects.filter(id__gt=last_id)
+                        .order_by("id")
+                        .values_list("id", "patient_id", "message", "created_at")[:1000]
+                    )
+                    for note_id, patient_id, message, created_at in rows:
+                        self.publish(patient_id, notification_event(note_id, message, created_at))
+                        last_id = note_id
+                    if len(rows) == 1000:
+                        continue  # more waiting; don't sleep
+            except Exception:
+                logger.exception("notification watcher failed; retrying")
+                connection.close()
+            stop.wait(interval)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, "BOOKING_REALTIME_BROKER", DEFAULT_BROKER))()
+    return _broker
@@ -0,0 +1,99 @@
+# booking/routers.py
+"""
+Read-replica routing (only installed when DATABASE_REPLICA_URL is set).
+
+By default every query goes to "default". ReplicaMiddleware marks a
+request as replica-safe when it resolves to one of BOOKING_REPLICA_VIEWS,
+and only then do reads go to "replica". Two things send a request back to
+the primary:
+
+* the first write inside the request, so the view reads what it has just
+  written;
+* the ``db_primary`` cookie, which is set for BOOKING_REPLICA_PIN_SECONDS
+  after any successful POST. A patient who has just booked then sees the
+  booking on the next page even if the replica is still behind.
+
+The state lives in a ContextVar, so threads and async tasks each see only
+their own request. Code outside a request (commands, the outbox, the
+realtime watcher) always uses the primary, and so do sessions and users.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+
+REPLICA = "replica"
+PIN_COOKIE = "db_primary"
+
+# Views that only read and can live with a few seconds of replication lag.
+REPLICA_VIEWS = getattr(settings, "BOOKING_REPLICA_VIEWS", (
+    "home",
+    "search_doctors",
+    "doctor_report",
+    "patient_history",
+    "patient_medical_history",
+    "view_medical_history",
+    "search_suggest",
+    "clinic_report",
+    "patient_timeline",
+    "timeline_history",
+    "api_v1:doctors",
+    "api_v1:availability",
+    "api_v1:history",
+    "api_v1:history_record",
+    "api_v1:timeline",
+))
+
+# Sessions and users are always read from the primary: a session written
+# by a login must be found on the very next request.
+PRIMARY_APPS = ("sessions", "auth")
+
+
+class _Route:
+    __slots__ = ("replica", "wrote")
+
+    def __init__(self):
+        self.replica = False
+        self.wrote = False
+
+
+_route = ContextVar("booking_db_route", default=None)
+
+
+def start():
+    return _route.set(_Route())
+
+
+def finish(token):
+    _route.reset(token)
+
+
+def prefer_replica():
+    route = _route.get()
+    if route is not None:
+        route.replica = True
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        route = _route.get()
+        if model._meta.app_label in PRIMARY_APPS:
+            return "default"
+        if route is not None and route.replica and not route.wrote:
+            return REPLICA
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        route = _route.get()
+        if route is not None:
+            route.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True     # the replica holds the same rows as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
@@ -0,0 +1,101 @@
+# booking/schedules.py
+"""
+Working hours: weekly ScheduleRule rows plus one-off DoctorSchedule rows.
+
+A rule ("Mondays 09:00-13:00, 20 minute slots, from March, not on
+2026-04-06") is stored once and expanded into concrete windows only for
+the dates somebody asks about, so storage grows with the number of rules,
+not the number of days.
+
+Expansions are kept in a per-process LRU cache. The cache key is the rule
+data itself, so editing a rule simply produces a new key - nothing has to
+be invalidated - and old entries fall out as the cache fills up.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+
+from .models import DoctorSchedule, ScheduleRule
+
+CACHE_SIZE = 1024
+
+
+def _minutes(t):
+    return t.hour * 60 + t.minute
+
+
+def _rule_key(rule):
+    """Hashable, immutable copy of everything expansion depends on."""
+    return (
+        rule.weekday,
+        _minutes(rule.start_time),
+        _minutes(rule.end_time),
+        rule.slot_minutes,
+        rule.valid_from,
+        rule.valid_until,
+        tuple(sorted(rule.exceptions or ())),
+    )
+
+
+def _occurrences(rule_key, start_date, end_date):
+    """Dates in [start_date, end_date] the rule applies to (a generator)."""
+    weekday, _, _, _, valid_from, valid_until, exceptions = rule_key
+    first = max(start_date, valid_from)
+    last = min(end_date, valid_until) if valid_until else end_date
+    day = first + timedelta(days=(weekday - first.weekday()) % 7)
+    while day <= last:
+        if day.isoformat() not in exceptions:
+            yield day
+        day += timedelta(days=7)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _expand(rule_keys, start_date, end_date):
+    """``((date, ((start, end, slot_minutes), ...)), ...)`` for a doctor's rules."""
+    days = defaultdict(list)
+    for key in rule_keys:
+        _, start, end, step, _, _, _ = key
+        for day in _occurrences(key, start_date, end_date):
+            days[day].append((start, end, step))
+    return tuple((day, tuple(sorted(windows))) for day, windows in sorted(days.items()))
+
+
+def expand(rules, one_offs, start_date, end_date, default_minutes):
+    """Turn already loaded rules and DoctorSchedule rows into windows.
+
+    Returns ``{(doctor_id, date): [(start_minute, end_minute, slot_minutes), ...]}``.
+    One-off rows outside the date range are ignored.
+    """
+    result = defaultdict(list)
+
+    keys = defaultdict(list)
+    for rule in rules:
+        keys[rule.doctor_id].append(_rule_key(rule))
+    for doctor_id, doctor_keys in keys.items():
+        for day, spans in _expand(tuple(sorted(doctor_keys, key=repr)), start_date, end_date):
+            result[(doctor_id, day)].extend((start, end, step or default_minutes) for start, end, step in spans)
+
+    for schedule in one_offs:
+        if start_date <= schedule.date <= end_date:
+            result[(schedule.doctor_id, schedule.date)].append(
+                (_minutes(schedule.start_time), _minutes(schedule.end_time), default_minutes)
+            )
+    return result
+
+
+def windows(doctor_ids, start_date, end_date, default_minutes):
+    """Working windows per doctor per day between two dates (inclusive).
+
+    Same shape as ``expand``; one query for rules and one for one-off dates.
+    """
+    rules = ScheduleRule.objects.filter(doctor_id__in=doctor_ids, valid_from__lte=end_date).exclude(
+        valid_until__lt=start_date
+    ).only("doctor_id", "weekday", "start_time", "end_time", "slot_minutes", "valid_from", "valid_until", "exceptions")
+    one_offs = DoctorSchedule.objects.filter(
+        doctor_id__in=doctor_ids, date__range=(start_date, end_date)
+    ).only("doctor_id", "date", "start_time", "end_time")
+    return expand(rules, one_offs, start_date, end_date, default_minutes)
+
+
+def cache_info():
+    return _expand.cache_info()
@@ -0,0 +1,312 @@
+# booking/search.py
+"""
+Doctor search.
+
+Doctors are indexed on three fields - name (username + first/last name),
+specialization and location - after normalising them (lower case, accents
+stripped, punctuation removed). Two interchangeable backends:
+
+* ``FtsBackend`` - an SQLite FTS5 table (``booking_doctor_search``, created
+  by migrations 0006/0012 when the SQLite build has FTS5). Prefix queries,
+  ranked with bm25 so a name hit beats a location hit. The doctor id is
+  the table's rowid, so updating one doctor is a key lookup rather than
+  a scan of the whole index.
+* ``TrigramIndex`` - an in-process trigram index, used when FTS5 isn't
+  there (e.g. PostgreSQL) and, everywhere, as the typo-tolerant fallback
+  when an exact prefix search finds nothing ("cardiolgy", "neur").
+
+Both are updated incrementally from signals when a doctor changes. The
+trigram index also rebuilds itself when the doctor directory version moves
+on, which is how changes made by other worker processes reach it. That
+rebuild runs in a background thread; searches keep using the current index
+until the new one is swapped in.
+"""
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+from . import directory
+from .models import Doctor
+
+FTS_TABLE = "booking_doctor_search"
+FIELD_WEIGHTS = {"name": 3.0, "specialization": 2.0, "location": 1.0}
+MIN_SIMILARITY = 0.5
+RANK_CANDIDATES = 200
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"[^0-9a-z]+", " ", text.lower()).strip()
+
+
+def _document(doctor):
+    user = doctor.user
+    return {
+        "name": normalize(f"{user.username} {user.first_name} {user.last_name}"),
+        "specialization": normalize(doctor.specialization),
+        "location": normalize(doctor.location),
+    }
+
+
+def _documents(doctor_ids=None):
+    queryset = Doctor.objects.select_related("user")
+    if doctor_ids is not None:
+        queryset = queryset.filter(id__in=doctor_ids)
+    for doctor in queryset.iterator(chunk_size=2000):
+        yield doctor.id, _document(doctor)
+
+
+# ----------------------------
+# SQLite FTS5 backend
+# ----------------------------
+class FtsBackend:
+    _available = None
+
+    @classmethod
+    def available(cls):
+        if cls._available is None:
+            cls._available = connection.vendor == "sqlite" and FTS_TABLE in connection.introspection.table_names()
+        return cls._available
+
+    def search(self, query, limit):
+        tokens = normalize(query).split()
+        if not tokens:
+            return []
+        match = " AND ".join(f'"{token}"*' for token in tokens)
+        # Scoring every hit of a broad query ("neuro" on a big clinic) is what
+        # costs time, so at most RANK_CANDIDATES hits are scored: name hits
+        # first (they rank highest), then hits in any field.
+        scores = {}
+        with connection.cursor() as cursor:
+            for expression in (f"{{name}} : ({match})", match):
+                cursor.execute(
+                    f"SELECT rowid, bm25({FTS_TABLE}, %s, %s, %s) FROM {FTS_TABLE} "
+                    f"WHERE {FTS_TABLE} MATCH %s LIMIT %s",
+                    [FIELD_WEIGHTS["name"], FIELD_WEIGHTS["specialization"], FIELD_WEIGHTS["location"],
+                     expression, RANK_CANDIDATES],
+                )
+                scores.update(cursor.fetchall())
+        # bm25() is lower-is-better
+        return sorted(scores, key=lambda d: (scores[d], d))[:limit]
+
+    def update(self, doctor_ids):
+        doctor_ids = list(doctor_ids)
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[i] for i in doctor_ids])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, specialization, location) VALUES (%s, %s, %s, %s)",
+                [[i, d["name"], d["specialization"], d["location"]] for i, d in _documents(doctor_ids)],
+            )
+
+    def remove(self, doctor_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [doctor_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            batch = []
+            for doctor_id, doc in _documents():
+                batch.append([doctor_id, doc["name"], doc["specialization"], doc["location"]])
+                if len(batch) == 2000:
+                    self._insert(cursor, batch)
+            self._insert(cursor, batch)
+
+    def _insert(self, cursor, batch):
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, specialization, location) VALUES (%s, %s, %s, %s)", batch
+        )
+        batch.clear()
+
+
+# ----------------------------
+# In-process trigram index
+# ----------------------------
+def _grams(token):
+    # Pad the front only, so a query that is a prefix of a word matches all
+    # of its own trigrams ("car" -> "  c", " ca", "car").
+    padded = f"  {token}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Fuzzy prefix index over the vocabulary of indexed words.
+
+    ``grams`` maps a trigram to the words containing it and ``words`` maps a
+    word to the doctors (and field weight) it appears for. A query word is
+    first matched against the vocabulary - which is far smaller than the
+    doctor list - and only the words that are close enough are expanded to
+    doctors.
+    """
+
+    def __init__(self):
+        self.grams = defaultdict(set)
+        self.words = defaultdict(dict)
+        self.doc_words = {}
+        self.version = None
+        self.lock = threading.Lock()
+        self._refreshing = False
+
+    def _add(self, doctor_id, doc):
+        seen = set()
+        for field, text in doc.items():
+            for word in text.split():
+                postings = self.words[word]
+                if not postings:
+                    for gram in _grams(word):
+                        self.grams[gram].add(word)
+                postings[doctor_id] = max(postings.get(doctor_id, 0), FIELD_WEIGHTS[field])
+                seen.add(word)
+        self.doc_words[doctor_id] = seen
+
+    def _remove(self, doctor_id):
+        for word in self.doc_words.pop(doctor_id, ()):
+            postings = self.words[word]
+            postings.pop(doctor_id, None)
+            if not postings:
+                del self.words[word]
+                for gram in _grams(word):
+                    self.grams[gram].discard(word)
+
+    def rebuild(self):
+        """Build a fresh index from the database and swap it in."""
+        # Read the version first: a change made while we build leaves us
+        # behind it, so the next search refreshes again.
+        version = directory.current_version()
+        fresh = TrigramIndex()
+        for doctor_id, doc in _documents():
+            fresh._add(doctor_id, doc)
+        with self.lock:
+            self.grams, self.words, self.doc_words = fresh.grams, fresh.words, fresh.doc_words
+            self.version = version
+
+    def refresh(self):
+        """Rebuild in a background thread, unless one is already running."""
+        with self.lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="trigram-refresh", daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self.rebuild()
+        finally:
+            self._refreshing = False
+            connection.close()
+
+    def update(self, doctor_ids):
+        with self.lock:
+            for doctor_id, doc in _documents(doctor_ids):
+                self._remove(doctor_id)
+                self._add(doctor_id, doc)
+            self._catch_up()
+
+    def remove(self, doctor_id):
+        with self.lock:
+            self._remove(doctor_id)
+            self._catch_up()
+
+    def _catch_up(self):
+        # Our own change already bumped the directory version; adopt it so
+        # the next search doesn't rebuild. Only if we were current before.
+        if self.version is not None:
+            self.version = directory.current_version()
+
+    def _similar_words(self, token):
+        """``{word: similarity}`` for vocabulary words close to ``token``."""
+        grams = sorted(_grams(token), key=lambda g: len(self.grams.get(g, ())))
+        need = max(1, math.ceil(MIN_SIMILARITY * len(grams)))
+        # A word sharing ``need`` trigrams must share one of the rarest
+        # len - need + 1, so only those are used to find candidates.
+        candidates = set()
+        for gram in grams[: len(grams) - need + 1]:
+            candidates |= self.grams.get(gram, set())
+        similar = {}
+        for word in candidates:
+            shared = sum(1 for gram in grams if word in self.grams.get(gram, ()))
+            if shared >= need:
+                similar[word] = shared / len(grams)
+        return similar
+
+    def search(self, query, limit):
+        if self.version is None:
+            self.rebuild()      # nothing to serve yet; booking.warmup does this up front
+        elif self.version != directory.current_version():
+            self.refresh()      # serve the current index meanwhile
+        tokens = normalize(query).split()
+        if not tokens:
+            return []
+
+        scores = None
+        for token in tokens:
+            token_scores = {}
+            for word, similarity in self._similar_words(token).items():
+                for doctor_id, weight in self.words[word].items():
+                    score = similarity * weight
+                    if score > token_scores.get(doctor_id, 0):
+                        token_scores[doctor_id] = score
+            # Every query word has to match (AND); scores add up.
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {d: scores[d] + s for d, s in token_scores.items() if d in scores}
+            if not scores:
+                return []
+        return heapq.nlargest(limit, scores, key=lambda d: (scores[d], -d))
+
+
+_trigrams = TrigramIndex()
+
+
+# ----------------------------
+# Public API
+# ----------------------------
+def search(query, limit=50):
+    """Doctor ids best match first. Falls back to fuzzy matching on no hits."""
+    ids = FtsBackend().search(query, limit) if FtsBackend.available() else []
+    return ids or _trigrams.search(query, limit)
+
+
+def suggest(query, limit=8):
+    """Autocomplete: ``[{"id", "name", "specialization", "location"}, ...]``."""
+    ids = search(query, limit)
+    doctors = Doctor.objects.select_related("user").in_bulk(ids)
+    return [
+        {
+            "id": doctor_id,
+            "name": doctors[doctor_id].user.username,
+            "specialization": doctors[doctor_id].specialization,
+            "location": doctors[doctor_id].location,
+        }
+        for doctor_id in ids
+        if doctor_id in doctors
+    ]
+
+
+def index_doctors(doctor_ids):
+    """Re-index some doctors after they changed (called from signals)."""
+    doctor_ids = list(doctor_ids)
+    # The FTS table lives in the same database, so it commits or rolls back
+    # with the change; the in-process index only follows committed data.
+    if FtsBackend.available():
+        FtsBackend().update(doctor_ids)
+    transaction.on_commit(lambda: _trigrams.update(doctor_ids))
+
+
+def unindex_doctor(doctor_id):
+    if FtsBackend.available():
+        FtsBackend().remove(doctor_id)
+    transaction.on_commit(lambda: _trigrams.remove(doctor_id))
+
+
+def rebuild():
+    if FtsBackend.available():
+        FtsBackend().rebuild()
+    _trigrams.rebuild()
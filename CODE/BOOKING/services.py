@@ -0,0 +1,290 @@
+# booking/services.py
+"""
+Booking service.
+
+All writes that claim a slot go through here so the rules live in one
+place:
+
+* the slot must be inside the doctor's free time (availability engine), and
+* the insert/update is protected by the ``unique_active_slot`` constraint on
+  Appointment, so two requests racing for the same doctor/date/time can never
+  both win - the loser gets ``SlotTaken``.
+
+On PostgreSQL the doctor row is also locked with SELECT ... FOR UPDATE so
+overlapping (not just identical) times are serialised. SQLite ignores the
+lock but only allows one writer at a time, and the unique index still
+catches identical times.
+
+Status changes follow Appointment.TRANSITIONS. They are applied with a
+conditional ``UPDATE ... WHERE status = <the status we read>`` instead of
+a row lock: if someone else moved the appointment first the UPDATE matches
+nothing and the caller gets ``InvalidTransition`` rather than silently
+overwriting their change. Every change writes an AppointmentTransition row
+and updates the DoctorDailyStats rollup (``stats.record``) in the same
+transaction, and touches the doctor's and patient's page stamps
+(``stamps.touch``) so their cached dashboards are rebuilt.
+
+A slot freed by a cancellation, rejection or reschedule is offered to the
+waitlist in that same transaction (``waitlist.backfill``). Appointments
+cancelled by a leave are offered slots after it instead (``waitlist.rehome``).
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import stamps, stats, waitlist
+from .availability import is_slot_free
+from .models import Appointment, AppointmentTransition, Doctor, WaitlistEntry
+from .outbox import INAPP, SMS, enqueue, enqueue_many
+
+
+Status = Appointment.Status
+
+# Set-based changes retry this many times when rows move under them.
+RETRIES = 3
+
+
+class SlotTaken(Exception):
+    """The requested slot is not (or no longer) free."""
+
+
+class InvalidTransition(Exception):
+    """The appointment can't make that status change (or was just changed)."""
+
+
+class _Raced(Exception):
+    pass
+
+
+def _lock_doctor(doctor_id):
+    list(Doctor.objects.select_for_update().filter(pk=doctor_id).values_list("pk", flat=True))
+
+
+def _log(moves, by=None):
+    """Append ``(appointment_id, from_status, to_status)`` rows to the log.
+
+    Returns ``{appointment_id: transition_id}``. A transition id names one
+    particular change, so it makes the outbox key of the messages about it.
+    """
+    logged = AppointmentTransition.objects.bulk_create([
+        AppointmentTransition(appointment_id=appt_id, from_status=old, to_status=new, changed_by=by)
+        for appt_id, old, new in moves if old != new
+    ])
+    return {transition.appointment_id: transition.id for transition in logged}
+
+
+def _move_rows(rows, status, by=None):
+    """Move ``(id, status, date, doctor_id, patient_id)`` rows to ``status``.
+
+    One conditional UPDATE per current status. If any of them matches
+    fewer rows than were read, another request got there first: raise
+    _Raced so the caller's savepoint rolls the whole batch back. Returns
+    ``_log``'s ``{appointment_id: transition_id}``.
+    """
+    groups = {}
+    for appt_id, old_status, *_ in rows:
+        groups.setdefault(old_status, []).append(appt_id)
+    for old_status, ids in groups.items():
+        if Appointment.objects.filter(id__in=ids, status=old_status).update(status=status) != len(ids):
+            raise _Raced()
+    transitions = _log([(appt_id, old_status, status) for appt_id, old_status, *_ in rows], by)
+    changes = []
+    for _, old_status, day, doctor_id, _ in rows:
+        changes += [(doctor_id, day, old_status, -1), (doctor_id, day, status, +1)]
+    stats.record(changes)
+    stamps.touch(doctors=[row[3] for row in rows], patients=[row[4] for row in rows])
+    return transitions
+
+
+def book_slot(doctor, patient, date, time):
+    """Create a Booked appointment or raise SlotTaken."""
+    with transaction.atomic():
+        _lock_doctor(doctor.id)
+        if not is_slot_free(doctor.id, date, time):
+            raise SlotTaken()
+        try:
+            with transaction.atomic():
+                appointment = Appointment.objects.create(doctor=doctor, patient=patient, date=date, time=time)
+        except IntegrityError as exc:
+            raise SlotTaken() from exc
+        stats.record([(doctor.id, date, appointment.status, +1)])
+    return appointment
+
+
+def reschedule_slot(appointment, date, time, by=None):
+    """Move an appointment to a new slot (status back to Booked).
+
+    Raises SlotTaken, or InvalidTransition for a Completed appointment.
+    """
+    old_date, old_time, old_status = appointment.date, appointment.time, appointment.status
+    if old_status != Status.BOOKED and not Appointment.can_move(old_status, Status.BOOKED):
+        raise InvalidTransition(f"A {appointment.get_status_display()} appointment can't be rescheduled.")
+    with transaction.atomic():
+        _lock_doctor(appointment.doctor_id)
+        if not is_slot_free(appointment.doctor_id, date, time, exclude_appointment=appointment.id):
+            raise SlotTaken()
+        try:
+            with transaction.atomic():
+                moved = Appointment.objects.filter(pk=appointment.pk, status=old_status).update(
+                    date=date, time=time, status=Status.BOOKED, reminder_sent_at=None
+                )
+        except IntegrityError as exc:
+            raise SlotTaken() from exc
+        if not moved:
+            raise InvalidTransition("The appointment was changed by someone else; please try again.")
+        appointment.date, appointment.time = date, time
+        appointment.status, appointment.reminder_sent_at = Status.BOOKED, None
+        _log([(appointment.pk, old_status, Status.BOOKED)], by)
+        stats.record(stats.moved(appointment, old_status, Status.BOOKED, old_date))
+        stamps.touch(doctors=[appointment.doctor_id], patients=[appointment.patient_id])
+        if old_status != Status.CANCELLED:
+            waitlist.backfill([(appointment.doctor_id, old_date, old_time, appointment.patient_id)])
+    return appointment
+
+
+def set_status(appointment, status, by=None):
+    """Move one appointment to ``status`` or raise InvalidTransition."""
+    _change_status(appointment, status, by)
+    return appointment
+
+
+def _change_status(appointment, status, by=None):
+    """``set_status``; returns the id of the AppointmentTransition it logged."""
+    old_status = appointment.status
+    if not Appointment.can_move(old_status, status):
+        raise InvalidTransition(
+            f"A {appointment.get_status_display()} appointment can't be made {Status(status).label}."
+        )
+    with transaction.atomic():
+        if not Appointment.objects.filter(pk=appointment.pk, status=old_status).update(status=status):
+            raise InvalidTransition("The appointment was changed by someone else; please try again.")
+        appointment.status = status
+        transitions = _log([(appointment.pk, old_status, status)], by)
+        stats.record(stats.moved(appointment, old_status, status))
+        stamps.touch(doctors=[appointment.doctor_id], patients=[appointment.patient_id])
+        if status == Status.CANCELLED:
+            waitlist.backfill([(appointment.doctor_id, appointment.date, appointment.time, appointment.patient_id)])
+    return transitions[appointment.pk]
+
+
+def cancel(appointment, by=None):
+    """Cancel one appointment (InvalidTransition if it can't be) and text the patient."""
+    transition_id = _change_status(appointment, Status.CANCELLED, by=by)
+    phone = appointment.patient.phone
+    if phone:
+        msg = (
+            f"Dear {appointment.patient.user.username}, your appointment with "
+            f"Dr.{appointment.doctor.user.username} on {appointment.date} at {appointment.time} "
+            f"has been cancelled."
+        )
+        enqueue(SMS, phone, msg, f"cancel:{transition_id}")
+    return appointment
+
+
+def accept_offer(entry):
+    """Book the slot a waitlist offer holds for its patient.
+
+    Raises SlotTaken if the offer has run out or been withdrawn.
+    """
+    with transaction.atomic():
+        claimed = WaitlistEntry.objects.filter(
+            pk=entry.pk, status=WaitlistEntry.Status.OFFERED, offer_expires_at__gt=timezone.now()
+        ).update(status=WaitlistEntry.Status.ACCEPTED)
+        if not claimed:
+            raise SlotTaken()
+        # The hold no longer counts once the entry is Accepted, so the
+        # ordinary booking path sees the slot as free (and rolls the claim
+        # back if it isn't).
+        appointment = book_slot(entry.doctor, entry.patient, entry.date, entry.offered_time)
+        WaitlistEntry.objects.filter(pk=entry.pk).update(appointment=appointment)
+    entry.status, entry.appointment = WaitlistEntry.Status.ACCEPTED, appointment
+    return appointment
+
+
+# Messages sent to the patient after a doctor's bulk action.
+BULK_MESSAGES = {
+    Status.CONFIRMED: "has been confirmed",
+    Status.COMPLETED: "has been marked as completed",
+    Status.CANCELLED: "has been cancelled by the doctor",
+}
+
+
+def bulk_set_status(doctor, appointment_ids, status, by=None):
+    """Move many of a doctor's appointments to ``status`` at once.
+
+    One SELECT picks the rows that belong to ``doctor`` and may make the
+    change (see Appointment.TRANSITIONS), one conditional UPDATE per
+    current status applies it, and the transition log and patient
+    notifications are written with one INSERT each. IDs that aren't the
+    doctor's, or can't make the change, are skipped. Returns
+    ``(changed, skipped)`` counts.
+    """
+    appointment_ids = set(appointment_ids)
+    allowed = [old for old, targets in Appointment.TRANSITIONS.items() if status in targets]
+    for _ in range(RETRIES):
+        try:
+            with transaction.atomic():
+                rows = list(
+                    Appointment.objects.filter(id__in=appointment_ids, doctor=doctor, status__in=allowed)
+                    .values_list("id", "status", "date", "time", "patient_id", "patient__phone")
+                )
+                transitions = _move_rows(
+                    [(appt_id, old, day, doctor.id, patient_id) for appt_id, old, day, _, patient_id, _ in rows], status, by
+                )
+
+                outgoing = []
+                for appt_id, _, day, at, patient_id, phone in rows:
+                    msg = f"Your appointment with Dr.{doctor.user.username} on {day} at {at:%H:%M} {BULK_MESSAGES[status]}."
+                    # Per transition: confirming again after a reschedule is a new message.
+                    key = f"status:{transitions[appt_id]}"
+                    outgoing.append((INAPP, patient_id, msg, key))
+                    if phone:
+                        outgoing.append((SMS, phone, msg, f"{key}:sms"))
+                enqueue_many(outgoing)
+                if status == Status.CANCELLED:
+                    waitlist.backfill([(doctor.id, day, at, patient_id) for _, _, day, at, patient_id, _ in rows])
+        except _Raced:
+            continue
+        return len(rows), len(appointment_ids) - len(rows)
+    raise InvalidTransition("Those appointments kept changing; please try again.")
+
+
+def apply_leave(leave):
+    """Save a DoctorLeave and cancel the Booked appointments it covers.
+
+    Set-based: one SELECT for the affected rows, one conditional UPDATE and
+    one bulk INSERT each for the transition log and the patient
+    notifications and SMS, all in a single transaction, so the cost in
+    round-trips doesn't depend on how many patients are affected. Waitlist
+    places on the leave days are cancelled and the displaced patients are
+    offered the first free slots after the leave. Returns the number of
+    cancelled appointments.
+    """
+    doctor = leave.doctor
+    with transaction.atomic():
+        leave.save()
+        for _ in range(RETRIES):
+            try:
+                with transaction.atomic():
+                    affected = list(
+                        Appointment.objects.filter(
+                            doctor=doctor, date__range=(leave.date, leave.last_day), status=Status.BOOKED
+                        ).order_by("date", "time").values_list("id", "patient_id", "patient__phone", "date")
+                    )
+                    _move_rows(
+                        [(appt_id, Status.BOOKED, day, doctor.id, patient_id) for appt_id, patient_id, _, day in affected],
+                        Status.CANCELLED,
+                    )
+                    outgoing = []
+                    for appt_id, patient_id, phone, day in affected:
+                        msg = f"Your appointment with Dr.{doctor.user.username} on {day} has been cancelled due to leave."
+                        outgoing.append((INAPP, patient_id, msg, f"leave:{leave.id}:{appt_id}"))
+                        if phone:
+                            outgoing.append((SMS, phone, msg, f"leave:{leave.id}:{appt_id}:sms"))
+                    enqueue_many(outgoing)
+                    waitlist.close_days(doctor, leave.date, leave.last_day)
+                    waitlist.rehome(doctor, [(patient_id, phone) for _, patient_id, phone, _ in affected], leave.last_day)
+            except _Raced:
+                continue
+            return len(affected)
+        # Raised inside the outer block so the leave rolls back with it.
+        raise InvalidTransition("Appointments kept changing while applying the leave; please try again.")
@@ -0,0 +1,58 @@
+# booking/signals.py
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import directory, search, stamps
+from .models import Appointment, Doctor, MedicalHistory, Notification
+
+
+def _invalidate_directory():
+    # Bump now so this request sees the change, and again after commit so a
+    # reader that cached the old rows mid-transaction doesn't keep them.
+    directory.invalidate()
+    transaction.on_commit(directory.invalidate)
+
+
+@receiver(post_save, sender=Doctor)
+def doctor_saved(sender, instance, **kwargs):
+    _invalidate_directory()
+    search.index_doctors([instance.pk])
+
+
+@receiver(post_delete, sender=Doctor)
+def doctor_deleted(sender, instance, **kwargs):
+    _invalidate_directory()
+    search.unindex_doctor(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def doctor_user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return  # logins don't change anything the directory shows
+    doctor_id = Doctor.objects.filter(user_id=instance.pk).values_list("id", flat=True).first()
+    if doctor_id:
+        _invalidate_directory()
+        search.index_doctors([doctor_id])
+
+
+# Per-user version stamps (stamps.py) for rows saved or deleted one by one;
+# set-based writes touch the stamps themselves.
+@receiver([post_save, post_delete], sender=Appointment)
+def appointment_changed(sender, instance, **kwargs):
+    stamps.touch(doctors=[instance.doctor_id], patients=[instance.patient_id])
+
+
+@receiver([post_save, post_delete], sender=Notification)
+@receiver([post_save, post_delete], sender=MedicalHistory)
+def patient_record_changed(sender, instance, **kwargs):
+    stamps.touch(patients=[instance.patient_id])
+
+
+@receiver(user_logged_in)
+def remember_profile(sender, request, user, **kwargs):
+    # Saved with the login's own session write, not on the first dashboard.
+    request.session.pop(stamps.PROFILE_KEY, None)
+    stamps.profile(request, user)
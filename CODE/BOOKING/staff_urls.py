@@ -0,0 +1,13 @@
+# booking/staff_urls.py
+"""Staff pages, served only by workers with the full URLconf (doctorapp/urls.py)."""
+from django.urls import path
+
+from .utils import lazy_view
+
+urlpatterns = [
+    path("daily-appointments/", lazy_view("booking.staff_views.daily_appointments"), name="daily_appointments"),
+    path("clinic-report/", lazy_view("booking.staff_views.clinic_report"), name="clinic_report"),
+    path("export/<str:dataset>/", lazy_view("booking.staff_views.export_data"), name="export_data"),
+    path("import/", lazy_view("booking.staff_views.import_data"), name="import_data"),
+    path("metrics/dashboard/", lazy_view("booking.staff_views.metrics_dashboard"), name="metrics_dashboard"),
+]
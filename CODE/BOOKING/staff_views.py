@@ -0,0 +1,144 @@
+# booking/staff_views.py
+"""
+Staff-only pages: daily appointments, the clinic report, data export and
+import, and the metrics dashboard.
+
+They are served from the admin site and from the staff URLs
+(booking/staff_urls.py), never by public workers (BOOKING_ROLE=public),
+and the URLconfs load this module lazily (utils.lazy_view). So the
+exporter, the importer and the admin's decorators stay off the import
+path of a worker that never serves these pages.
+"""
+import io
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import redirect, render
+
+from . import export, importer, metrics, stats
+from .forms import ImportForm
+from .models import Appointment
+from .pagination import paginate
+from .utils import date_params
+
+
+@staff_member_required
+def daily_appointments(request):
+    selected_date = request.GET.get("date")
+    try:
+        (day,) = date_params(request, "date")
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    if selected_date and day is None:
+        return HttpResponseBadRequest(f"date: expected YYYY-MM-DD, got {selected_date}")
+
+    appointments = []
+    if day:
+        appointments = paginate(
+            request,
+            Appointment.objects.filter(date=day).select_related("doctor__user", "patient__user"),
+        )
+
+    return render(request, "daily_appointment.html", {
+        "appointments": appointments,
+        "selected_date": selected_date
+    })
+
+
+@staff_member_required
+def clinic_report(request):
+    try:
+        start, end = date_params(request, "start", "end")
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    period = "month" if request.GET.get("period") == "month" else "week"
+
+    return render(request, "clinic_report.html", {
+        "summary": stats.summary(None, start, end),
+        "breakdown": stats.breakdown(None, start, end, period),
+        "specializations": stats.by_specialization(start, end),
+        "statuses": stats.STATUSES,
+        "start": start,
+        "end": end,
+        "period": period,
+    })
+
+
+@staff_member_required
+def export_data(request, dataset):
+    """Stream a CSV/JSONL export. ?format=csv|jsonl&gzip=1&start=&end=&doctor=&status="""
+    fmt = request.GET.get("format", "csv")
+    gzip = request.GET.get("gzip") in ("1", "true", "yes")
+    doctor = request.GET.get("doctor", "")
+    try:
+        start, end = date_params(request, "start", "end")
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    try:
+        body = export.stream(
+            dataset,
+            fmt=fmt,
+            gzip=gzip,
+            start=start,
+            end=end,
+            doctor=int(doctor) if doctor.isdigit() else None,
+            status=request.GET.get("status") or None,
+        )
+    except export.ExportError as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    if gzip:
+        content_type = "application/gzip"
+    else:
+        content_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    response = StreamingHttpResponse(body, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{export.filename(dataset, fmt, gzip)}"'
+    return response
+
+
+@staff_member_required
+def import_data(request):
+    """Upload a CSV/JSONL file and import it (see booking/importer.py)."""
+    result, errors = None, []
+    if request.method == "POST":
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+
+            def on_error(line, message):
+                if len(errors) < 100:
+                    errors.append((line, message))
+
+            result = importer.run(
+                form.cleaned_data["kind"],
+                importer.read_records(stream, importer.guess_format(upload.name)),
+                dry_run=form.cleaned_data["dry_run"],
+                on_error=on_error,
+            )
+            result["dry_run"] = form.cleaned_data["dry_run"]
+    else:
+        form = ImportForm()
+
+    return render(request, "import_data.html", {"form": form, "result": result, "errors": errors})
+
+
+@staff_member_required
+def metrics_dashboard(request):
+    """Per-view latency/query/size percentiles for this process."""
+    if request.method == "POST" and request.POST.get("reset"):
+        metrics.registry.reset()
+        messages.success(request, "Metrics reset.")
+        return redirect("metrics_dashboard")
+
+    sort = request.GET.get("sort", "p99")
+    rows = metrics.registry.snapshot()
+    if sort in ("p50", "p90", "p99", "count"):
+        rows.sort(key=lambda row: row[1]["request_seconds"][sort], reverse=True)
+    return render(request, "metrics_dashboard.html", {
+        "rows": rows,
+        "sort": sort,
+        "slow_ms": getattr(settings, "BOOKING_SLOW_REQUEST_MS", 500),
+    })
@@ -0,0 +1,146 @@
+# booking/stamps.py
+"""
+Per-user version stamps: conditional GETs and cached fragments.
+
+Every doctor and patient has a version in the cache (``stamp:doctor:<id>``,
+``stamp:patient:<id>``) that changes whenever their appointments,
+notifications or medical history do. ``save()``/``delete()`` are caught
+by signals.py; the set-based paths that use ``update()`` or
+``bulk_create()`` (services, notifications, importer) call ``touch``
+themselves. Touching deletes the version; the next read starts a new one
+from the clock, so a lost or culled key never brings an old page back.
+
+The stamp is used twice:
+
+* ``conditional`` makes it the page's ETag. A reload whose If-None-Match
+  still matches gets a 304 after one cache read - the view, its queries
+  and the template never run;
+* templates key their ``{% cache %}`` fragments on it, so rendering an
+  unchanged page from scratch (a new tab, another device) skips the table
+  and its queries too. The views hand the template lazy objects for that
+  reason, and keep CSRF tokens out of the cached rows.
+
+Versions live in CACHES["default"]; with more than one worker process
+that must be a shared backend, as for the doctor directory.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import directory
+
+PROFILE_KEY = "booking_profile"     # session key for the user's doctor/patient id
+DEFAULT_FRAGMENT_TTL = 600
+
+
+def fragment_ttl():
+    return getattr(settings, "BOOKING_FRAGMENT_TTL", DEFAULT_FRAGMENT_TTL)
+
+
+def _key(kind, pk):
+    return f"stamp:{kind}:{pk}"
+
+
+def _start(key):
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def touch(doctors=(), patients=()):
+    """Mark these doctors' and patients' pages as changed.
+
+    Done now, so the rest of the request sees it, and again on commit, so a
+    page rendered from the old rows in the meantime isn't kept.
+    """
+    keys = [_key("doctor", pk) for pk in set(doctors)] + [_key("patient", pk) for pk in set(patients)]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def profile(request, user=None):
+    """``("doctor", id)``, ``("patient", id)`` or None for the logged-in user.
+
+    Remembered in the session (at login, see signals.py), so a conditional
+    GET needs no profile query.
+    """
+    who = request.session.get(PROFILE_KEY)
+    if who is None:
+        user = user or request.user
+        if hasattr(user, "doctor"):
+            who = ["doctor", user.doctor.id]
+        elif hasattr(user, "patient"):
+            who = ["patient", user.patient.id]
+        else:
+            who = []
+        request.session[PROFILE_KEY] = who
+    return tuple(who) or None
+
+
+def stamp(request, kind, with_directory=False):
+    """Version string of the user's ``kind`` pages, or None if they aren't one.
+
+    ``with_directory`` adds the doctor directory version, for pages that
+    show doctor names. Today's date is part of it, because "upcoming" moves
+    at midnight.
+    """
+    memo = request.__dict__.setdefault("_stamps", {})
+    if (kind, with_directory) not in memo:
+        who = profile(request)
+        value = None
+        if who and who[0] == kind:
+            keys = [_key(*who)] + ([directory.VERSION_KEY] if with_directory else [])
+            found = cache.get_many(keys)
+            versions = [found.get(key) or _start(key) for key in keys]
+            value = f"{kind}{who[1]}." + ".".join(map(str, versions)) + f".{timezone.localdate()}"
+        memo[(kind, with_directory)] = value
+    return memo[(kind, with_directory)]
+
+
+def context(request, kind, with_directory=False):
+    """Template context for ``{% cache fragment_ttl "<name>" stamp ... %}``."""
+    return {"stamp": stamp(request, kind, with_directory), "fragment_ttl": fragment_ttl()}
+
+
+def _etag(request, value):
+    # The same stamp on another URL, with another CSRF secret or with a
+    # flash message waiting is a different page.
+    raw = "|".join([
+        value,
+        request.get_full_path(),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+        request.COOKIES.get(CookieStorage.cookie_name, ""),
+    ])
+    return hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+
+
+def conditional(kind, with_directory=False):
+    """View decorator: ETag from the user's stamp, 304 while it matches.
+
+    Goes under @login_required. Users who aren't a ``kind`` get the view
+    as usual, without an ETag.
+    """
+    def etag(request, *args, **kwargs):
+        value = stamp(request, kind, with_directory)
+        return value and _etag(request, value)
+
+    def decorator(view):
+        checked = condition(etag_func=etag)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = checked(request, *args, **kwargs)
+            if response.has_header("ETag"):
+                # The browser may keep the page but must revalidate it.
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,154 @@
+# booking/stats.py
+"""
+Appointment statistics rollup.
+
+DoctorDailyStats keeps one counter per (doctor, day, status). Every code
+path that creates an appointment or changes its status calls ``record``
+in the same transaction, so reports read a few rows per day instead of
+scanning a doctor's whole appointment history.
+
+Writes that bypass those paths (admin edits, raw SQL, bulk loads) are
+repaired with ``rebuild`` / ``manage.py rebuild_stats``.
+"""
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import Appointment, DoctorDailyStats
+
+# Reports are keyed by status label ("Booked", ...); rows store the number.
+STATUSES = Appointment.Status.labels
+LABELS = dict(Appointment.Status.choices)
+
+
+def record(changes):
+    """Apply ``(doctor_id, date, status, delta)`` changes to the rollup.
+
+    Changes for the same key are folded together first, so a leave that
+    cancels 300 appointments over 5 days touches 10 rows, not 600.
+    """
+    totals = Counter()
+    for doctor_id, day, status, delta in changes:
+        totals[(doctor_id, day, status)] += delta
+
+    for (doctor_id, day, status), delta in totals.items():
+        if not delta:
+            continue
+        row = DoctorDailyStats.objects.filter(doctor_id=doctor_id, date=day, status=status)
+        if row.update(count=F("count") + delta):
+            continue
+        try:
+            with transaction.atomic():
+                DoctorDailyStats.objects.create(doctor_id=doctor_id, date=day, status=status, count=delta)
+        except IntegrityError:
+            # Someone else created the row in between - add to theirs.
+            row.update(count=F("count") + delta)
+
+
+def moved(appointment, old_status, new_status, old_date=None):
+    """Changes for one appointment going from old_status/old_date to new."""
+    return [
+        (appointment.doctor_id, old_date or appointment.date, old_status, -1),
+        (appointment.doctor_id, appointment.date, new_status, +1),
+    ]
+
+
+def rebuild(doctor_ids=None, start=None, end=None):
+    """Recompute the rollup from Appointment for the given scope."""
+    appointments = Appointment.objects.all()
+    stats = DoctorDailyStats.objects.all()
+    if doctor_ids is not None:
+        appointments = appointments.filter(doctor_id__in=doctor_ids)
+        stats = stats.filter(doctor_id__in=doctor_ids)
+    if start:
+        appointments = appointments.filter(date__gte=start)
+        stats = stats.filter(date__gte=start)
+    if end:
+        appointments = appointments.filter(date__lte=end)
+        stats = stats.filter(date__lte=end)
+
+    with transaction.atomic():
+        stats.delete()
+        grouped = (
+            appointments.order_by()
+            .values("doctor_id", "date", "status")
+            .annotate(n=Count("id"))
+        )
+        batch, written = [], 0
+        for row in grouped.iterator(chunk_size=5000):
+            batch.append(DoctorDailyStats(doctor_id=row["doctor_id"], date=row["date"], status=row["status"], count=row["n"]))
+            if len(batch) == 5000:
+                DoctorDailyStats.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        DoctorDailyStats.objects.bulk_create(batch)
+    return written + len(batch)
+
+
+# ----------------------------
+# Reading
+# ----------------------------
+def _empty():
+    return OrderedDict((status, 0) for status in STATUSES)
+
+
+def _scope(doctor_ids=None, start=None, end=None):
+    rows = DoctorDailyStats.objects.all()
+    if doctor_ids is not None:
+        rows = rows.filter(doctor_id__in=doctor_ids)
+    if start:
+        rows = rows.filter(date__gte=start)
+    if end:
+        rows = rows.filter(date__lte=end)
+    return rows
+
+
+def summary(doctor_ids=None, start=None, end=None):
+    """``{status: total}`` over the scope."""
+    totals = _empty()
+    for row in _scope(doctor_ids, start, end).values("status").annotate(total=Sum("count")):
+        totals[LABELS[row["status"]]] = row["total"]
+    return totals
+
+
+def _period_start(day, period):
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def breakdown(doctor_ids=None, start=None, end=None, period="week"):
+    """``[(period_start, {status: total}), ...]`` oldest first.
+
+    Reads the daily rows (grouped per day in SQL) and folds them into
+    weeks or months, so the work is proportional to the number of days.
+    """
+    periods = OrderedDict()
+    rows = (
+        _scope(doctor_ids, start, end)
+        .values("date", "status")
+        .annotate(total=Sum("count"))
+        .order_by("date")
+    )
+    for row in rows:
+        bucket = periods.setdefault(_period_start(row["date"], period), _empty())
+        bucket[LABELS[row["status"]]] += row["total"]
+    return list(periods.items())
+
+
+def by_specialization(start=None, end=None):
+    """``[(specialization, {status: total}), ...]`` for the whole clinic."""
+    groups = OrderedDict()
+    rows = (
+        _scope(start=start, end=end)
+        .values("doctor__specialization", "status")
+        .annotate(total=Sum("count"))
+        .order_by("doctor__specialization")
+    )
+    for row in rows:
+        groups.setdefault(row["doctor__specialization"], _empty())[LABELS[row["status"]]] = row["total"]
+    return list(groups.items())
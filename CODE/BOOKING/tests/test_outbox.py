@@ -0,0 +1,114 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from booking import outbox
+from booking.models import OutboxMessage
+from booking.outbox import SMS, FakeProvider
+
+
+@override_settings(
+    BOOKING_OUTBOX_PROVIDERS={SMS: "booking.outbox.FakeProvider"},
+    BOOKING_OUTBOX_MAX_ATTEMPTS=3,
+    BOOKING_OUTBOX_EAGER=False,
+)
+class DrainTests(TestCase):
+    def setUp(self):
+        outbox._providers.clear()
+        FakeProvider.sent = []
+        FakeProvider.fail = False
+        self.addCleanup(outbox._providers.clear)
+        self.addCleanup(setattr, FakeProvider, "fail", False)
+
+    def later(self, seconds):
+        """Pretend ``seconds`` have passed."""
+        return mock.patch("booking.outbox.timezone.now", return_value=timezone.now() + timedelta(seconds=seconds))
+
+    def message(self, key):
+        return OutboxMessage.objects.get(idempotency_key=key)
+
+    def test_delivers_and_marks_sent(self):
+        outbox.enqueue_many([(SMS, "111", "one", "k1"), (SMS, "222", "two", "k2")])
+
+        self.assertEqual(outbox.drain(), (2, 0))
+        self.assertEqual(sorted(msg.body for msg in FakeProvider.sent), ["one", "two"])
+        self.assertEqual(self.message("k1").status, OutboxMessage.SENT)
+        self.assertEqual(outbox.drain(), (0, 0))
+
+    def test_failure_backs_off_then_retries(self):
+        outbox.enqueue(SMS, "111", "hello", "k1")
+        FakeProvider.fail = True
+
+        before = timezone.now()
+        self.assertEqual(outbox.drain(), (0, 1))
+        msg = self.message("k1")
+        self.assertEqual((msg.status, msg.attempts), (OutboxMessage.PENDING, 1))
+        self.assertEqual(msg.last_error, "fake provider failure")
+        self.assertGreaterEqual(msg.next_attempt_at, before + timedelta(seconds=outbox.BACKOFF_SECONDS))
+
+        # Not due yet: nothing is claimed.
+        self.assertEqual(outbox.drain(), (0, 0))
+
+        with self.later(outbox.BACKOFF_SECONDS + 1):
+            self.assertEqual(outbox.drain(), (0, 1))
+        msg = self.message("k1")
+        self.assertEqual(msg.attempts, 2)
+        self.assertGreaterEqual(msg.next_attempt_at, before + timedelta(seconds=3 * outbox.BACKOFF_SECONDS))
+
+        FakeProvider.fail = False
+        with self.later(4 * outbox.BACKOFF_SECONDS):
+            self.assertEqual(outbox.drain(), (1, 0))
+        msg = self.message("k1")
+        self.assertEqual((msg.status, msg.last_error), (OutboxMessage.SENT, ""))
+        self.assertEqual([m.body for m in FakeProvider.sent], ["hello"])
+
+    def test_gives_up_after_max_attempts(self):
+        outbox.enqueue(SMS, "111", "hello", "k1")
+        FakeProvider.fail = True
+
+        for attempt in range(3):
+            with self.later(3600 * attempt):
+                self.assertEqual(outbox.drain(), (0, 1))
+        self.assertEqual(self.message("k1").status, OutboxMessage.FAILED)
+        with self.later(4 * 3600):
+            self.assertEqual(outbox.drain(), (0, 0))
+
+    def test_provider_exception_fails_the_batch(self):
+        outbox.enqueue(SMS, "111", "hello", "k1")
+
+        with mock.patch.object(FakeProvider, "send_batch", side_effect=RuntimeError("gateway down")):
+            self.assertEqual(outbox.drain(), (0, 1))
+        msg = self.message("k1")
+        self.assertEqual(msg.status, OutboxMessage.PENDING)
+        self.assertIn("gateway down", msg.last_error)
+
+    def test_duplicate_key_is_stored_and_sent_once(self):
+        outbox.enqueue(SMS, "111", "hello", "k1")
+        outbox.enqueue(SMS, "111", "hello", "k1")
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+        self.assertEqual(outbox.drain(), (1, 0))
+        # A retried request after delivery doesn't send it again.
+        outbox.enqueue(SMS, "111", "hello", "k1")
+        self.assertEqual(outbox.drain(), (0, 0))
+        self.assertEqual(len(FakeProvider.sent), 1)
+
+    def test_drain_by_keys_leaves_the_rest(self):
+        outbox.enqueue_many([(SMS, "111", "one", "k1"), (SMS, "222", "two", "k2")])
+
+        self.assertEqual(outbox.drain(keys=["k2"]), (1, 0))
+        self.assertEqual(self.message("k1").status, OutboxMessage.PENDING)
+
+    @override_settings(BOOKING_OUTBOX_EAGER=True)
+    def test_eager_delivers_only_its_own_messages(self):
+        with self.settings(BOOKING_OUTBOX_EAGER=False):
+            outbox.enqueue(SMS, "111", "backlog", "old")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                outbox.enqueue(SMS, "222", "mine", "new")
+        self.assertEqual([m.body for m in FakeProvider.sent], ["mine"])
+        self.assertEqual(self.message("old").status, OutboxMessage.PENDING)
@@ -0,0 +1,71 @@
+"""
+Query budgets for the list views (the same table as
+``manage.py check_query_budget``).
+
+Each view is rendered with a few rows, then with many more: the second
+render must run exactly as many queries as the first (anything else is an
+N+1), and no more than the view's budget.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from booking import routers
+from booking.management.commands.check_query_budget import (
+    BUDGETS, CONDITIONAL, REVALIDATE_BUDGET, budget_pages, seed,
+)
+from booking.models import Doctor, Patient
+
+SMALL = 3
+LARGE = 40
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.patient = Patient.objects.create(user=User.objects.create(username="budget_patient"))
+        self.doctor = Doctor.objects.create(user=User.objects.create(username="budget_doctor"), specialization="General")
+        self.staff = User.objects.create(username="budget_staff", is_staff=True)
+        self.pages = budget_pages(self.patient, self.doctor, self.staff)
+
+    def login(self, user):
+        self.client.force_login(user)
+        # Keep reads on the primary if a replica is configured (booking/routers.py).
+        self.client.cookies[routers.PIN_COOKIE] = "1"
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = "budget" * 6
+
+    def test_list_views_stay_within_budget(self):
+        seed(self.doctor, self.patient, 0, SMALL)
+        few = {}
+        for name, user, url in self.pages:
+            self.login(user)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            few[name] = len(queries)
+
+        seed(self.doctor, self.patient, SMALL, LARGE)
+        for name, user, url in self.pages:
+            with self.subTest(view=name):
+                self.assertLessEqual(few[name], BUDGETS[name])
+                self.login(user)
+                with self.assertNumQueries(few[name]):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_pages_revalidate_cheaply(self):
+        seed(self.doctor, self.patient, 0, SMALL)
+        for name, user, url in self.pages:
+            if name not in CONDITIONAL:
+                continue
+            with self.subTest(view=name):
+                self.login(user)
+                etag = self.client.get(url)["ETag"]
+                self.login(user)
+                with self.assertNumQueries(REVALIDATE_BUDGET):
+                    response = self.client.get(url, headers={"If-None-Match": etag})
+                self.assertEqual(response.status_code, 304)
@@ -0,0 +1,170 @@
+# booking/timeline.py
+"""
+Patient timeline: appointments, medical history and notifications in one
+list, newest first.
+
+Each kind is a stream - one query ordered by (when, id) descending on the
+patient's index, starting just past the cursor and limited to a page
+(``appt_patient_date_idx``, ``history_patient_timeline_idx``,
+``notif_patient_timeline_idx``). ``heapq.merge`` interleaves the streams;
+whatever it doesn't use is simply read again by the next page. A page
+therefore costs one query per kind however long the patient's history is.
+
+The cursor is the (when, kind, id) of the last event shown. Ties on
+``when`` fall back to KINDS order and then id, so each stream can resume
+exactly where the page stopped.
+
+History rows carry only a preview of ``notes`` and ``prescription`` (cut
+to PREVIEW_CHARS by the database); ``history_text`` loads the full text
+when a row is expanded.
+"""
+import heapq
+from datetime import datetime
+from itertools import islice
+
+from django.db.models import Q
+from django.db.models.functions import Length, Substr
+from django.utils import timezone
+
+from .models import Appointment, MedicalHistory, Notification
+from .pagination import KeysetPage, pack, page_size, unpack
+
+KINDS = ("appointment", "history", "notification")
+RANK = {kind: rank for rank, kind in enumerate(KINDS)}
+PREVIEW_CHARS = 160
+
+
+def _key(event):
+    return event["at"], RANK[event["kind"]], event["id"]
+
+
+def _before(fields, values, cursor, kind):
+    """Rows of ``kind`` that sort after ``cursor`` in the merged (descending) order."""
+    at, rank, pk = cursor
+    pairs = list(zip(fields, values))
+    if RANK[kind] == rank:
+        pairs.append(("id", pk))
+    or_equal = RANK[kind] < rank        # same moment, earlier kind: still to come
+    condition, equal = Q(), {}
+    for i, (field, value) in enumerate(pairs):
+        op = "lte" if or_equal and i == len(pairs) - 1 else "lt"
+        condition |= Q(**equal, **{f"{field}__{op}": value})
+        equal[field] = value
+    return condition
+
+
+# ----------------------------
+# Streams
+# ----------------------------
+def _appointments(patient_id, cursor, limit):
+    rows = Appointment.objects.filter(patient_id=patient_id)
+    if cursor:
+        local = timezone.localtime(cursor[0])
+        rows = rows.filter(_before(("date", "time"), (local.date(), local.time()), cursor, "appointment"))
+    rows = rows.order_by("-date", "-time", "-id").values_list("id", "date", "time", "status", "doctor__user__username")
+    for pk, day, start, status, doctor in rows[:limit]:
+        yield {
+            "kind": "appointment",
+            "id": pk,
+            "at": timezone.make_aware(datetime.combine(day, start)),
+            "doctor": doctor,
+            "status": Appointment.Status(status).label,
+        }
+
+
+def _history(patient_id, cursor, limit):
+    rows = MedicalHistory.objects.filter(patient_id=patient_id)
+    if cursor:
+        rows = rows.filter(_before(("created_at",), (cursor[0],), cursor, "history"))
+    rows = rows.order_by("-created_at", "-id").values_list(
+        "id",
+        "created_at",
+        "doctor__user__username",
+        Substr("notes", 1, PREVIEW_CHARS),
+        Substr("prescription", 1, PREVIEW_CHARS),
+        Length("notes"),
+        Length("prescription"),
+    )
+    for pk, created_at, doctor, notes, prescription, notes_length, prescription_length in rows[:limit]:
+        yield {
+            "kind": "history",
+            "id": pk,
+            "at": created_at,
+            "doctor": doctor,
+            "notes": notes or "",
+            "prescription": prescription or "",
+            "truncated": max(notes_length or 0, prescription_length or 0) > PREVIEW_CHARS,
+        }
+
+
+def _notifications(patient_id, cursor, limit):
+    rows = Notification.objects.filter(patient_id=patient_id)
+    if cursor:
+        rows = rows.filter(_before(("created_at",), (cursor[0],), cursor, "notification"))
+    rows = rows.order_by("-created_at", "-id").values_list("id", "created_at", "message", "is_read")
+    for pk, created_at, message, is_read in rows[:limit]:
+        yield {"kind": "notification", "id": pk, "at": created_at, "message": message, "is_read": is_read}
+
+
+STREAMS = {"appointment": _appointments, "history": _history, "notification": _notifications}
+
+
+# ----------------------------
+# Public API
+# ----------------------------
+def encode_cursor(event):
+    return pack(event["at"].isoformat(), RANK[event["kind"]], event["id"])
+
+
+def decode_cursor(token):
+    """Return (when, kind rank, id) or None if the cursor is missing/garbled."""
+    try:
+        at, rank, pk = unpack(token)
+        at, rank, pk = datetime.fromisoformat(at), int(rank), int(pk)
+    except (TypeError, ValueError):
+        return None
+    if timezone.is_naive(at) or not 0 <= rank < len(KINDS):
+        return None
+    return at, rank, pk
+
+
+def kinds_from(request):
+    """``?kinds=appointment,history`` narrows the timeline; default is every kind."""
+    asked = [kind for kind in request.GET.get("kinds", "").split(",") if kind in STREAMS]
+    return tuple(asked) or KINDS
+
+
+def events(patient_id, cursor=None, limit=25, kinds=KINDS):
+    """Up to ``limit`` events for a patient, newest first, after ``cursor``."""
+    streams = [STREAMS[kind](patient_id, cursor, limit) for kind in kinds]
+    return list(islice(heapq.merge(*streams, key=_key, reverse=True), limit))
+
+
+def page(request, patient_id, param="after", kinds=None):
+    """A KeysetPage of the patient's timeline for this request.
+
+    ``kinds`` fixes which streams are read; by default ``?kinds=`` decides.
+    """
+    size = page_size(request)
+    cursor = decode_cursor(request.GET.get(param))
+    rows = events(patient_id, cursor, size + 1, kinds or kinds_from(request))
+
+    params = request.GET.copy()
+    params.pop(param, None)
+    first_query = params.urlencode()
+
+    next_query = next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        params[param] = next_cursor = encode_cursor(rows[-1])
+        next_query = params.urlencode()
+    return KeysetPage(rows, next_query, first_query, is_first=cursor is None, next_cursor=next_cursor)
+
+
+def history_text(patient_id, pk):
+    """Full ``notes`` and ``prescription`` of one history row, or None."""
+    return (
+        MedicalHistory.objects.filter(patient_id=patient_id, pk=pk)
+        .values("id", "notes", "prescription")
+        .first()
+    )
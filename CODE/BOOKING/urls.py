@@ -15,12 +15,17 @@ urlpatterns = [
     path("book/", views.book_appointment, name="book_appointment"),
     path("cancel/<int:appointment_id>/", views.cancel_appointment, name="cancel_appointment"),
     path("patient-history/", views.patient_history, name="patient_history"),
+    path("timeline/", views.patient_timeline, name="my_timeline"),
+    path("timeline/history/<int:pk>/", views.timeline_history, name="my_timeline_history"),
+    path("waitlist/", views.my_waitlist, name="my_waitlist"),
+    path("waitlist/<int:pk>/", views.waitlist_action, name="waitlist_action"),
     path("patient-register/", views.patient_register, name="patient_register"),
     
     # Doctor side
     path("doctor/login/", DoctorLoginView.as_view(), name="doctor_login"),
     path("doctor-dashboard/", views.doctor_dashboard, name="doctor_dashboard"),
     path("appointment-action/<int:pk>/", views.appointment_action, name="appointment_action"),
+    path("appointment-action/bulk/", views.appointment_bulk_action, name="appointment_bulk_action"),
     path("doctor-report/", views.doctor_report, name="doctor_report"),
     path("doctor/apply-leave/", views.doctor_apply_leave, name="doctor_apply_leave"),
     path("doctor/schedule/", views.doctor_schedule_list, name="doctor_schedule"),
@@ -28,11 +33,17 @@ urlpatterns = [
 
     # Notifications
     path("notifications/", views.my_notifications, name="my_notifications"),
+    path("notifications/stream/", views.notification_stream, name="notification_stream"),
+    path("notifications/poll/", views.notification_poll, name="notification_poll"),
+    path("notifications/read/", views.notifications_mark_read, name="notifications_mark_read"),
     path("search-doctors/", views.search_doctors, name="search_doctors"),
+    path("search-doctors/suggest/", views.search_suggest, name="search_suggest"),
     path("appointment/<int:appointment_id>/reschedule/", views.reschedule_appointment, name="reschedule_appointment"),
     path("medical-history/", views.patient_medical_history, name="patient_medical_history"),
     path("patients/<int:patient_id>/history/", views.view_medical_history, name="view_medical_history"),
     path("patients/<int:patient_id>/history/add/", views.add_medical_history, name="add_medical_history"),
-    path("daily-appointments/", views.daily_appointments, name="daily_appointments"),
+    path("patients/<int:patient_id>/timeline/", views.patient_timeline, name="patient_timeline"),
+    path("patients/<int:patient_id>/timeline/history/<int:pk>/", views.timeline_history, name="patient_timeline_history"),
+    path("metrics", views.metrics_endpoint, name="metrics"),
 
 ]
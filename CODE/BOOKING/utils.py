@@ -1,4 +1,44 @@
 # booking/utils.py
-def send_sms(to_number, message):
-    # Dummy SMS function for testing
-    print(f"[SMS to {to_number}] {message}")
+from django.utils.dateparse import parse_date
+from django.utils.module_loading import import_string
+
+from .outbox import SMS, enqueue
+
+
+def send_sms(to_number, message, key=None):
+    # Queued in the outbox and delivered by `manage.py dispatch_outbox`
+    return enqueue(SMS, to_number, message, key)
+
+
+def date_params(request, *names):
+    """The GET dates in ``names``, None where missing or malformed.
+
+    Raises ValueError for a well formed but impossible date (2025-02-30),
+    which parse_date refuses to return None for.
+    """
+    dates = []
+    for name in names:
+        try:
+            dates.append(parse_date(request.GET.get(name, "")))
+        except ValueError:
+            raise ValueError(f"{name}: {request.GET[name]} is not a real date") from None
+    return dates
+
+
+def lazy_view(dotted_path):
+    """A view that imports ``dotted_path`` on its first request.
+
+    For rarely used pages whose modules pull in a lot (see staff_views),
+    so a worker only pays for the import if it ever serves one.
+    """
+    module_path, name = dotted_path.rsplit(".", 1)
+    view = None
+
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path)
+        return view(request, *args, **kwargs)
+
+    wrapper.__module__, wrapper.__name__, wrapper.__qualname__ = module_path, name, name
+    return wrapper
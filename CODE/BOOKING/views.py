@@ -1,20 +1,40 @@
+import asyncio
+import hmac
+import json
+import math
+import time as clock
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponseForbidden
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.dateparse import parse_date, parse_time
 from django.contrib.auth import login
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView, LogoutView
+from django.utils.functional import SimpleLazyObject
 from django.utils.timezone import now
-from django.db.models import Count, Q
+from django.db.models import Q
 from .forms import PatientSignUpForm, DoctorLeaveForm, MedicalHistoryForm, RescheduleForm
-from .models import Doctor, Patient, Appointment, DoctorLeave, Notification, MedicalHistory
-from .utils import send_sms
-from django.contrib.admin.views.decorators import staff_member_required
+from .models import Doctor, Patient, Appointment, MedicalHistory, WaitlistEntry
+from .availability import has_started, slot_minutes, upcoming_slots
+from .services import (
+    InvalidTransition, SlotTaken, accept_offer, apply_leave, book_slot, bulk_set_status, cancel, reschedule_slot,
+    set_status,
+)
+from .pagination import paginate
+from .utils import date_params
+from . import directory, metrics, notifications, realtime, schedules, search, stamps, stats, timeline, waitlist
 from .forms import DoctorSignUpForm
 from django.contrib.auth.forms import UserCreationForm
 from .forms import PatientRegisterForm
-from .forms import DoctorScheduleForm
-from .models import DoctorSchedule
+from .forms import DoctorScheduleForm, ScheduleRuleForm
+from .models import DoctorSchedule, ScheduleRule
 
 # ====================
 # AUTH VIEWS
@@ -44,7 +64,7 @@ def welcome(request):
 
 
 def home(request):
-    doctors = Doctor.objects.all()
+    doctors = directory.doctors()
     return render(request, "home.html", {"doctors": doctors})
 
 
@@ -69,7 +89,12 @@ def patient_register(request):
 # PATIENT VIEWS
 # ====================
 
+# Appointments in these statuses are listed under "Past & Cancelled".
+DONE = [Appointment.Status.CANCELLED, Appointment.Status.COMPLETED]
+
+
 @login_required
+@stamps.conditional("patient", with_directory=True)
 def my_appointments(request):
     """Show patient upcoming and past appointments."""
     if not hasattr(request.user, "patient"):
@@ -78,19 +103,25 @@ def my_appointments(request):
     patient = request.user.patient
     today = now().date()
 
-    upcoming = (
-        Appointment.objects.filter(patient=patient, date__gte=today)
-        .exclude(status__in=["Cancelled", "Completed"])
-        .order_by("date", "time")
-    )
-
-    past = (
-        Appointment.objects.filter(patient=patient)
-        .filter(Q(date__lt=today) | Q(status__in=["Cancelled", "Completed"]))
-        .order_by("-date", "-time")
-    )
-
-    return render(request, "my_appointments.html", {"upcoming": upcoming, "past": past})
+    # Lazy: a cached fragment (stamps.py) never runs these queries.
+    appointments = Appointment.objects.filter(patient=patient).select_related("doctor__user")
+    upcoming = SimpleLazyObject(lambda: paginate(
+        request,
+        appointments.filter(date__gte=today).exclude(status__in=DONE),
+        param="upcoming_after",
+    ))
+    past = SimpleLazyObject(lambda: paginate(
+        request,
+        appointments.filter(Q(date__lt=today) | Q(status__in=DONE)),
+        param="past_after",
+        descending=True,
+    ))
+
+    return render(request, "my_appointments.html", {
+        "upcoming": upcoming,
+        "past": past,
+        **stamps.context(request, "patient", with_directory=True),
+    })
 
 
 @login_required
@@ -102,8 +133,9 @@ def patient_history(request):
     patient = request.user.patient
     today = now().date()
 
-    upcoming = Appointment.objects.filter(patient=patient, date__gte=today).order_by("date", "time")
-    past = Appointment.objects.filter(patient=patient, date__lt=today).order_by("-date", "-time")
+    appointments = Appointment.objects.filter(patient=patient).select_related("doctor__user")
+    upcoming = paginate(request, appointments.filter(date__gte=today), param="upcoming_after")
+    past = paginate(request, appointments.filter(date__lt=today), param="past_after", descending=True)
 
     return render(request, "patient_history.html", {"upcoming": upcoming, "past": past})
 
@@ -115,58 +147,252 @@ def patient_medical_history(request):
         return HttpResponseForbidden("Only patients can view their medical history.")
 
     patient = request.user.patient
-    history = MedicalHistory.objects.filter(patient=patient).order_by("-created_at")
+    history = (
+        MedicalHistory.objects.filter(patient=patient)
+        .select_related("doctor__user")
+        .order_by("-created_at")
+    )
 
     return render(request, "medical_history.html", {"history": history})
 
 
 @login_required
+@stamps.conditional("patient")
 def my_notifications(request):
     if not hasattr(request.user, "patient"):
         return HttpResponseForbidden("Only patients can view notifications.")
 
     patient = request.user.patient
-    notifications = Notification.objects.filter(patient=patient).order_by("-created_at")
-    return render(request, "notifications.html", {"notifications": notifications})
+    recent = SimpleLazyObject(lambda: list(notifications.recent(patient.id)))
+    return render(request, "notifications.html", {
+        "notifications": recent,
+        "unread": SimpleLazyObject(lambda: notifications.unread_count(patient.id, shown=recent)),
+        "last_id": SimpleLazyObject(lambda: max((note.id for note in recent), default=0)),
+        **stamps.context(request, "patient"),
+    })
+
+
+@login_required
+def notifications_mark_read(request):
+    """POST ``ids`` (repeatable) to mark those read, or nothing to mark all read."""
+    if not hasattr(request.user, "patient"):
+        return HttpResponseForbidden("Only patients can update notifications.")
+    if request.method != "POST":
+        return redirect("my_notifications")
+
+    ids = [int(i) for i in request.POST.getlist("ids") if i.isdigit()] or None
+    patient_id = request.user.patient.id
+    changed = notifications.mark_read(patient_id, ids)
+    if request.accepts("application/json") and not request.accepts("text/html"):
+        return JsonResponse({"updated": changed, "unread": notifications.unread_count(patient_id)})
+    return redirect("my_notifications")
+
+
+# ----------------------------
+# Live notifications (SSE / long-poll)
+# ----------------------------
+HEARTBEAT_SECONDS = 15
+STREAM_SECONDS = 600      # clients reconnect (with Last-Event-ID) after this
+POLL_SECONDS = 25
+MAX_POLL_SECONDS = 55     # under the usual 60 s proxy read timeout
+
+
+async def _stream_patient(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return None
+    return await Patient.objects.filter(user_id=user.pk).values_list("id", flat=True).afirst()
+
+
+def _last_id(value):
+    return int(value) if value and value.isdigit() else 0
+
+
+def _poll_timeout(value):
+    """``?timeout=`` clamped to [0, MAX_POLL_SECONDS]; POLL_SECONDS if missing or not a number."""
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return POLL_SECONDS
+    if not math.isfinite(seconds):
+        return POLL_SECONDS
+    return min(max(seconds, 0.0), MAX_POLL_SECONDS)
+
+
+def _sse(event):
+    head = f"id: {event['id']}\n" if event["type"] == "notification" else ""
+    return f"{head}event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def _async_events(subscription, backlog, unread):
+    broker = realtime.get_broker()
+    try:
+        yield "retry: 3000\n\n"
+        yield _sse({"type": "unread", "count": unread})
+        for event in backlog:
+            yield _sse(event)
+        deadline = clock.monotonic() + STREAM_SECONDS
+        while clock.monotonic() < deadline:
+            events = await subscription.aget(HEARTBEAT_SECONDS)
+            if not events:
+                yield ": keep-alive\n\n"
+            for event in events:
+                if event["type"] == "read":
+                    count = await sync_to_async(notifications.unread_count)(subscription.patient_id)
+                    event = {"type": "unread", "count": count}
+                yield _sse(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def _sync_events(subscription, backlog, unread):
+    broker = realtime.get_broker()
+    try:
+        yield "retry: 3000\n\n"
+        yield _sse({"type": "unread", "count": unread})
+        for event in backlog:
+            yield _sse(event)
+        deadline = clock.monotonic() + STREAM_SECONDS
+        while clock.monotonic() < deadline:
+            events = subscription.get(HEARTBEAT_SECONDS)
+            if not events:
+                yield ": keep-alive\n\n"
+            for event in events:
+                if event["type"] == "read":
+                    event = {"type": "unread", "count": notifications.unread_count(subscription.patient_id)}
+                yield _sse(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def notification_stream(request):
+    """Server-sent events: new notifications and unread-count changes."""
+    patient_id = await _stream_patient(request)
+    if patient_id is None:
+        return HttpResponseForbidden("Only patients can receive notifications.")
+
+    last_id = _last_id(request.headers.get("Last-Event-ID") or request.GET.get("after"))
+    asgi = isinstance(request, ASGIRequest)
+    broker = realtime.get_broker()
+    # Subscribe before catching up so nothing falls between the two.
+    subscription = broker.subscribe(patient_id, last_id, loop=asyncio.get_running_loop() if asgi else None)
+    try:
+        backlog = await sync_to_async(notifications.since)(patient_id, last_id) if last_id else []
+        unread = await sync_to_async(notifications.unread_count)(patient_id)
+    except Exception:
+        broker.unsubscribe(subscription)
+        raise
+    if backlog:
+        subscription.last_id = backlog[-1]["id"]
+
+    # Under WSGI stream from a plain generator so the server thread can block on it.
+    body = (_async_events if asgi else _sync_events)(subscription, backlog, unread)
+
+    response = StreamingHttpResponse(body, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"   # nginx: don't buffer the stream
+    return response
+
+
+async def notification_poll(request):
+    """Long-poll fallback: ``?after=<id>`` waits up to ``timeout`` seconds for news."""
+    patient_id = await _stream_patient(request)
+    if patient_id is None:
+        return HttpResponseForbidden("Only patients can receive notifications.")
+
+    after = _last_id(request.GET.get("after"))
+    timeout = _poll_timeout(request.GET.get("timeout"))
+    broker = realtime.get_broker()
+    subscription = broker.subscribe(patient_id, after, loop=asyncio.get_running_loop())
+    try:
+        events = await sync_to_async(notifications.since)(patient_id, after)
+        if not events and timeout > 0:
+            events = [e for e in await subscription.aget(timeout) if e["type"] == "notification"]
+    finally:
+        broker.unsubscribe(subscription)
+
+    return JsonResponse({
+        "notifications": events,
+        "unread": await sync_to_async(notifications.unread_count)(patient_id),
+        "last_id": events[-1]["id"] if events else after,
+    })
 
 
 @login_required
 def search_doctors(request):
     specialization = request.GET.get("specialization")
+    query = request.GET.get("q", "").strip()
 
     if specialization and specialization != "All":
-        doctors = Doctor.objects.filter(specialization=specialization)
+        doctors = directory.doctors(specialization)
     else:
-        doctors = Doctor.objects.all()
+        doctors = directory.doctors()
 
-    specializations = Doctor.objects.values_list("specialization", flat=True).distinct()
+    if query:
+        # Ranked search results, narrowed to the chosen specialization.
+        by_id = {doctor.id: doctor for doctor in doctors}
+        doctors = [by_id[i] for i in search.search(query) if i in by_id]
+
+    specializations = directory.specializations()
 
     return render(request, "search_doctors.html", {
         "doctors": doctors,
         "specializations": specializations,
         "selected": specialization,
+        "query": query,
     })
 
 
+@login_required
+def search_suggest(request):
+    """Autocomplete for the doctor search box (JSON)."""
+    query = request.GET.get("q", "").strip()
+    return JsonResponse({"results": search.suggest(query) if query else []})
+
+
+def _posted_date(request):
+    """The POSTed ``date``, or None if it's missing or not a real date."""
+    try:
+        return parse_date(request.POST.get("date") or "")
+    except ValueError:  # well formed but impossible, e.g. 2025-02-30
+        return None
+
+
 @login_required
 def book_appointment(request):
     if not hasattr(request.user, "patient"):
         return HttpResponseForbidden("Only patients can book appointments.")
 
     if request.method == "POST":
-        doctor_id = request.POST.get("doctor")
-        date = request.POST.get("date")
-        time = request.POST.get("time")
-
-        doctor = Doctor.objects.get(id=doctor_id)
+        doctor = get_object_or_404(Doctor, id=request.POST.get("doctor"))
+        date = _posted_date(request)
+        time = parse_time(request.POST.get("time") or "")
         patient = request.user.patient
 
-        Appointment.objects.create(doctor=doctor, patient=patient, date=date, time=time)
-        messages.success(request, "Appointment requested successfully.")
-        return redirect("my_appointments")
-
-    doctors = Doctor.objects.all()
-    return render(request, "book_appointment.html", {"doctors": doctors})
+        if not date or not time or has_started(date, time):
+            messages.error(request, "Please choose a valid date and time.")
+        else:
+            try:
+                book_slot(doctor, patient, date, time)
+            except SlotTaken:
+                messages.error(request, "Sorry, that slot was just taken. Please pick another free slot.")
+            else:
+                messages.success(request, "Appointment requested successfully.")
+                return redirect("my_appointments")
+        return redirect(f"{reverse('book_appointment')}?doctor_id={doctor.id}")
+
+    doctors = directory.doctors()
+    selected = request.GET.get("doctor_id")
+    slots = {}
+    if selected and selected.isdigit():
+        selected = int(selected)
+        slots = upcoming_slots([selected], now().date()).get(selected, {})
+
+    return render(request, "book_appointment.html", {
+        "doctors": doctors,
+        "selected": selected,
+        "slots": slots,
+    })
 
 
 @login_required
@@ -174,21 +400,72 @@ def cancel_appointment(request, appointment_id):
     appointment = get_object_or_404(Appointment, id=appointment_id)
 
     if request.method == "POST":
-        appointment.status = "Cancelled"
-        appointment.save()
-
-        patient_number = appointment.patient.phone
-        msg = (
-            f"Dear {appointment.patient.user.username}, your appointment with "
-            f"Dr.{appointment.doctor.user.username} on {appointment.date} at {appointment.time} "
-            f"has been cancelled."
-        )
-        send_sms(patient_number, msg)
+        try:
+            cancel(appointment, by=request.user)
+        except InvalidTransition as exc:
+            messages.error(request, str(exc))
+            return redirect("my_appointments")
 
         messages.success(request, "Appointment cancelled successfully.")
         return redirect("my_appointments")
 
 
+@login_required
+def my_waitlist(request):
+    """The patient's waitlist places and held slots; POST joins a queue."""
+    if not hasattr(request.user, "patient"):
+        return HttpResponseForbidden("Only patients can join the waitlist.")
+
+    patient = request.user.patient
+    if request.method == "POST":
+        doctor = get_object_or_404(Doctor, id=request.POST.get("doctor"))
+        day = _posted_date(request)
+        if not day or day < now().date():
+            messages.error(request, "Please choose a date in the future.")
+        else:
+            _, created = waitlist.join(patient, doctor, day)
+            if created:
+                messages.success(request, f"You're on Dr.{doctor.user.username}'s waitlist for {day}.")
+            else:
+                messages.info(request, f"You're already on Dr.{doctor.user.username}'s waitlist for {day}.")
+        return redirect("my_waitlist")
+
+    entries = (
+        WaitlistEntry.objects.filter(patient=patient, status__in=WaitlistEntry.ACTIVE, date__gte=now().date())
+        .select_related("doctor__user")
+        .order_by("-status", "date", "id")    # offers first
+    )
+    return render(request, "waitlist.html", {"entries": entries, "doctors": directory.doctors()})
+
+
+@login_required
+def waitlist_action(request, pk):
+    """Accept or decline a held slot, or leave the waitlist."""
+    entry = get_object_or_404(WaitlistEntry.objects.select_related("doctor__user", "patient"), pk=pk)
+    if not hasattr(request.user, "patient") or entry.patient_id != request.user.patient.id:
+        return HttpResponseForbidden("This is not your waitlist place.")
+
+    if request.method == "POST":
+        action = request.POST.get("action")
+        if action == "accept":
+            try:
+                accept_offer(entry)
+            except SlotTaken:
+                messages.error(request, "Sorry, that offer has run out.")
+            else:
+                messages.success(request, f"Booked: Dr.{entry.doctor.user.username} on {entry.date} at {entry.offered_time:%H:%M}.")
+                return redirect("my_appointments")
+        elif action == "decline":
+            if waitlist.withdraw(entry):
+                messages.success(request, "You've been taken off that waitlist.")
+            else:
+                messages.error(request, "That waitlist place has already ended.")
+        else:
+            messages.error(request, "Unknown action.")
+
+    return redirect("my_waitlist")
+
+
 @login_required
 def reschedule_appointment(request, appointment_id):
     appointment = get_object_or_404(Appointment, id=appointment_id, patient=request.user.patient)
@@ -199,17 +476,29 @@ def reschedule_appointment(request, appointment_id):
             new_date = form.cleaned_data['date']
             new_time = form.cleaned_data['time']
 
-            appointment.date = new_date
-            appointment.time = new_time
-            appointment.status = "Booked"
-            appointment.save()
+            if has_started(new_date, new_time):
+                messages.error(request, "Please choose a date and time in the future.")
+                return redirect("reschedule_appointment", appointment_id=appointment.id)
+            try:
+                reschedule_slot(appointment, new_date, new_time, by=request.user)
+            except InvalidTransition as exc:
+                messages.error(request, str(exc))
+                return redirect("my_appointments")
+            except SlotTaken:
+                messages.error(request, "Sorry, that slot is not available. Please pick another free slot.")
+                return redirect("reschedule_appointment", appointment_id=appointment.id)
 
             messages.success(request, "Your appointment has been rescheduled successfully!")
             return redirect("my_appointments")
     else:
         form = RescheduleForm()
 
-    return render(request, "reschedule_appointment.html", {"form": form, "appointment": appointment})
+    slots = upcoming_slots([appointment.doctor_id], now().date()).get(appointment.doctor_id, {})
+    return render(request, "reschedule_appointment.html", {
+        "form": form,
+        "appointment": appointment,
+        "slots": slots,
+    })
 
 
 # ====================
@@ -217,28 +506,56 @@ def reschedule_appointment(request, appointment_id):
 # ====================
 
 @login_required
+@stamps.conditional("doctor")
 def doctor_dashboard(request):
     if not hasattr(request.user, "doctor"):
         return HttpResponseForbidden("Only doctors can access this page.")
 
     doctor = request.user.doctor
-    appointments = doctor.appointment_set.all()
-    return render(request, "doctor_dashboard.html", {"appointments": appointments})
+    today = now().date()
+    window = request.GET.get("window", "upcoming")
+
+    # Default to today + upcoming so the page stays small however long the
+    # doctor's history is; older rows are one click (and one cursor) away.
+    # Lazy, so a cached fragment (stamps.py) doesn't run the query.
+    appointments = Appointment.objects.filter(doctor=doctor).select_related("patient__user")
+    if window == "past":
+        page = SimpleLazyObject(lambda: paginate(request, appointments.filter(date__lt=today), descending=True))
+    elif window == "all":
+        page = SimpleLazyObject(lambda: paginate(request, appointments))
+    else:
+        window = "upcoming"
+        page = SimpleLazyObject(lambda: paginate(request, appointments.filter(date__gte=today)))
+
+    return render(request, "doctor_dashboard.html", {
+        "appointments": page,
+        "window": window,
+        **stamps.context(request, "doctor"),
+    })
 
 
 @login_required
+@stamps.conditional("doctor")
 def doctor_report(request):
     if not hasattr(request.user, "doctor"):
         return redirect("home")
 
     doctor = request.user.doctor
-    stats = doctor.appointment_set.values("status").annotate(total=Count("status"))
-
-    summary = {"Booked": 0, "Confirmed": 0, "Completed": 0, "Cancelled": 0}
-    for item in stats:
-        summary[item["status"]] = item["total"]
-
-    return render(request, "doctor_report.html", {"summary": summary})
+    try:
+        start, end = date_params(request, "start", "end")
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    period = "month" if request.GET.get("period") == "month" else "week"
+
+    return render(request, "doctor_report.html", {
+        "summary": SimpleLazyObject(lambda: stats.summary([doctor.id], start, end)),
+        "breakdown": SimpleLazyObject(lambda: stats.breakdown([doctor.id], start, end, period)),
+        "statuses": stats.STATUSES,
+        "start": start,
+        "end": end,
+        "period": period,
+        **stamps.context(request, "doctor"),
+    })
 
 
 @login_required
@@ -253,25 +570,30 @@ def doctor_apply_leave(request):
         if form.is_valid():
             leave = form.save(commit=False)
             leave.doctor = doctor
-            leave.save()
-
-            appointments = Appointment.objects.filter(doctor=doctor, date=leave.date, status="Booked")
-            for appt in appointments:
-                appt.status = "Cancelled"
-                appt.save()
-                Notification.objects.create(
-                    patient=appt.patient,
-                    message=f"Your appointment with Dr.{doctor.user.username} on {appt.date} has been cancelled due to leave."
+            try:
+                cancelled = apply_leave(leave)
+            except InvalidTransition as exc:
+                messages.error(request, str(exc))
+            else:
+                messages.success(
+                    request,
+                    f"Leave applied successfully! {cancelled} appointment(s) cancelled and patients notified.",
                 )
-
-            messages.success(request, "Leave applied successfully! Patients have been notified.")
-            return redirect("doctor_dashboard")
+                return redirect("doctor_dashboard")
     else:
         form = DoctorLeaveForm()
 
     return render(request, "apply_leave.html", {"form": form})
 
 
+# Doctor actions: POST action -> (new status, past tense for the message).
+ACTIONS = {
+    "confirm": (Appointment.Status.CONFIRMED, "confirmed"),
+    "reject": (Appointment.Status.CANCELLED, "rejected"),
+    "complete": (Appointment.Status.COMPLETED, "marked as completed"),
+}
+
+
 @login_required
 def appointment_action(request, pk):
     appt = get_object_or_404(Appointment, pk=pk)
@@ -281,22 +603,50 @@ def appointment_action(request, pk):
 
     if request.method == "POST":
         action = request.POST.get("action")
-        if action == "confirm":
-            appt.status = "Confirmed"
-            messages.success(request, "Appointment confirmed.")
-        elif action == "reject":
-            appt.status = "Cancelled"
-            messages.success(request, "Appointment rejected.")
-        elif action == "complete":
-            appt.status = "Completed"
-            messages.success(request, "Appointment marked as completed.")
-        else:
+        if action not in ACTIONS:
             messages.error(request, "Unknown action.")
-        appt.save()
+        else:
+            status, done = ACTIONS[action]
+            try:
+                set_status(appt, status, by=request.user)
+            except InvalidTransition as exc:
+                messages.error(request, str(exc))
+            else:
+                messages.success(request, f"Appointment {done}.")
 
     return redirect("doctor_dashboard")
 
 
+@login_required
+def appointment_bulk_action(request):
+    """Confirm/complete/reject every appointment in ``ids`` in one go."""
+    if not hasattr(request.user, "doctor"):
+        return HttpResponseForbidden("Only doctors can perform this action.")
+    if request.method != "POST":
+        return redirect("doctor_dashboard")
+
+    action = request.POST.get("action")
+    ids = [int(i) for i in request.POST.getlist("ids") if i.isdigit()]
+    if action not in ACTIONS or not ids:
+        changed, skipped = 0, len(ids)
+        messages.error(request, "Pick some appointments and an action.")
+    else:
+        status, done = ACTIONS[action]
+        try:
+            changed, skipped = bulk_set_status(request.user.doctor, ids, status, by=request.user)
+        except InvalidTransition as exc:
+            changed, skipped = 0, len(ids)
+            messages.error(request, str(exc))
+        else:
+            note = f" ({skipped} skipped - not yours or already past that step)" if skipped else ""
+            messages.success(request, f"{changed} appointment(s) {done}{note}.")
+
+    if request.accepts("application/json") and not request.accepts("text/html"):
+        return JsonResponse({"changed": changed, "skipped": skipped})
+    window = request.POST.get("window", "")
+    return redirect(reverse("doctor_dashboard") + (f"?window={window}" if window in ("upcoming", "past", "all") else ""))
+
+
 @login_required
 def add_medical_history(request, patient_id):
     if not hasattr(request.user, "doctor"):
@@ -327,21 +677,68 @@ def view_medical_history(request, patient_id=None):
             return HttpResponseForbidden("Doctor must specify patient.")
         patient = get_object_or_404(Patient, id=patient_id)
 
-    history = MedicalHistory.objects.filter(patient=patient).order_by("-created_at")
+    history = (
+        MedicalHistory.objects.filter(patient=patient)
+        .select_related("doctor__user")
+        .order_by("-created_at")
+    )
     return render(request, "medical_history.html", {"patient": patient, "history": history})
 
-@staff_member_required
-def daily_appointments(request):
-    selected_date = request.GET.get("date")
 
-    appointments = []
-    if selected_date:
-        appointments = Appointment.objects.filter(date=selected_date).order_by("time")
+def _timeline_patient(request, patient_id):
+    """The patient whose timeline ``request`` may see, or None."""
+    if hasattr(request.user, "patient"):
+        return request.user.patient
+    if patient_id and (request.user.is_staff or hasattr(request.user, "doctor")):
+        return get_object_or_404(Patient.objects.select_related("user"), id=patient_id)
+    return None
+
 
-    return render(request, "daily_appointments.html", {
-        "appointments": appointments,
-        "selected_date": selected_date
+@login_required
+def patient_timeline(request, patient_id=None):
+    """Appointments, medical history and notifications in one list (HTML or JSON)."""
+    patient = _timeline_patient(request, patient_id)
+    if patient is None:
+        return HttpResponseForbidden("Only the patient or a doctor can view this timeline.")
+
+    page = timeline.page(request, patient.id)
+    if request.accepts("application/json") and not request.accepts("text/html"):
+        return JsonResponse({"events": page.rows, "next": page.next_cursor})
+    return render(request, "timeline.html", {
+        "patient": patient,
+        "events": page,
+        "kinds": timeline.kinds_from(request),
+        "own": patient_id is None,
     })
+
+
+@login_required
+def timeline_history(request, pk, patient_id=None):
+    """Full notes and prescription of one history row, loaded when it is expanded."""
+    patient = _timeline_patient(request, patient_id)
+    if patient is None:
+        return HttpResponseForbidden("Only the patient or a doctor can view this record.")
+    record = timeline.history_text(patient.id, pk)
+    if record is None:
+        return JsonResponse({"error": "Not found."}, status=404)
+    return JsonResponse(record)
+
+def metrics_endpoint(request):
+    """Prometheus scrape target (text format).
+
+    Open to staff sessions, or to ``Authorization: Bearer <token>`` when
+    BOOKING_METRICS_TOKEN is set.
+    """
+    token = getattr(settings, "BOOKING_METRICS_TOKEN", "")
+    header = request.headers.get("Authorization", "")
+    allowed = request.user.is_staff or (
+        token and hmac.compare_digest(header.encode(), f"Bearer {token}".encode())
+    )
+    if not allowed:
+        return HttpResponseForbidden("Metrics are for staff or a scraper with the metrics token.")
+    return HttpResponse(metrics.registry.prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @login_required
 def doctor_register(request):
     if request.method == "POST":
@@ -374,7 +771,17 @@ def doctor_schedule_list(request):
         return HttpResponseForbidden("Only doctors can manage schedules.")
 
     doctor_user = request.user.doctor   # because DoctorSchedule expects User
-    schedules = DoctorSchedule.objects.filter(doctor=doctor_user)
+    today = now().date()
+    one_offs = list(DoctorSchedule.objects.filter(doctor=doctor_user, date__gte=today).order_by("date", "start_time"))
+    rules = list(ScheduleRule.objects.filter(doctor=doctor_user).order_by("weekday", "start_time"))
+    slots = upcoming_slots([doctor_user.id], today).get(doctor_user.id, {})
+
+    # Rules and one-off dates expanded into the actual hours of the next two weeks.
+    expanded = schedules.expand(rules, one_offs, today, today + timedelta(days=13), slot_minutes())
+    hours = [
+        (day, [(_clock(start), _clock(end), step) for start, end, step in sorted(expanded[(doctor_user.id, day)])])
+        for _, day in sorted(expanded)
+    ]
 
     if request.method == "POST":
         form = DoctorScheduleForm(request.POST)
@@ -387,10 +794,47 @@ def doctor_schedule_list(request):
     else:
         form = DoctorScheduleForm()
 
-    return render(request, "doctor/schedule_list.html", {
+    return render(request, "schedule_list.html", {
         "form": form,
-        "schedules": schedules
+        "schedules": one_offs,
+        "rules": rules,
+        "hours": hours,
+        "slots": slots,
     })
+
+
+def _clock(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+@login_required
+def doctor_schedule_rule(request, pk=None):
+    """Add (or edit, with ``pk``) a weekly schedule rule."""
+    if not hasattr(request.user, "doctor"):
+        return HttpResponseForbidden("Only doctors can manage schedules.")
+
+    rule = get_object_or_404(ScheduleRule, pk=pk, doctor=request.user.doctor) if pk else None
+    if request.method == "POST":
+        form = ScheduleRuleForm(request.POST, instance=rule)
+        if form.is_valid():
+            rule = form.save(commit=False)
+            rule.doctor = request.user.doctor
+            rule.save()
+            messages.success(request, "Weekly hours saved.")
+            return redirect("doctor_schedule_list")
+    else:
+        form = ScheduleRuleForm(instance=rule)
+
+    return render(request, "schedule_rule_form.html", {"form": form, "rule": rule})
+
+
+@login_required
+def doctor_schedule_rule_delete(request, pk):
+    rule = get_object_or_404(ScheduleRule, pk=pk, doctor__user=request.user)
+    if request.method == "POST":
+        rule.delete()
+        messages.success(request, "Weekly hours removed.")
+    return redirect("doctor_schedule_list")
 @login_required
 def doctor_schedule_add(request):
     if not hasattr(request.user, "doctor"):
@@ -409,4 +853,4 @@ def doctor_schedule_add(request):
     else:
         form = DoctorScheduleForm()
 
-    return render(request, "doctor/schedule_add.html", {"form": form})
+    return render(request, "schedule_add.html", {"form": form})
@@ -0,0 +1,271 @@
+# booking/waitlist.py
+"""
+Waitlist and automatic backfill of freed slots.
+
+Patients queue for a doctor on a date (WaitlistEntry). Whenever a slot is
+freed - a patient cancels or reschedules, a doctor rejects, an offer runs
+out - ``backfill`` offers it to the front of that day's queue:
+
+* queue order is highest ``priority`` first, then earliest ``joined_at``.
+  The partial ``waitlist_queue_idx`` index keeps waiting rows in that
+  order in the database, and each pass builds one heap per (doctor, day)
+  from them;
+* the offer holds the slot - availability treats it as busy - for
+  BOOKING_WAITLIST_HOLD_MINUTES, or until the slot starts if that's
+  sooner;
+* the patient accepts (services.accept_offer) or declines; a declined or
+  expired offer cascades the slot to the next person in the queue.
+  Expired offers are swept by ``manage.py expire_waitlist``.
+
+Work is batched per call, not per slot: one availability load (five
+queries), one SELECT of the queues, one UPDATE for all the offers and one
+outbox INSERT. A doctor rejecting 200 appointments costs the same
+round-trips as rejecting one. Offers are made in the caller's transaction,
+so a slot is never seen free and unoffered in between.
+
+A leave can't backfill its own days - the doctor isn't there - so
+``rehome`` offers each displaced patient the first free slot with the
+same doctor after the leave instead, again in one pass.
+"""
+import heapq
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import availability
+from .models import Doctor, WaitlistEntry
+from .outbox import INAPP, SMS, enqueue_many
+
+Status = WaitlistEntry.Status
+
+DEFAULT_HOLD_MINUTES = 30
+DEFAULT_REHOME_DAYS = 14
+CHUNK_SIZE = 500
+
+
+def _hold_minutes():
+    return getattr(settings, "BOOKING_WAITLIST_HOLD_MINUTES", DEFAULT_HOLD_MINUTES)
+
+
+def _starts_at(day, start):
+    return timezone.make_aware(datetime.combine(day, start))
+
+
+def _lock_doctors(doctor_ids):
+    # Same lock as services.book_slot, so an offer and a booking for the
+    # same doctor are serialised on PostgreSQL.
+    list(Doctor.objects.select_for_update().filter(pk__in=doctor_ids).order_by("pk").values_list("pk", flat=True))
+
+
+def _offer(entry, start, now):
+    entry.status = Status.OFFERED
+    entry.offered_time = start
+    entry.offer_expires_at = min(now + timedelta(minutes=_hold_minutes()), _starts_at(entry.date, start))
+
+
+def _announce(entries, doctor_names, phones):
+    outgoing = []
+    for entry in entries:
+        expires = timezone.localtime(entry.offer_expires_at)
+        msg = (
+            f"A slot with Dr.{doctor_names[entry.doctor_id]} on {entry.date} at {entry.offered_time:%H:%M} "
+            f"is held for you until {expires:%H:%M}. Accept it on your waitlist page."
+        )
+        key = f"waitlist:{entry.id}:{entry.date}:{entry.offered_time}"
+        outgoing.append((INAPP, entry.patient_id, msg, key))
+        if phones.get(entry.patient_id):
+            outgoing.append((SMS, phones[entry.patient_id], msg, f"{key}:sms"))
+    enqueue_many(outgoing)
+
+
+# ----------------------------
+# Joining and leaving
+# ----------------------------
+def join(patient, doctor, day, priority=0):
+    """Queue ``patient`` for ``doctor`` on ``day``. Returns ``(entry, created)``."""
+    try:
+        with transaction.atomic():
+            return WaitlistEntry.objects.create(patient=patient, doctor=doctor, date=day, priority=priority), True
+    except IntegrityError:
+        return WaitlistEntry.objects.get(patient=patient, doctor=doctor, date=day, status__in=WaitlistEntry.ACTIVE), False
+
+
+def withdraw(entry):
+    """Take an entry off the list, declining its offer if it has one.
+
+    A held slot goes straight to the next person in the queue. Returns
+    False if the entry was no longer waiting or offered.
+    """
+    with transaction.atomic():
+        current = (
+            WaitlistEntry.objects.filter(pk=entry.pk, status__in=WaitlistEntry.ACTIVE)
+            .values_list("status", "offered_time")
+            .first()
+        )
+        if current is None:
+            return False
+        status, offered_time = current
+        if not WaitlistEntry.objects.filter(pk=entry.pk, status=status).update(status=Status.DECLINED):
+            return False
+        if status == Status.OFFERED:
+            backfill([(entry.doctor_id, entry.date, offered_time, entry.patient_id)])
+    entry.status = Status.DECLINED
+    return True
+
+
+# ----------------------------
+# Backfill
+# ----------------------------
+def backfill(slots, now=None):
+    """Offer freed slots to the waitlist; returns the entries offered one.
+
+    ``slots`` are ``(doctor_id, date, time, freed_by)`` where ``freed_by``
+    is the patient who gave the slot up (never offered it back) or None.
+    Call inside the transaction that freed them.
+    """
+    now = now or timezone.now()
+    freed = {}
+    for doctor_id, day, start, freed_by in slots:
+        if _starts_at(day, start) > now:
+            freed[(doctor_id, day, start)] = freed_by
+    if not freed:
+        return []
+
+    _lock_doctors({doctor_id for doctor_id, _, _ in freed})
+    keys = {(doctor_id, day) for doctor_id, day, _ in freed}
+    waiting = (
+        WaitlistEntry.objects.filter(
+            status=Status.WAITING,
+            doctor_id__in={doctor_id for doctor_id, _ in keys},
+            date__in={day for _, day in keys},
+        )
+        .select_for_update(skip_locked=True, of=("self",))
+        .values_list("id", "doctor_id", "date", "priority", "joined_at", "patient_id", "patient__phone", "doctor__user__username")
+    )
+    heaps, phones, doctor_names = {}, {}, {}
+    for entry_id, doctor_id, day, priority, joined_at, patient_id, phone, doctor_name in waiting:
+        if (doctor_id, day) in keys:
+            heaps.setdefault((doctor_id, day), []).append((-priority, joined_at, entry_id, patient_id))
+            phones[patient_id] = phone
+            doctor_names[doctor_id] = doctor_name
+    if not heaps:
+        return []
+    for heap in heaps.values():
+        heapq.heapify(heap)
+
+    bookable = availability.free_among(slot for slot in sorted(freed) if slot[:2] in heaps)
+    offers = []
+    for doctor_id, day, start in sorted(bookable):
+        heap = heaps[(doctor_id, day)]
+        passed = []
+        while heap and heap[0][3] == freed[(doctor_id, day, start)]:
+            passed.append(heapq.heappop(heap))
+        if heap:
+            _, _, entry_id, patient_id = heapq.heappop(heap)
+            entry = WaitlistEntry(id=entry_id, doctor_id=doctor_id, patient_id=patient_id, date=day)
+            _offer(entry, start, now)
+            offers.append(entry)
+        for item in passed:
+            heapq.heappush(heap, item)
+
+    WaitlistEntry.objects.bulk_update(offers, ["status", "offered_time", "offer_expires_at"])
+    _announce(offers, doctor_names, phones)
+    return offers
+
+
+def rehome(doctor, displaced, after, now=None):
+    """Offer patients displaced by a leave the first free slots after it.
+
+    ``displaced`` is ``(patient_id, phone)`` pairs, earliest appointment
+    first; each gets the next free slot with ``doctor`` in the
+    BOOKING_WAITLIST_REHOME_DAYS days after ``after``, on a day they
+    aren't already queued for. Returns the offers made.
+    """
+    now = now or timezone.now()
+    if not displaced:
+        return []
+    first = max(after + timedelta(days=1), timezone.localdate(now))
+    last = first + timedelta(days=getattr(settings, "BOOKING_WAITLIST_REHOME_DAYS", DEFAULT_REHOME_DAYS) - 1)
+    free = availability.free_slots([doctor.id], first, last)[doctor.id]
+    slots = [(day, start) for day in sorted(free) for start in free[day] if _starts_at(day, start) > now]
+    taken = set(
+        WaitlistEntry.objects.filter(
+            doctor=doctor,
+            date__range=(first, last),
+            patient_id__in={patient_id for patient_id, _ in displaced},
+            status__in=WaitlistEntry.ACTIVE,
+        ).values_list("patient_id", "date")
+    )
+
+    offers = []
+    for patient_id, _ in displaced:
+        for i, (day, start) in enumerate(slots):
+            if (patient_id, day) not in taken:
+                del slots[i]
+                taken.add((patient_id, day))
+                entry = WaitlistEntry(doctor=doctor, patient_id=patient_id, date=day, joined_at=now)
+                _offer(entry, start, now)
+                offers.append(entry)
+                break
+
+    WaitlistEntry.objects.bulk_create(offers)
+    _announce(offers, {doctor.id: doctor.user.username}, dict(displaced))
+    return offers
+
+
+def close_days(doctor, first, last):
+    """Cancel queue places and offers on days the doctor is away.
+
+    The patients are told. Returns how many entries were closed.
+    """
+    rows = list(
+        WaitlistEntry.objects.filter(
+            doctor=doctor, date__range=(first, last), status__in=WaitlistEntry.ACTIVE
+        ).values_list("id", "patient_id", "patient__phone", "date")
+    )
+    WaitlistEntry.objects.filter(id__in=[row[0] for row in rows], status__in=WaitlistEntry.ACTIVE).update(
+        status=Status.CANCELLED
+    )
+    outgoing = []
+    for entry_id, patient_id, phone, day in rows:
+        msg = f"Dr.{doctor.user.username} is on leave on {day}, so your waitlist place for that day has been cancelled."
+        outgoing.append((INAPP, patient_id, msg, f"waitlist:{entry_id}:closed"))
+        if phone:
+            outgoing.append((SMS, phone, msg, f"waitlist:{entry_id}:closed:sms"))
+    enqueue_many(outgoing)
+    return len(rows)
+
+
+# ----------------------------
+# Expiry
+# ----------------------------
+def expire(now=None, chunk_size=CHUNK_SIZE):
+    """End offers whose hold ran out and pass their slots on.
+
+    Also closes places for days that have gone by. Offers are handled in
+    chunks, each claimed and cascaded in its own transaction. Returns a
+    dict of run metrics.
+    """
+    now = now or timezone.now()
+    closed = WaitlistEntry.objects.filter(status=Status.WAITING, date__lt=timezone.localdate(now)).update(
+        status=Status.EXPIRED
+    )
+    expired = offered = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                WaitlistEntry.objects.filter(status=Status.OFFERED, offer_expires_at__lte=now)
+                .select_for_update(skip_locked=True)
+                .order_by()
+                .values_list("id", "doctor_id", "date", "offered_time", "patient_id")[:chunk_size]
+            )
+            if not rows:
+                break
+            WaitlistEntry.objects.filter(id__in=[row[0] for row in rows], status=Status.OFFERED).update(
+                status=Status.EXPIRED
+            )
+            offered += len(backfill([row[1:] for row in rows], now))
+        expired += len(rows)
+    return {"expired": expired, "offered": offered, "closed": closed}
@@ -0,0 +1,60 @@
+# booking/warmup.py
+"""
+Pay a worker's first-request costs before it takes traffic.
+
+A fresh worker is slow on its first hits: the URL resolver builds its
+reverse tables on the first ``{% url %}``, every template is parsed on
+first render, and the doctor directory and search index are built on the
+first search. ``warmup`` does all of that up front.
+
+It runs from doctorapp/wsgi.py and asgi.py when BOOKING_WARMUP is set:
+
+    BOOKING_WARMUP=1 gunicorn --preload doctorapp.wsgi
+
+With ``--preload`` it runs once in the master and the forked workers
+share the result. Database connections opened here are closed at the
+end, so no worker inherits a socket from the master.
+"""
+import time
+from pathlib import Path
+
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.urls import get_resolver
+
+
+def _templates():
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            root = Path(directory)
+            for path in sorted(root.rglob("*.html")):
+                yield engine, path.relative_to(root).as_posix()
+
+
+def warmup():
+    """Load the URLconf, compile templates and prime caches. Returns ``{step: seconds}``."""
+    timings = {}
+
+    mark = time.perf_counter()
+    resolver = get_resolver()
+    resolver._populate()      # imports the URLconfs and fills the reverse tables
+    timings["urls"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    for engine, name in _templates():
+        try:
+            engine.get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError):
+            pass              # the request that uses it will report it
+    timings["templates"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    from . import directory, search
+    try:
+        directory.doctors()
+        directory.specializations()
+        search.rebuild()
+    finally:
+        connections.close_all()
+    timings["caches"] = time.perf_counter() - mark
+    return timings
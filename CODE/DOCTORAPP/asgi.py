@@ -0,0 +1,22 @@
+"""
+ASGI config for doctorapp project.
+
+Serve with an ASGI server to stream live notifications without holding a
+thread per open connection, e.g.::
+
+    uvicorn doctorapp.asgi:application
+
+BOOKING_WARMUP=1 runs booking.warmup before the first request, as in wsgi.py.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'doctorapp.settings')
+
+application = get_asgi_application()
+
+if os.environ.get('BOOKING_WARMUP'):
+    from booking.warmup import warmup
+    warmup()
@@ -0,0 +1,29 @@
+"""
+URLconf for public workers (BOOKING_ROLE=public): patient and doctor
+pages only. No admin site and no staff pages, so neither is imported.
+doctorapp/urls.py adds them back for full workers.
+"""
+from django.urls import path, include
+from booking import views
+
+urlpatterns = [
+    path("", views.welcome, name="welcome"),   # Default welcome page
+    path("", include("booking.urls")),   # Include booking app URLs
+    path("api/v1/", include("booking.api_urls")),   # JSON API for the mobile app
+
+    # Medical History
+    path("medical-history/", views.view_medical_history, name="medical_history"),
+    path("medical-history/<int:patient_id>/", views.view_medical_history, name="view_medical_history"),
+    path("medical-history/add/<int:patient_id>/", views.add_medical_history, name="add_medical_history"),
+
+    # Doctor self registration
+    path("doctor-register/", views.doctor_register, name="doctor_register"),
+
+    # ✅ Doctor schedule management
+    path("doctor/schedules/", views.doctor_schedule_list, name="doctor_schedule_list"),
+    path("doctor/schedules/add/", views.doctor_schedule_add, name="doctor_schedule_add"),
+    path("doctor/schedules/weekly/add/", views.doctor_schedule_rule, name="doctor_schedule_rule_add"),
+    path("doctor/schedules/weekly/<int:pk>/", views.doctor_schedule_rule, name="doctor_schedule_rule_edit"),
+    path("doctor/schedules/weekly/<int:pk>/delete/", views.doctor_schedule_rule_delete, name="doctor_schedule_rule_delete"),
+
+]
@@ -0,0 +1,22 @@
+"""
+WSGI config for doctorapp project.
+
+It exposes the WSGI callable as a module-level variable named ``application``.
+With BOOKING_WARMUP=1 the worker also compiles templates and primes the
+doctor caches before serving (booking/warmup.py); with gunicorn's
+``--preload`` that happens once, in the master::
+
+    BOOKING_WARMUP=1 gunicorn --preload doctorapp.wsgi
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'doctorapp.settings')
+
+application = get_wsgi_application()
+
+if os.environ.get('BOOKING_WARMUP'):
+    from booking.warmup import warmup
+    warmup()